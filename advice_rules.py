@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+表驱动的操作建议规则引擎
+规则表按优先级列出（条件, 操作建议, 提醒级别），编译为按列计算的布尔掩码，
+一次 np.select 即可对任意多行（多只基金 / 多个历史交易日）给出建议，取第一个满足的规则。
+
+条件写法：(列名, 运算符, 右值)，同一规则内多个条件为"且"。
+右值为数字、布尔值，或字符串（优先取同名列，否则取参数表中的同名参数）。
+
+所需列：profit_rate, drawdown, is_broken_ma, sharpe, volatility, base_target, base_callback
+（已给出 target / callback 列时不再按波动率调整）
+"""
+
+import operator
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+# 默认参数（fund_monitor 配置区可覆盖）
+DEFAULT_PARAMS = {
+    'stop_loss': -0.20,            # 止损线 -20%
+    'emergency_stop_loss': -0.30,  # 紧急止损 -30%
+    'high_sharpe': 1.5,            # 高质量持有的夏普比率
+}
+
+# 动态阈值（优化 4）：按年化波动率调整止盈目标与回撤容忍，取第一个满足的区间
+THRESHOLD_BANDS = (
+    # (条件, 倍数)
+    (('volatility', '>', 0.3), 1.5),   # 高波动：提高止盈目标，放宽回撤容忍
+    (('volatility', '<', 0.15), 0.8),  # 低波动：降低止盈目标，收紧回撤容忍
+)
+
+
+class Rule:
+    """一条规则：全部条件满足时给出 advice / alert_level"""
+
+    __slots__ = ('priority', 'advice', 'alert_level', 'conditions', 'description')
+
+    def __init__(self, priority: int, advice: str, alert_level: str,
+                 conditions: Sequence[Tuple], description: str):
+        self.priority = priority
+        self.advice = advice
+        self.alert_level = alert_level
+        self.conditions = list(conditions)
+        self.description = description
+
+
+# 增强决策逻辑（包含优化 5：止损），按优先级排列，无条件的规则为兜底
+RULES = (
+    Rule(0, "🛑 紧急止损", "critical",
+         [('profit_rate', '<=', 'emergency_stop_loss')],
+         "亏损 ≥ 30% (保护本金)"),
+    Rule(1, "🛑 止损建议", "high",
+         [('profit_rate', '<=', 'stop_loss'), ('is_broken_ma', '==', True)],
+         "亏损 ≥ 20% + 跌破均线 (风险控制)"),
+    Rule(2, "⚠️ 接近止损", "medium",
+         [('profit_rate', '<=', 'stop_loss')],
+         "亏损 ≥ 20% (接近止损)"),
+    Rule(3, "🚨 趋势反转(止盈)", "high",
+         [('profit_rate', '>=', 'target'), ('drawdown', '>=', 'callback'), ('is_broken_ma', '==', True)],
+         "收益达标 + 跌破均线 + 回撤超标 (锁定利润)"),
+    Rule(4, "⚠️ 触发回撤", "medium",
+         [('profit_rate', '>=', 'target'), ('drawdown', '>=', 'callback')],
+         "收益达标 + 回撤超标 (警惕)"),
+    Rule(5, "🔥 强势持有(高质量)", "low",
+         [('profit_rate', '>=', 'target'), ('sharpe', '>', 'high_sharpe')],
+         "收益达标 + 未触发回撤 + 夏普 > 1.5 (继续持有)"),
+    Rule(6, "🔥 强势持有", "low",
+         [('profit_rate', '>=', 'target')],
+         "收益达标 + 未触发回撤 (继续持有)"),
+    Rule(7, "🛡️ 均线下方", "low",
+         [('is_broken_ma', '==', True)],
+         "收益未达标 + 跌破均线 (弱势观察)"),
+    Rule(8, "🟢 定投中", "low",
+         [],
+         "正常定投状态"),
+)
+
+
+class RuleEngine:
+    """把规则表编译为向量化判断"""
+
+    def __init__(self, rules: Sequence[Rule] = RULES, params: Dict = None,
+                 threshold_bands: Sequence = THRESHOLD_BANDS):
+        self.rules = sorted(rules, key=lambda r: r.priority)
+        if not self.rules or self.rules[-1].conditions:
+            raise ValueError("规则表最后一条必须是无条件的兜底规则")
+        for rule in self.rules:
+            for _, op, _ in rule.conditions:
+                if op not in OPERATORS:
+                    raise ValueError(f"未知运算符: {op}")
+        self.params = {**DEFAULT_PARAMS, **(params or {})}
+        self.threshold_bands = threshold_bands
+
+    def _operand(self, df: pd.DataFrame, value):
+        if isinstance(value, str):
+            if value in df.columns:
+                return df[value].to_numpy()
+            return self.params[value]
+        return value
+
+    def _mask(self, df: pd.DataFrame, condition: Tuple) -> np.ndarray:
+        column, op, value = condition
+        return OPERATORS[op](self._operand(df, column), self._operand(df, value))
+
+    def thresholds(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """按波动率区间计算动态止盈目标与回撤容忍"""
+        masks = [self._mask(df, cond) for cond, _ in self.threshold_bands]
+        factor = np.select(masks, [m for _, m in self.threshold_bands], default=1.0) if masks \
+            else np.ones(len(df))
+        return df['base_target'].to_numpy() * factor, df['base_callback'].to_numpy() * factor
+
+    def evaluate(self, df: pd.DataFrame) -> pd.DataFrame:
+        """对每一行给出 advice / alert_level（返回与 df 同索引的新 DataFrame）"""
+        if len(df) == 0:
+            return pd.DataFrame({'advice': [], 'alert_level': []}, index=df.index)
+        if 'target' not in df.columns or 'callback' not in df.columns:
+            target, callback = self.thresholds(df)
+            df = df.assign(target=target, callback=callback)
+        n = len(df)
+        masks = []
+        for rule in self.rules:
+            mask = np.ones(n, dtype=bool)
+            for condition in rule.conditions:
+                mask &= self._mask(df, condition)
+            masks.append(mask)
+        choice = np.select(masks, np.arange(len(self.rules)), default=len(self.rules) - 1)
+        advice = np.array([r.advice for r in self.rules], dtype=object)
+        levels = np.array([r.alert_level for r in self.rules], dtype=object)
+        return pd.DataFrame({
+            'advice': advice[choice],
+            'alert_level': levels[choice],
+            'target': df['target'].to_numpy(),
+            'callback': df['callback'].to_numpy(),
+        }, index=df.index)
+
+    def evaluate_records(self, records: List[Dict]) -> List[Tuple[str, str]]:
+        """逐条记录求值（内部仍是一次向量化计算），返回 [(advice, alert_level), ...]"""
+        out = self.evaluate(pd.DataFrame.from_records(records))
+        return list(zip(out['advice'], out['alert_level']))
+
+    def help_rows(self) -> List[List[str]]:
+        """逻辑说明看板行：[优先级, 状态显示, 背后逻辑]"""
+        return [[str(r.priority), r.advice, r.description] for r in self.rules]
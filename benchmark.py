@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+端到端性能基准
+对 fund_monitor.generate_report() 与 MarketSentimentMonitor.print_report() 分阶段计时，
+全部使用离线数据（合成数据或录制夹具），结果写入 JSON，可与基线对比发现性能回退。
+
+用法：
+    python benchmark.py run --funds 10,100 --years 1,5 --output bench_results.json
+    python benchmark.py run --save-baseline          # 写入 benchmark_baseline.json
+    python benchmark.py run --fixtures fixtures      # 使用录制夹具（真实持仓）
+    python benchmark.py compare benchmark_baseline.json bench_results.json --threshold 0.15
+    python benchmark.py memory --years 1,5,20        # 净值内存占用（每只基金每年）
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List
+
+from prettytable import PrettyTable
+
+import fund_monitor
+from data_provider import DataSource, MultiSourceProvider
+from market_sentiment import MarketSentimentMonitor
+from nav_store import FundRecord, NavSeries
+from notifier import NotificationQueue
+from synthetic_data import SyntheticSource, generate_sector_map
+
+
+BASELINE_FILE = "benchmark_baseline.json"
+DEFAULT_OUTPUT = "bench_results.json"
+
+# 基金监控各阶段
+# total 为冷启动（净值未入内存、结果缓存为空）的完整流程，total_cached 为紧接着再运行一次（全部命中结果缓存）
+FUND_STAGES = ['load', 'dca_simulation', 'risk_metrics', 'correlation',
+               'decision', 'rendering', 'persistence', 'total', 'total_cached']
+
+# 市场情绪各阶段
+SENTIMENT_STAGES = ['breadth', 'index', 'north', 'score', 'advice', 'total']
+
+
+class PrebuiltNavSource:
+    """预先生成好的净值数据，保证计时不包含合成数据的生成开销"""
+
+    def __init__(self, navs: Dict):
+        self.navs = navs
+
+    def get_fund_nav(self, code):
+        return self.navs[code].copy()
+
+
+class StaticSource(DataSource):
+    """返回固定快照的数据源"""
+
+    name = 'static'
+
+    def __init__(self, spot, indices, north):
+        self.spot, self.indices, self.north = spot, indices, north
+
+    def get_spot(self):
+        return self.spot
+
+    def get_index_quotes(self):
+        return self.indices
+
+    def get_north_flow(self):
+        return self.north
+
+
+@contextlib.contextmanager
+def quiet():
+    """屏蔽被测函数的控制台输出"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+@contextlib.contextmanager
+def isolated_workdir():
+    """在临时目录运行，避免覆盖仓库中的结果文件与峰值记录"""
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='fund_bench_') as tmp:
+        os.chdir(tmp)
+        try:
+            yield tmp
+        finally:
+            os.chdir(cwd)
+
+
+@contextlib.contextmanager
+def fund_run():
+    """
+    单次基金监控基准：新的临时目录（结果缓存、峰值记录、历史库从空开始）、清空内存中的净值，
+    通知使用没有渠道的队列（合成或回放数据的提醒不能发到真实渠道）
+    """
+    original = fund_monitor.get_notification_queue
+    silent = NotificationQueue(':memory:', channels=[])
+    fund_monitor.get_notification_queue = lambda: silent
+    try:
+        with isolated_workdir():
+            fund_monitor.NAV_STORE.clear()
+            yield
+    finally:
+        fund_monitor.get_notification_queue = original
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def bench_fund_stages() -> Dict[str, float]:
+    """按阶段运行一次基金监控流程（与 generate_report 调用相同的函数）"""
+    stages = dict.fromkeys(FUND_STAGES, 0.0)
+    peak_record = fund_monitor.load_peak_record()
+    navs = {}
+
+    with quiet():
+        for code in fund_monitor.PORTFOLIO:
+            navs[code], t = timed(fund_monitor.get_nav_and_ma, code)
+            stages['load'] += t
+
+        shares_costs = {}
+        for code, info in fund_monitor.PORTFOLIO.items():
+            curr_nav = navs[code][0]
+            if curr_nav is None:
+                continue
+            shares_costs[code], t = timed(fund_monitor.simulate_investment_accurate, info, code, curr_nav)
+            stages['dca_simulation'] += t
+
+        risks = {}
+        for code in shares_costs:
+            risks[code], t = timed(fund_monitor.calculate_risk_metrics, code)
+            stages['risk_metrics'] += t
+
+        _, stages['correlation'] = timed(fund_monitor.analyze_portfolio_correlation)
+
+        start = time.perf_counter()
+        results = []
+        for code, (shares, cost) in shares_costs.items():
+            info = fund_monitor.PORTFOLIO[code]
+            nav, ma20 = navs[code]
+            peak_record[code] = max(peak_record.get(code, 0), nav)
+            sharpe, volatility, _ = risks[code]
+            results.append({
+                "code": code, "name": info['name'], "nav": nav, "ma20": ma20, "cost": cost,
+                "profit_rate": (nav - cost) / cost, "profit_amount": (nav - cost) * shares,
+                "drawdown": (peak_record[code] - nav) / peak_record[code],
+                "sharpe": sharpe, "volatility": volatility,
+            })
+        results = fund_monitor.decide_all(results)
+        stages['decision'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        table, help_table = fund_monitor.build_report_tables(results)
+        fund_monitor.print_report_tables(table, help_table, [])
+        stages['rendering'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        fund_monitor.save_peak_record(peak_record)
+        fund_monitor.save_results(table, help_table, results)
+        stages['persistence'] = time.perf_counter() - start
+
+        # 分阶段运行已把净值读入内存，完整流程从冷状态开始计时
+        fund_monitor.NAV_STORE.clear()
+        _, stages['total'] = timed(fund_monitor.generate_report)
+        _, stages['total_cached'] = timed(fund_monitor.generate_report)
+    return stages
+
+
+def cold_fund_stages() -> Dict[str, float]:
+    """每次重复都从冷状态开始，取最小值时不会只剩命中缓存的路径"""
+    with fund_run():
+        return bench_fund_stages()
+
+
+def bench_sentiment_stages(monitor: MarketSentimentMonitor) -> Dict[str, float]:
+    """按阶段运行一次市场情绪流程"""
+    stages = dict.fromkeys(SENTIMENT_STAGES, 0.0)
+    with quiet():
+        breadth, stages['breadth'] = timed(monitor.get_market_breadth)
+        indices, stages['index'] = timed(monitor.get_index_performance)
+        north, stages['north'] = timed(monitor.get_north_capital_flow)
+        (score, _), stages['score'] = timed(monitor.calculate_panic_score, breadth, indices, north)
+        _, stages['advice'] = timed(monitor.generate_grid_strategy_advice, score, breadth)
+        _, stages['total'] = timed(monitor.print_report)
+    return stages
+
+
+def best_of(fn, repeat: int) -> Dict[str, float]:
+    """重复运行取每个阶段的最小耗时"""
+    runs = [fn() for _ in range(repeat)]
+    return {stage: min(r[stage] for r in runs) for stage in runs[0]}
+
+
+def run_fund_matrix(fund_counts: List[int], years_list: List[float], repeat: int) -> List[Dict]:
+    results = []
+    original = fund_monitor.PORTFOLIO
+    try:
+        for years in years_list:
+            source = SyntheticSource(n_funds=max(fund_counts), years=years)
+            portfolio = source.portfolio()
+            for n in fund_counts:
+                codes = list(portfolio)[:n]
+                navs = {code: source.get_fund_nav(code) for code in codes}
+                fund_monitor.PORTFOLIO = {code: portfolio[code] for code in codes}
+                fund_monitor.set_nav_source(PrebuiltNavSource(navs))
+                stages = best_of(cold_fund_stages, repeat)
+                results.append({'suite': 'fund_monitor', 'params': {'funds': n, 'years': years},
+                                'stages': stages})
+                print(f"  fund_monitor funds={n:<6} years={years:<4} total={stages['total']:.3f}s")
+    finally:
+        fund_monitor.PORTFOLIO = original
+        fund_monitor.set_nav_source(None)
+    return results
+
+
+def run_sentiment_matrix(stock_counts: List[int], repeat: int) -> List[Dict]:
+    results = []
+    for n in stock_counts:
+        source = SyntheticSource(n_funds=1, years=1, n_stocks=n)
+        spot = source.get_spot()
+        static = StaticSource(spot, source.get_index_quotes(), source.get_north_flow())
+        monitor = MarketSentimentMonitor(MultiSourceProvider([static]), sector_map=generate_sector_map(spot['代码']))
+        stages = best_of(lambda: bench_sentiment_stages(monitor), repeat)
+        results.append({'suite': 'market_sentiment', 'params': {'stocks': n}, 'stages': stages})
+        print(f"  market_sentiment stocks={n:<6} total={stages['total']:.3f}s")
+    return results
+
+
+def run_fixture_suite(fixture_dir: str, repeat: int) -> List[Dict]:
+    """使用录制夹具回放真实持仓"""
+    import fixtures
+    fixture_dir = os.path.abspath(fixture_dir)
+    results = []
+    fixtures.configure('replay', fixture_dir)
+    try:
+        stages = best_of(cold_fund_stages, repeat)
+        results.append({'suite': 'fund_monitor', 'params': {'fixtures': fixture_dir}, 'stages': stages})
+        monitor = MarketSentimentMonitor()
+        stages = best_of(lambda: bench_sentiment_stages(monitor), repeat)
+        results.append({'suite': 'market_sentiment', 'params': {'fixtures': fixture_dir}, 'stages': stages})
+    finally:
+        fixtures.configure('off')
+    return results
+
+
+def run_memory_suite(years_list: List[float], n_funds: int, universe: int) -> List[Dict]:
+    """对比 akshare 原始 DataFrame 与紧凑表示（float64 / float32）的内存占用"""
+    import numpy as np
+    results = []
+    for years in years_list:
+        source = SyntheticSource(n_funds=n_funds, years=years)
+        raw = compact64 = compact32 = rows = 0
+        for code in source.fund_codes():
+            df = source.get_fund_nav(code)
+            rows += len(df)
+            raw += int(df.memory_usage(deep=True, index=True).sum())
+            compact64 += FundRecord(code, NavSeries.from_frame(df, dtype=np.float64)).nbytes
+            compact32 += FundRecord(code, NavSeries.from_frame(df, dtype=np.float32)).nbytes
+        per_fund_year = {name: total / n_funds / years for name, total in
+                         (('raw', raw), ('float64', compact64), ('float32', compact32))}
+        results.append({'suite': 'nav_memory', 'params': {'years': years, 'funds': n_funds},
+                        'rows_per_fund': rows / n_funds, 'bytes_per_fund_year': per_fund_year})
+
+    table = PrettyTable()
+    table.field_names = ["年数", "行/基金", "原始(B/基金/年)", "float64", "float32", "压缩比",
+                         f"{universe} 只基金(float64)"]
+    for r in results:
+        b = r['bytes_per_fund_year']
+        years = r['params']['years']
+        table.add_row([years, f"{r['rows_per_fund']:.0f}", f"{b['raw']:.0f}", f"{b['float64']:.0f}",
+                       f"{b['float32']:.0f}", f"{b['raw'] / b['float64']:.1f}x",
+                       f"{b['float64'] * years * universe / 2 ** 20:.1f} MB"])
+    print(table)
+    return results
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return 'unknown'
+
+
+def case_key(entry: Dict) -> str:
+    params = ','.join(f"{k}={v}" for k, v in sorted(entry['params'].items()))
+    return f"{entry['suite']}[{params}]"
+
+
+def compare(baseline: Dict, current: Dict, threshold: float, min_delta: float) -> List[Dict]:
+    """逐阶段对比，返回所有对比行（regression 标记回退）"""
+    base_cases = {case_key(e): e for e in baseline['results']}
+    rows = []
+    for entry in current['results']:
+        base = base_cases.get(case_key(entry))
+        if base is None:
+            continue
+        for stage, seconds in entry['stages'].items():
+            base_seconds = base['stages'].get(stage)
+            if base_seconds is None:
+                continue
+            ratio = seconds / base_seconds if base_seconds > 0 else float('inf')
+            rows.append({
+                'case': case_key(entry),
+                'stage': stage,
+                'baseline': base_seconds,
+                'current': seconds,
+                'ratio': ratio,
+                'regression': ratio > 1 + threshold and seconds - base_seconds > min_delta,
+            })
+    return rows
+
+
+def print_comparison(rows: List[Dict]):
+    table = PrettyTable()
+    table.field_names = ["用例", "阶段", "基线(s)", "当前(s)", "变化", "状态"]
+    table.align["用例"] = "l"
+    for r in rows:
+        status = "🔴 回退" if r['regression'] else ("🟢 提升" if r['ratio'] < 0.9 else "")
+        table.add_row([r['case'], r['stage'], f"{r['baseline']:.4f}", f"{r['current']:.4f}",
+                       f"{r['ratio'] - 1:+.1%}", status])
+    print(table)
+
+
+def parse_list(value: str, cast) -> List:
+    return [cast(v) for v in value.split(',') if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="基金监控 / 市场情绪性能基准")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help='运行基准测试')
+    run.add_argument('--funds', default='10,100', help='基金数量列表，逗号分隔')
+    run.add_argument('--years', default='1,5', help='历史年数列表，逗号分隔')
+    run.add_argument('--stocks', default='5000', help='市场快照股票数量列表，逗号分隔')
+    run.add_argument('--repeat', type=int, default=3, help='重复次数（取最快）')
+    run.add_argument('--fixtures', help='使用录制夹具目录代替合成数据')
+    run.add_argument('--output', default=DEFAULT_OUTPUT)
+    run.add_argument('--save-baseline', action='store_true', help=f'同时写入 {BASELINE_FILE}')
+
+    cmp_parser = sub.add_parser('compare', help='与基线对比')
+    cmp_parser.add_argument('baseline')
+    cmp_parser.add_argument('current')
+    cmp_parser.add_argument('--threshold', type=float, default=0.15, help='回退阈值（相对变化）')
+    cmp_parser.add_argument('--min-delta', type=float, default=0.002, help='忽略小于该秒数的绝对变化')
+
+    mem = sub.add_parser('memory', help='净值内存占用基准')
+    mem.add_argument('--years', default='1,5,20', help='历史年数列表，逗号分隔')
+    mem.add_argument('--funds', type=int, default=50, help='采样基金数量')
+    mem.add_argument('--universe', type=int, default=20000, help='估算全市场常驻内存的基金数量')
+    mem.add_argument('--output', help='结果 JSON 路径')
+
+    args = parser.parse_args()
+
+    if args.command == 'memory':
+        results = run_memory_suite(parse_list(args.years, float), args.funds, args.universe)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump({'results': results}, f, ensure_ascii=False, indent=2)
+        return
+
+    if args.command == 'compare':
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        with open(args.current, 'r', encoding='utf-8') as f:
+            current = json.load(f)
+        rows = compare(baseline, current, args.threshold, args.min_delta)
+        print_comparison(rows)
+        regressions = [r for r in rows if r['regression']]
+        if regressions:
+            print(f"\n❌ 发现 {len(regressions)} 项性能回退（阈值 {args.threshold:.0%}）")
+            sys.exit(1)
+        print("\n✅ 未发现性能回退")
+        return
+
+    print("⏱️ 运行性能基准...")
+    if args.fixtures:
+        results = run_fixture_suite(args.fixtures, args.repeat)
+    else:
+        results = run_fund_matrix(parse_list(args.funds, int), parse_list(args.years, float), args.repeat)
+        results += run_sentiment_matrix(parse_list(args.stocks, int), args.repeat)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+    outputs = [args.output] + ([BASELINE_FILE] if args.save_baseline else [])
+    for path in outputs:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ 结果已保存到 {', '.join(outputs)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+常驻内存的市场宽度状态
+按股票保存最新涨跌幅 / 成交额，同时维护涨跌家数、涨跌停、跌超 5% / 8% 家数与总成交额，
+计数只按变化的股票调整，不需要每次重新扫描全市场：
+
+- update()：推送行情逐只更新，减去旧值所在的分档、加上新值所在的分档，O(1)
+- apply_snapshot()：轮询得到的全市场快照按代码对齐后向量化比较，只对涨跌幅或成交额变化的行
+  （以及新出现 / 消失的股票）调整计数
+
+分档规则与 MarketSentimentMonitor.get_market_breadth() 一致（涨跌停按 ±9.9%）。
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+
+LIMIT_PCT = 9.9
+DROP_5_PCT = -5.0
+DROP_8_PCT = -8.0
+
+# 分档计数（不含 total / 成交额）
+COUNTERS = ('up_count', 'down_count', 'limit_up', 'limit_down', 'drop_5_pct', 'drop_8_pct')
+
+INITIAL_CAPACITY = 8192
+
+
+def buckets(change):
+    """涨跌幅所在的分档（与 COUNTERS 顺序一致）；标量返回 bool，数组返回布尔数组"""
+    return (change > 0, change < 0, change >= LIMIT_PCT, change <= -LIMIT_PCT,
+            change <= DROP_5_PCT, change <= DROP_8_PCT)
+
+
+class BreadthState:
+    """按股票代码维护最新行情与宽度计数"""
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        self.slots: Dict[str, int] = {}
+        self.codes = []
+        self.names = []
+        self.price = np.zeros(capacity)
+        self.change = np.zeros(capacity)
+        self.amount = np.zeros(capacity)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self.total = 0
+        self.total_amount = 0.0
+        self.updates = 0
+        self._index = None
+        self._last_codes = self._last_pos = None
+
+    def __len__(self) -> int:
+        return self.total
+
+    def _slot(self, code: str, name: str = None) -> int:
+        slot = self.slots.get(code)
+        if slot is None:
+            slot = len(self.slots)
+            if slot == len(self.change):
+                for attr in ('price', 'change', 'amount', 'active'):
+                    array = getattr(self, attr)
+                    setattr(self, attr, np.concatenate([array, np.zeros_like(array)]))
+            self.slots[code] = slot
+            self.codes.append(code)
+            self.names.append(name or '')
+            self._index = None
+        elif name:
+            self.names[slot] = name
+        return slot
+
+    def update(self, code: str, change: float, amount: float, price: float = None, name: str = None):
+        """单只股票的最新行情（O(1)）"""
+        slot = self._slot(code, name)
+        counts = self.counts
+        if self.active[slot]:
+            for key, hit in zip(COUNTERS, buckets(self.change[slot])):
+                counts[key] -= hit
+            self.total_amount -= self.amount[slot]
+        else:
+            self.active[slot] = True
+            self.total += 1
+        for key, hit in zip(COUNTERS, buckets(change)):
+            counts[key] += hit
+        amount = amount if amount == amount else 0.0
+        self.total_amount += amount
+        self.change[slot] = change
+        self.amount[slot] = amount
+        if price is not None:
+            self.price[slot] = price
+        self.updates += 1
+
+    def _adjust(self, change: np.ndarray, amount: np.ndarray, sign: int):
+        for key, hits in zip(COUNTERS, buckets(change)):
+            self.counts[key] += sign * int(np.count_nonzero(hits))
+        self.total_amount += sign * float(amount.sum())
+
+    def apply_snapshot(self, df: pd.DataFrame) -> int:
+        """
+        按全市场快照更新（列：代码 / 名称 / 最新价 / 涨跌幅 / 成交额），返回变化的股票数
+        快照中不存在的股票视为已移出（与对整张快照重新统计的结果一致）
+        """
+        codes = df['代码'].to_numpy()
+        if self._last_codes is not None and np.array_equal(codes, self._last_codes):
+            # 代码顺序与上一次快照相同（多数数据源如此），直接沿用对齐结果
+            pos = self._last_pos
+        else:
+            if not pd.Index(codes).is_unique:
+                # 分页抓取时行情变动可能使同一只股票出现在两页，保留最后一条
+                df = df.drop_duplicates('代码', keep='last')
+                codes = df['代码'].to_numpy()
+            if self._index is None:
+                self._index = pd.Index(self.codes, dtype=object)
+            pos = self._index.get_indexer(codes)
+            missing = np.flatnonzero(pos < 0)
+            if len(missing):
+                names = df['名称'].to_numpy() if '名称' in df.columns else None
+                for i in missing:
+                    pos[i] = self._slot(codes[i], names[i] if names is not None else None)
+            self._last_codes, self._last_pos = codes.copy(), pos
+
+        new_change = df['涨跌幅'].to_numpy(dtype=float)
+        new_amount = np.nan_to_num(df['成交额'].to_numpy(dtype=float))
+        old_change, old_amount, was_active = self.change[pos], self.amount[pos], self.active[pos]
+        same_change = (old_change == new_change) | (np.isnan(old_change) & np.isnan(new_change))
+        changed = ~was_active | ~same_change | (old_amount != new_amount)
+
+        # 消失的股票：移出其分档与成交额
+        present = np.zeros(len(self.active), dtype=bool)
+        present[pos] = True
+        removed = np.flatnonzero(self.active & ~present)
+        if len(removed):
+            self._adjust(self.change[removed], self.amount[removed], -1)
+            self.active[removed] = False
+            self.total -= len(removed)
+
+        if changed.any():
+            rows = pos[changed]
+            previous = changed & was_active
+            self._adjust(old_change[previous], old_amount[previous], -1)
+            self._adjust(new_change[changed], new_amount[changed], 1)
+            self.change[rows] = new_change[changed]
+            self.amount[rows] = new_amount[changed]
+            if '最新价' in df.columns:
+                self.price[rows] = df['最新价'].to_numpy(dtype=float)[changed]
+            self.total += int(np.count_nonzero(~was_active))
+            self.active[rows] = True
+        count = int(np.count_nonzero(changed))
+        self.updates += count
+        return count
+
+    def breadth(self) -> Optional[Dict]:
+        """与 get_market_breadth() 相同结构的宽度统计（不含分组宽度）"""
+        total = self.total
+        if total == 0:
+            return None
+        counts = self.counts
+        decided = counts['up_count'] + counts['down_count']
+        return {
+            'total': total,
+            'up_count': counts['up_count'],
+            'down_count': counts['down_count'],
+            'flat_count': total - decided,
+            'breadth_ratio': counts['up_count'] / decided if decided > 0 else 0.5,
+            'limit_up': counts['limit_up'],
+            'limit_down': counts['limit_down'],
+            'drop_5_pct': counts['drop_5_pct'],
+            'drop_8_pct': counts['drop_8_pct'],
+            'total_volume': self.total_amount / 100000000,
+        }
+
+    def to_frame(self) -> pd.DataFrame:
+        """当前全部股票的快照（列与 data_provider.SPOT_COLUMNS 一致）"""
+        n = len(self.codes)
+        active = self.active[:n]
+        return pd.DataFrame({
+            '代码': np.array(self.codes, dtype=object)[active],
+            '名称': np.array(self.names, dtype=object)[active],
+            '最新价': self.price[:n][active],
+            '涨跌幅': self.change[:n][active],
+            '成交额': self.amount[:n][active],
+        })
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多数据源行情提供层
+统一 akshare / StockDataCrawler / efinance 三个数据源：
+- 竞速（race）：同时请求所有数据源，取第一个有效结果
+- 对冲（hedge）：先请求最快的数据源，超过延迟阈值仍未返回再追加下一个
+- 统计每个数据源的延迟与错误率分位数，自动优先选择最快且健康的数据源
+- 整体超时不超过运行截止时间（deadline.run_deadline），超时未返回的数据源在守护线程中放弃
+"""
+
+import time
+from concurrent.futures import wait, FIRST_COMPLETED
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+try:
+    import akshare as ak
+except ImportError:  # akshare 未安装时该数据源不可用
+    ak = None
+
+try:
+    import efinance as ef
+except ImportError:  # efinance 为可选依赖
+    ef = None
+
+from deadline import DaemonExecutor, get_deadline
+from fixtures import get_fixture_store
+from http_resilience import LatencyStats
+from north_flow import get_north_flow_tracker, parse_akshare_minutes
+from metrics import FETCH_LATENCY, FETCH_TOTAL, LAST_SUCCESS
+from response_cache import ResponseCache, get_response_cache
+from stock_data_crawler import StockDataCrawler
+
+
+# 统一后的全市场快照列
+SPOT_COLUMNS = ['代码', '名称', '最新价', '涨跌幅', '成交额']
+
+# 统一后的主要指数（key 与 MarketSentimentMonitor 保持一致）
+INDEX_CODES = {
+    '000001': 'shanghai',  # 上证指数
+    '399001': 'shenzhen',  # 深证成指
+    '000300': 'csi300',    # 沪深300
+    '399006': 'chinext'    # 创业板指
+}
+
+# 支持的数据类型
+DATA_KINDS = ('spot', 'index', 'north')
+
+# 排序时每 100% 错误率折算的延迟惩罚（秒）
+ERROR_PENALTY_SECONDS = 10.0
+
+
+class SourceStats(LatencyStats):
+    """单个数据源的滑动窗口延迟/错误统计"""
+
+    def is_healthy(self) -> bool:
+        """至少 3 个样本且错误率超过 50% 视为不健康"""
+        return self.count < 3 or self.error_rate <= 0.5
+
+    def score(self) -> float:
+        """排序得分：中位延迟 + 错误率惩罚，越小越优先；无样本时优先探测"""
+        p50 = self.percentile(50)
+        if p50 is None:
+            return 0.0
+        return p50 + self.error_rate * ERROR_PENALTY_SECONDS
+
+
+# ===================== 数据源适配器 =====================
+
+class DataSource:
+    """数据源基类，不支持的数据类型抛出 NotImplementedError"""
+
+    name = 'base'
+
+    def available(self) -> bool:
+        return True
+
+    def get_spot(self) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def get_index_quotes(self) -> Dict:
+        raise NotImplementedError
+
+    def get_north_flow(self) -> Dict:
+        raise NotImplementedError
+
+    def get_fund_nav(self, code: str) -> pd.DataFrame:
+        """基金单位净值历史（列：净值日期 / 单位净值 / 日增长率）"""
+        raise NotImplementedError
+
+
+class AkshareSource(DataSource):
+    """akshare（东方财富）数据源"""
+
+    name = 'akshare'
+
+    def __init__(self, cache: ResponseCache = None):
+        self.cache = cache or get_response_cache()
+        self.fixtures = get_fixture_store()
+
+    def available(self) -> bool:
+        # 回放模式下不需要安装 akshare
+        return ak is not None or self.fixtures.mode == 'replay'
+
+    def _call(self, kind: str, name: str, fetch, params: Dict = None):
+        """akshare 调用：共享响应缓存 -> 录制/回放夹具 -> akshare"""
+        return self.cache.cached_call(
+            kind, name, lambda: self.fixtures.call('akshare', name, fetch, params), params
+        )
+
+    def get_spot(self) -> pd.DataFrame:
+        df = self._call('spot', 'ak.stock_zh_a_spot_em', lambda: ak.stock_zh_a_spot_em())
+        return df[SPOT_COLUMNS]
+
+    def get_index_quotes(self) -> Dict:
+        df = self._call('index', 'ak.stock_zh_index_spot_em', lambda: ak.stock_zh_index_spot_em())
+        result = {}
+        for code, name in INDEX_CODES.items():
+            row = df[df['代码'] == code]
+            if not row.empty:
+                result[name] = {
+                    'change_pct': float(row['涨跌幅'].values[0]),
+                    'volume': float(row['成交额'].values[0]) / 100000000  # 转为亿元
+                }
+        return result
+
+    def get_north_flow(self) -> Dict:
+        # 交易日内使用分钟序列（只解析未存储的分钟），否则取最近一个交易日的日度数据
+        minutes = self._call('north', 'ak.stock_hsgt_fund_min_em',
+                             lambda: ak.stock_hsgt_fund_min_em(symbol="北向资金"), params={'symbol': '北向资金'})
+        summary = get_north_flow_tracker().update(minutes, parse_akshare_minutes)
+        if summary:
+            return summary
+        df = self._call('north', 'ak.stock_hsgt_hist_em',
+                        lambda: ak.stock_hsgt_hist_em(symbol="沪深港通"),
+                        params={'symbol': '沪深港通'})
+        if df is None or df.empty:
+            return {'net_flow': 0, 'signal': 'unknown'}
+        latest = df.iloc[0]
+        for col in ['当日资金流入-净流入', '资金流入', '北上资金', '净流入']:
+            if col in latest.index:
+                try:
+                    net_flow = float(latest[col]) / 100000000  # 转为亿元
+                except (TypeError, ValueError):
+                    continue
+                return {
+                    'net_flow': round(net_flow, 2),
+                    'signal': 'inflow' if net_flow > 0 else 'outflow'
+                }
+        return {'net_flow': 0, 'signal': 'unknown'}
+
+
+class CrawlerSource(DataSource):
+    """StockDataCrawler（东方财富/新浪 HTTP 接口）数据源"""
+
+    name = 'crawler'
+
+    def __init__(self, crawler: StockDataCrawler = None):
+        self.crawler = crawler or StockDataCrawler()
+
+    def get_spot(self) -> pd.DataFrame:
+        quotes = self.crawler.get_realtime_quotes()
+        if not quotes:
+            return None
+        df = pd.DataFrame(quotes).rename(columns={'股票代码': '代码', '股票名称': '名称'})
+        return df[SPOT_COLUMNS]
+
+    def get_index_quotes(self) -> Dict:
+        quotes = self.crawler.get_index_quotes()
+        if not quotes:
+            return None
+        # 新浪简版行情成交额单位为万元，统一为亿元
+        return {
+            name: {'change_pct': q['change_pct'], 'volume': q['volume'] / 10000}
+            for name, q in quotes.items()
+        }
+
+    def get_north_flow(self) -> Dict:
+        return self.crawler.get_north_capital_flow()
+
+
+class EfinanceSource(DataSource):
+    """efinance 数据源（可选依赖）"""
+
+    name = 'efinance'
+
+    def __init__(self):
+        self.fixtures = get_fixture_store()
+
+    def available(self) -> bool:
+        # 回放模式下只取决于录制时是否有 efinance 数据，与是否安装无关
+        if self.fixtures.mode == 'replay':
+            return self.fixtures.recorded('efinance')
+        return ef is not None
+
+    def _call(self, name: str, fetch, params: Dict = None):
+        """efinance 调用：录制/回放夹具 -> efinance"""
+        return self.fixtures.call('efinance', name, fetch, params)
+
+    def get_spot(self) -> pd.DataFrame:
+        df = self._call('ef.stock.get_realtime_quotes', lambda: ef.stock.get_realtime_quotes())
+        if df is None or df.empty:
+            return None
+        df = df[df['股票代码'].str.match(r'^(00|30|60|68)\d{4}$')]
+        df = df.rename(columns={'股票代码': '代码', '股票名称': '名称'})
+        df = df[SPOT_COLUMNS].copy()
+        for col in ['最新价', '涨跌幅', '成交额']:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+        return df
+
+    def get_index_quotes(self) -> Dict:
+        result = {}
+        for code, name in INDEX_CODES.items():
+            market = '1' if code.startswith('000') else '0'
+            secid = f"{market}.{code}"
+            df = self._call('ef.stock.get_quote_history',
+                            lambda: ef.stock.get_quote_history(secid, klt=101),
+                            params={'secid': secid, 'klt': 101})
+            if df is not None and not df.empty:
+                latest = df.iloc[-1]
+                result[name] = {
+                    'change_pct': float(latest['涨跌幅']),
+                    'volume': float(latest['成交额']) / 100000000
+                }
+        return result
+
+
+# ===================== 结果校验 =====================
+
+def _valid_spot(df) -> bool:
+    return isinstance(df, pd.DataFrame) and not df.empty and all(c in df.columns for c in SPOT_COLUMNS)
+
+
+def _valid_index(result) -> bool:
+    return isinstance(result, dict) and len(result) > 0
+
+
+def _valid_north(result) -> bool:
+    return isinstance(result, dict) and result.get('signal') not in (None, 'unknown')
+
+
+VALIDATORS = {
+    'spot': _valid_spot,
+    'index': _valid_index,
+    'north': _valid_north,
+}
+
+METHODS = {
+    'spot': 'get_spot',
+    'index': 'get_index_quotes',
+    'north': 'get_north_flow',
+}
+
+
+class MultiSourceProvider:
+    """多数据源对冲/竞速提供者"""
+
+    def __init__(self, sources: List[DataSource] = None, mode: str = 'hedge',
+                 hedge_delay: float = None, timeout: float = 60):
+        """
+        Args:
+            sources: 数据源列表，顺序即无统计数据时的优先级
+            mode: 'hedge' 超时后追加请求 / 'race' 同时请求所有数据源
+            hedge_delay: 对冲延迟（秒），默认取当前数据源的 p95 延迟
+            timeout: 整体超时（秒），不超过运行截止时间
+        """
+        if sources is None:
+            sources = [AkshareSource(), CrawlerSource(), EfinanceSource()]
+        self.sources = [s for s in sources if s.available()]
+        self.mode = mode
+        self.hedge_delay = hedge_delay
+        self.timeout = timeout
+        self.stats = {(s.name, kind): SourceStats() for s in self.sources for kind in DATA_KINDS}
+        self.unsupported = set()
+        # 守护线程：超时被放弃的请求（akshare 没有超时参数）不阻塞进程退出
+        self.executor = DaemonExecutor(max_workers=max(2, len(self.sources) * 2),
+                                       thread_name_prefix='provider')
+
+    def ranked_sources(self, kind: str) -> List[DataSource]:
+        """按健康度、得分、声明顺序排序"""
+        candidates = [s for s in self.sources if (s.name, kind) not in self.unsupported]
+        return sorted(
+            candidates,
+            key=lambda s: (not self.stats[(s.name, kind)].is_healthy(),
+                           self.stats[(s.name, kind)].score(),
+                           self.sources.index(s))
+        )
+
+    def _call(self, source: DataSource, kind: str):
+        """调用单个数据源并记录延迟与结果"""
+        stats = self.stats[(source.name, kind)]
+        start = time.monotonic()
+        try:
+            result = getattr(source, METHODS[kind])()
+        except NotImplementedError:
+            self.unsupported.add((source.name, kind))
+            return None
+        except Exception as e:
+            self._observe(source, kind, time.monotonic() - start, False)
+            print(f"⚠️ 数据源 {source.name} 获取 {kind} 失败: {e}")
+            return None
+        ok = VALIDATORS[kind](result)
+        self._observe(source, kind, time.monotonic() - start, ok)
+        return result if ok else None
+
+    def _observe(self, source: DataSource, kind: str, latency: float, ok: bool):
+        """记录延迟统计与导出指标"""
+        self.stats[(source.name, kind)].record(latency, ok)
+        FETCH_LATENCY.observe(latency, source=source.name, kind=kind)
+        FETCH_TOTAL.inc(source=source.name, kind=kind, result='success' if ok else 'error')
+        if ok:
+            LAST_SUCCESS.set(time.time(), component=f"{kind}:{source.name}")
+
+    def _hedge_delay_for(self, source: DataSource, kind: str) -> float:
+        if self.hedge_delay is not None:
+            return self.hedge_delay
+        p95 = self.stats[(source.name, kind)].percentile(95)
+        return p95 if p95 is not None else 3.0
+
+    def fetch(self, kind: str):
+        """获取指定类型数据，返回第一个有效结果，全部失败返回 None"""
+        ranked = self.ranked_sources(kind)
+        if not ranked:
+            return None
+
+        deadline = min(time.monotonic() + self.timeout, get_deadline().expires_at)
+        pending = {}
+        queue = list(ranked)
+
+        def launch():
+            source = queue.pop(0)
+            pending[self.executor.submit(self._call, source, kind)] = source
+            return source
+
+        if self.mode == 'race':
+            while queue:
+                launch()
+        else:
+            launch()
+
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                print(f"⚠️ 获取 {kind} 超时，放弃 {len(pending)} 个未返回的数据源")
+                return None
+            wait_for = remaining
+            if queue:
+                newest = list(pending.values())[-1]
+                wait_for = min(remaining, self._hedge_delay_for(newest, kind))
+            done, _ = wait(list(pending), timeout=wait_for, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.pop(future)
+                result = future.result()
+                if result is not None:
+                    return result
+            # 超过对冲延迟或已有数据源失败，追加下一个数据源
+            if queue:
+                launch()
+
+        print(f"⚠️ 所有数据源获取 {kind} 均失败")
+        return None
+
+    def get_spot(self) -> Optional[pd.DataFrame]:
+        return self.fetch('spot')
+
+    def get_index_quotes(self) -> Optional[Dict]:
+        return self.fetch('index')
+
+    def get_north_flow(self) -> Optional[Dict]:
+        return self.fetch('north')
+
+    def stats_summary(self) -> Dict:
+        """各数据源统计摘要：{kind: {source: {...}}}"""
+        summary = {}
+        for (name, kind), stats in self.stats.items():
+            if stats.count:
+                summary.setdefault(kind, {})[name] = stats.summary()
+        return summary
+
+    def print_stats(self):
+        """打印数据源延迟统计"""
+        summary = self.stats_summary()
+        if not summary:
+            return
+        print("【数据源统计】")
+        for kind, sources in summary.items():
+            for name, s in sources.items():
+                p50 = f"{s['p50']:.2f}s" if s['p50'] is not None else '-'
+                p95 = f"{s['p95']:.2f}s" if s['p95'] is not None else '-'
+                print(f"  {kind:<6}{name:<10} 次数: {s['count']:3d} | p50: {p50} | p95: {p95} | 错误率: {s['error_rate']:.0%}")
+        print()
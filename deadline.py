@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行截止时间与可放弃的后台任务
+- Deadline：一次运行的截止时间（单调时钟），各阶段按总时长的比例分得预算
+- run_deadline()：在一次运行内设置进程级截止时间；HTTP 重试（http_resilience）与多数据源对冲
+  （data_provider）的超时不会超过它，到期后不再发起新请求、不再退避重试
+- DaemonExecutor：守护线程池，被放弃的任务（如没有超时参数的 akshare 请求）不阻塞进程退出
+
+Python 线程无法强制终止，这里的"取消"是：尚未开始的任务不再执行，进行中的任务不再等待、结果丢弃。
+
+用法：
+    with run_deadline(240) as deadline:
+        pipe.run(deadline=deadline.child(0.85))
+"""
+
+import math
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+
+class DeadlineExceeded(Exception):
+    """已超过运行截止时间"""
+
+
+class Deadline:
+    """截止时间；seconds 为 None 或 <= 0 时不限时"""
+
+    __slots__ = ('seconds', 'started', 'expires_at')
+
+    def __init__(self, seconds: Optional[float] = None, started: float = None):
+        self.seconds = seconds if seconds and seconds > 0 else None
+        self.started = time.monotonic() if started is None else started
+        self.expires_at = self.started + self.seconds if self.seconds else math.inf
+
+    @property
+    def enabled(self) -> bool:
+        return self.seconds is not None
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining(self) -> float:
+        """剩余秒数（不限时为 inf）"""
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def budget(self, fraction: float) -> Optional[float]:
+        """总时长的一部分（秒）；不限时返回 None"""
+        return self.seconds * fraction if self.enabled else None
+
+    def child(self, fraction: float) -> 'Deadline':
+        """同一起点、在总时长的 fraction 处到期的截止时间（为后续阶段预留时间）"""
+        return Deadline(self.budget(fraction), started=self.started)
+
+    def clip(self, timeout: Optional[float]) -> Optional[float]:
+        """超时不超过剩余时间（不限时原样返回）"""
+        if not self.enabled:
+            return timeout
+        remaining = self.remaining()
+        return remaining if timeout is None else min(timeout, remaining)
+
+    def check(self, what: str = '操作'):
+        """已到期时抛出 DeadlineExceeded"""
+        if self.expired:
+            raise DeadlineExceeded(f"{what}超过运行截止时间（{self.seconds:.0f}s）")
+
+
+_deadline = Deadline()
+
+
+def get_deadline() -> Deadline:
+    """当前运行的截止时间（未设置时不限时）"""
+    return _deadline
+
+
+@contextmanager
+def run_deadline(seconds: Optional[float]):
+    """在 with 块内设置进程级截止时间，退出时恢复"""
+    global _deadline
+    previous, _deadline = _deadline, Deadline(seconds)
+    try:
+        yield _deadline
+    finally:
+        _deadline = previous
+
+
+class DaemonExecutor:
+    """
+    守护线程池（submit 返回 concurrent.futures.Future）
+    concurrent.futures.ThreadPoolExecutor 在进程退出时会等待全部工作线程，挂起的请求会拖住退出；
+    这里的工作线程是守护线程，被放弃的任务不影响退出，未开始的任务可以 cancel()
+    """
+
+    def __init__(self, max_workers: int, thread_name_prefix: str = 'daemon'):
+        self.max_workers = max_workers
+        self.thread_name_prefix = thread_name_prefix
+        self._queue = queue.SimpleQueue()
+        self._idle = threading.Semaphore(0)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._shutdown = False
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("线程池已关闭")
+            self._queue.put((future, fn, args, kwargs))
+            if not self._idle.acquire(blocking=False) and len(self._threads) < self.max_workers:
+                thread = threading.Thread(target=self._work, daemon=True,
+                                          name=f"{self.thread_name_prefix}_{len(self._threads)}")
+                self._threads.append(thread)
+                thread.start()
+        return future
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            future, fn, args, kwargs = item
+            if future.set_running_or_notify_cancel():
+                try:
+                    result = fn(*args, **kwargs)
+                except BaseException as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+            self._idle.release()
+
+    def shutdown(self, wait: bool = False):
+        """通知工作线程在手头任务结束后退出；wait=True 时等待（被放弃的任务会一直挂起，慎用）"""
+        with self._lock:
+            self._shutdown = True
+            for _ in self._threads:
+                self._queue.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown(wait=False)
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据源录制/回放夹具
+用于离线、可重复的性能基准测试与回归测试
+
+模式（环境变量 FIXTURE_MODE）：
+- off:    默认，直接访问数据源
+- record: 访问数据源，同时把 akshare / efinance DataFrame 与 HTTP 响应写入夹具库
+- replay: 完全离线，从夹具库读取数据，可模拟网络延迟
+
+其他环境变量：
+- FIXTURE_DIR:     夹具库根目录（默认 fixtures）
+- FIXTURE_VERSION: 夹具版本目录（默认 v1），不同版本互不覆盖
+- FIXTURE_LATENCY: 回放延迟，数字为固定秒数，"recorded" 为按录制时的耗时回放
+
+用法：
+    python fixtures.py record                # 录制一次基金监控 + 市场情绪完整流程
+    python fixtures.py replay --latency 0.05 # 离线回放并计时
+    python fixtures.py list                  # 查看夹具清单
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict
+
+import pytz
+
+from response_cache import FIXTURE_MODE_ENV, make_cache_key, entry_from_response, response_from_entry
+
+
+FIXTURE_DIR_ENV = "FIXTURE_DIR"
+FIXTURE_VERSION_ENV = "FIXTURE_VERSION"
+FIXTURE_LATENCY_ENV = "FIXTURE_LATENCY"
+
+DEFAULT_FIXTURE_DIR = "fixtures"
+DEFAULT_FIXTURE_VERSION = "v1"
+
+# 夹具文件格式版本，格式变化时递增，旧夹具需要重新录制
+FORMAT_VERSION = 1
+
+MANIFEST_FILE = "manifest.json"
+
+TZ_CHINA = pytz.timezone('Asia/Shanghai')
+
+
+class FixtureMissError(Exception):
+    """回放模式下夹具不存在"""
+
+
+class FixtureStore:
+    """版本化夹具库：<root>/<version>/<source>/<key>.pkl + manifest.json"""
+
+    def __init__(self, mode: str = 'off', root: str = DEFAULT_FIXTURE_DIR,
+                 version: str = DEFAULT_FIXTURE_VERSION, latency=0.0):
+        if mode not in ('off', 'record', 'replay'):
+            raise ValueError(f"未知夹具模式: {mode}")
+        self.mode = mode
+        self.root = os.path.join(root, version)
+        self.version = version
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.manifest = self._load_manifest()
+        if mode == 'replay' and self.manifest.get('format') != FORMAT_VERSION:
+            raise FixtureMissError(
+                f"夹具格式版本不匹配（需要 {FORMAT_VERSION}，实际 {self.manifest.get('format')}），请重新录制"
+            )
+
+    @property
+    def active(self) -> bool:
+        return self.mode != 'off'
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.root, MANIFEST_FILE)
+
+    def _load_manifest(self) -> Dict:
+        path = self._manifest_path()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {'format': FORMAT_VERSION, 'recorded_at': None, 'entries': {}}
+
+    def _save_manifest(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self._manifest_path() + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self._manifest_path())
+
+    def _path(self, source: str, key: str) -> str:
+        return os.path.join(self.root, source, f"{key}.pkl")
+
+    def _simulate_latency(self, recorded: float):
+        if self.latency == 'recorded':
+            delay = recorded
+        else:
+            delay = float(self.latency or 0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _record(self, source: str, name: str, params: Dict, payload, elapsed: float):
+        key = make_cache_key(name, params)
+        path = self._path(source, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            now = datetime.now(TZ_CHINA).isoformat()
+            self.manifest['format'] = FORMAT_VERSION
+            self.manifest['recorded_at'] = self.manifest.get('recorded_at') or now
+            self.manifest['entries'][f"{source}/{key}"] = {
+                'name': name,
+                'params': {k: str(v) for k, v in (params or {}).items()},
+                'latency': round(elapsed, 4),
+                'recorded_at': now,
+            }
+            self._save_manifest()
+
+    def _replay(self, source: str, name: str, params: Dict):
+        key = make_cache_key(name, params)
+        meta = self.manifest['entries'].get(f"{source}/{key}")
+        path = self._path(source, key)
+        if meta is None or not os.path.exists(path):
+            raise FixtureMissError(f"缺少夹具: {source} {name} {params or ''}")
+        self._simulate_latency(meta.get('latency', 0))
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def recorded(self, source: str) -> bool:
+        """夹具库中是否有该数据源的录制"""
+        prefix = f"{source}/"
+        return any(path.startswith(prefix) for path in self.manifest['entries'])
+
+    def call(self, source: str, name: str, fetch: Callable, params: Dict = None):
+        """
+        通过夹具层调用数据源函数（akshare 等返回 Python 对象的调用）
+
+        Args:
+            source: 数据源名（akshare / http ...），决定子目录
+            name: 调用名，与 params 一起生成夹具键
+            fetch: 无参函数，off/record 模式下真正调用
+        """
+        if self.mode == 'replay':
+            return self._replay(source, name, params)
+        start = time.monotonic()
+        value = fetch()
+        if self.mode == 'record' and value is not None:
+            self._record(source, name, params, value, time.monotonic() - start)
+        return value
+
+    def http_get(self, http, url: str, params: Dict = None, **kwargs):
+        """通过夹具层发送 HTTP GET，录制/回放原始响应"""
+        if self.mode == 'off':
+            return http.get(url, params=params, **kwargs)
+        if self.mode == 'replay':
+            return response_from_entry(self._replay('http', url, params), url)
+        start = time.monotonic()
+        response = http.get(url, params=params, **kwargs)
+        self._record('http', url, params, entry_from_response(response), time.monotonic() - start)
+        return response
+
+    def frozen_now(self):
+        """回放模式下返回录制时刻，保证依赖当前时间的计算可重复；否则返回 None"""
+        if self.mode != 'replay' or not self.manifest.get('recorded_at'):
+            return None
+        return datetime.fromisoformat(self.manifest['recorded_at']).astimezone(TZ_CHINA)
+
+
+def _parse_latency(value):
+    if value in (None, ''):
+        return 0.0
+    if value == 'recorded':
+        return value
+    return float(value)
+
+
+_store = None
+
+
+def get_fixture_store() -> FixtureStore:
+    """按环境变量创建进程内共享的夹具库"""
+    global _store
+    if _store is None:
+        _store = FixtureStore(
+            mode=os.environ.get(FIXTURE_MODE_ENV, 'off'),
+            root=os.environ.get(FIXTURE_DIR_ENV, DEFAULT_FIXTURE_DIR),
+            version=os.environ.get(FIXTURE_VERSION_ENV, DEFAULT_FIXTURE_VERSION),
+            latency=_parse_latency(os.environ.get(FIXTURE_LATENCY_ENV)),
+        )
+    return _store
+
+
+def configure(mode: str, root: str = DEFAULT_FIXTURE_DIR, version: str = DEFAULT_FIXTURE_VERSION,
+              latency=0.0) -> FixtureStore:
+    """以代码方式切换夹具模式（同时设置环境变量，使响应缓存同步关闭）"""
+    global _store
+    os.environ[FIXTURE_MODE_ENV] = mode
+    _store = FixtureStore(mode=mode, root=os.path.abspath(root), version=version, latency=latency)
+    return _store
+
+
+@contextlib.contextmanager
+def isolated_run():
+    """
+    在新的临时目录运行、通知使用没有渠道的队列：
+    结果文件、峰值/历史库、通知队列不写入当前目录，回放数据产生的提醒不会发到真实渠道；
+    每次从空状态开始，录制时会请求完整数据，回放时结果可重复
+    """
+    import fund_monitor
+    from notifier import NotificationQueue
+
+    original = fund_monitor.get_notification_queue
+    silent = NotificationQueue(':memory:', channels=[])
+    fund_monitor.get_notification_queue = lambda: silent
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory(prefix='fund_fixture_') as tmp:
+            os.chdir(tmp)
+            try:
+                fund_monitor.NAV_STORE.clear()
+                yield tmp
+            finally:
+                os.chdir(cwd)
+    finally:
+        fund_monitor.get_notification_queue = original
+
+
+def run_pipelines():
+    """在隔离环境中完整运行基金监控与市场情绪流程，返回各流程耗时（秒）"""
+    import fund_monitor
+    from market_sentiment import MarketSentimentMonitor
+
+    timings = {}
+    with isolated_run():
+        start = time.perf_counter()
+        fund_monitor.generate_report()
+        timings['fund_monitor'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        MarketSentimentMonitor().print_report()
+        timings['market_sentiment'] = time.perf_counter() - start
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="数据源录制/回放夹具")
+    parser.add_argument('command', choices=['record', 'replay', 'list'])
+    parser.add_argument('--dir', default=os.environ.get(FIXTURE_DIR_ENV, DEFAULT_FIXTURE_DIR))
+    parser.add_argument('--version', default=os.environ.get(FIXTURE_VERSION_ENV, DEFAULT_FIXTURE_VERSION))
+    parser.add_argument('--latency', default=os.environ.get(FIXTURE_LATENCY_ENV),
+                        help='回放延迟：秒数或 recorded')
+    parser.add_argument('--repeat', type=int, default=1, help='回放重复次数')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        store = FixtureStore('off', args.dir, args.version)
+        entries = store.manifest['entries']
+        print(f"📦 夹具版本 {args.version} | 录制于 {store.manifest.get('recorded_at')} | 共 {len(entries)} 条")
+        for path, meta in sorted(entries.items(), key=lambda x: x[1]['name']):
+            params = ' '.join(f"{k}={v}" for k, v in meta['params'].items() if k not in ('cb', '_'))
+            print(f"  {meta['name']} {params}  {meta['latency']:.3f}s  {path}")
+        return
+
+    if args.command == 'record':
+        configure('record', args.dir, args.version)
+        timings = run_pipelines()
+        print(f"\n📦 录制完成: {os.path.join(args.dir, args.version)}")
+    else:
+        configure('replay', args.dir, args.version, _parse_latency(args.latency))
+        runs = [run_pipelines() for _ in range(args.repeat)]
+        timings = {k: min(r[k] for r in runs) for k in runs[0]}
+        print(f"\n⏱️ 离线回放 {args.repeat} 次（取最快一次）")
+
+    for name, seconds in timings.items():
+        print(f"  {name:<20} {seconds:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
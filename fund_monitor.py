@@ -12,9 +12,22 @@ from prettytable import PrettyTable
 import pytz
 import json
 import os
-import requests
+import threading
 import numpy as np
 
+from advice_rules import RuleEngine
+from deadline import get_deadline, run_deadline
+from fixtures import get_fixture_store
+from history_store import append_results
+from nav_estimator import get_nav_estimator
+from nav_history import NavHistoryStore
+from nav_store import FundRecord, NavSeries, NavStore, to_day_offsets
+from notifier import ESTIMATE_MARK, FLUSH_TIMEOUT, get_notification_queue
+from peak_store import PeakStore
+from pipeline import Pipeline
+from result_memo import ResultMemo, source_version
+from tracing import tracer
+
 # ===================== 配置区 =====================
 # 设置北京时区
 TZ_CHINA = pytz.timezone('Asia/Shanghai')
@@ -92,39 +105,72 @@ PORTFOLIO = {
     }
 }
 
-# 峰值记录文件路径
+# 峰值记录库路径（SQLite，按基金 upsert）；旧版 JSON 文件仅用于首次导入
+PEAK_DB = "peak_record.db"
 PEAK_RECORD_FILE = "peak_record.json"
 
+# 净值历史库路径（SQLite）：每天一次全市场净值快照更新，缺口基金才逐只获取完整历史
+NAV_HISTORY_DB = "nav_history.db"
+
 # 止损配置
 STOP_LOSS_THRESHOLD = -0.20  # 止损线 -20%
 EMERGENCY_STOP_LOSS = -0.30  # 紧急止损 -30%
 
+# 操作建议规则表（advice_rules.RULES），全部基金一次向量化求值
+ADVICE_RULES = RuleEngine(params={
+    'stop_loss': STOP_LOSS_THRESHOLD,
+    'emergency_stop_loss': EMERGENCY_STOP_LOSS,
+})
+
 # 缓存配置
 CACHE_DIR = "cache"
 
+# 分阶段计时 Trace 文件（Chrome Trace 格式）
+TRACE_FILE = "fund_monitor_trace.json"
+
+# 运行截止时间（秒，0 表示不限时）：单个数据源挂起不会让一次运行拖过定时任务的时间槽，
+# 到期仍未完成的净值同步 / 相关性分析 / 单只基金分析被放弃，报告用已到达的数据按时生成
+RUN_DEADLINE = float(os.environ.get('FUND_MONITOR_DEADLINE', 240))
+# 数据阶段在总时长的该比例处截止，其余时间留给汇总、输出、保存与通知投递
+DATA_DEADLINE_RATIO = 0.85
+# 各数据阶段的预算（占总时长的比例，自阶段开始计）；净值同步 + 单只基金分析不超过数据阶段截止时间
+STAGE_BUDGETS = {'nav_sync': 0.4, 'correlation': 0.4, 'fund': 0.4}
+STAGE_LABELS = {'nav_sync': '净值同步', 'correlation': '相关性分析'}
+
+# 单只基金的数据状态：ok / stale（当天净值同步未完成，使用库中已有净值）/ missing（超时或无数据，不给建议）
+STATUS_LABELS = {'ok': '正常', 'stale': '净值未更新', 'missing': '缺失'}
+MISSING_ADVICE = "❔ 数据缺失"
+
+# 单只基金结果复用：输入（最新净值、配置、定投期数、峰值、代码版本）不变时跳过重新计算
+RESULT_MEMO = ResultMemo(code_version=source_version(
+    __file__, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'advice_rules.py')))
+
 
 def load_peak_record():
-    """从文件加载峰值记录"""
-    if os.path.exists(PEAK_RECORD_FILE):
-        try:
-            with open(PEAK_RECORD_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"⚠️ 加载峰值记录失败: {e}")
-    return {code: 0.0 for code in PORTFOLIO}
+    """从峰值库加载峰值记录（首次运行自动导入旧版 peak_record.json）"""
+    peak_record = {code: 0.0 for code in PORTFOLIO}
+    try:
+        with PeakStore(PEAK_DB, legacy_file=PEAK_RECORD_FILE) as store:
+            peak_record.update(store.load())
+    except Exception as e:
+        print(f"⚠️ 加载峰值记录失败: {e}")
+    return peak_record
 
 
 def save_peak_record(peak_record):
-    """保存峰值记录到文件"""
+    """按基金写入峰值（只增不减），并发运行互不覆盖"""
     try:
-        with open(PEAK_RECORD_FILE, 'w', encoding='utf-8') as f:
-            json.dump(peak_record, f, ensure_ascii=False, indent=2)
+        with PeakStore(PEAK_DB, legacy_file=PEAK_RECORD_FILE) as store:
+            store.upsert(peak_record)
     except Exception as e:
         print(f"⚠️ 保存峰值记录失败: {e}")
 
 
 def get_now_beijing():
-    """获取当前的北京时间"""
+    """获取当前的北京时间（夹具回放模式下固定为录制时刻）"""
+    frozen = get_fixture_store().frozen_now()
+    if frozen is not None:
+        return frozen
     return datetime.now(TZ_CHINA)
 
 
@@ -135,26 +181,186 @@ def get_cache_key(code, indicator):
     return f"{code}_{indicator}_{today}"
 
 
+# 基金净值数据源覆盖（如 synthetic_data.SyntheticSource），为 None 时使用 akshare
+_nav_source = None
+
+# 净值走势指标：入库时规范化为紧凑表示（int32 日期偏移 + float 净值），常驻内存
+NAV_INDICATOR = "单位净值走势"
+NAV_STORE = NavStore()
+
+
+def set_nav_source(source):
+    """替换基金净值数据源（需实现 DataSource.get_fund_nav），传 None 恢复 akshare"""
+    global _nav_source
+    _nav_source = source
+    NAV_STORE.clear()
+
+
+def fetch_fund_info(code, indicator):
+    """调用 akshare 获取基金数据（经过录制/回放夹具层）"""
+    with tracer.span('fetch', fund=code):
+        if _nav_source is not None:
+            return _nav_source.get_fund_nav(code)
+        return get_fixture_store().call(
+            'akshare', 'ak.fund_open_fund_info_em',
+            lambda: ak.fund_open_fund_info_em(symbol=code, indicator=indicator),
+            params={'symbol': code, 'indicator': indicator}
+        )
+
+
+# 同一基金数据的并发读取（相关性分析与单基金分析并行）串行化，只获取一次
+_data_locks = {}
+_data_locks_guard = threading.Lock()
+
+
+def _data_lock(key):
+    with _data_locks_guard:
+        return _data_locks.setdefault(key, threading.Lock())
+
+
+def fetch_daily_snapshot():
+    """调用 akshare 获取全市场开放式基金净值快照（一次请求，经过录制/回放夹具层）"""
+    with tracer.span('fetch_snapshot'):
+        return get_fixture_store().call(
+            'akshare', 'ak.fund_open_fund_daily_em',
+            lambda: ak.fund_open_fund_daily_em(),
+            params={}
+        )
+
+
+_nav_history = None
+_nav_history_lock = threading.Lock()
+_nav_sync_lock = threading.Lock()
+# 本次运行的净值同步已超时放弃：各基金不再逐只同步，直接使用库中已有净值
+_nav_sync_abandoned = threading.Event()
+
+
+def get_nav_history():
+    """进程内共享的净值历史库"""
+    global _nav_history
+    with _nav_history_lock:
+        if _nav_history is None:
+            _nav_history = NavHistoryStore(NAV_HISTORY_DB)
+        return _nav_history
+
+
+@tracer.traced('nav_sync')
+def sync_nav_history(codes, store=None, workers=1):
+    """每日同步净值历史库（一次全市场快照 + 缺口基金逐只获取，workers > 1 时并行）；录制/回放与替换数据源时跳过"""
+    stats = {'snapshot': 0, 'history': [], 'failed': []}
+    if get_fixture_store().active or _nav_source is not None:
+        return stats
+    store = store or get_nav_history()
+    # 被放弃的同步可能仍持有锁，等待不超过运行截止时间
+    timeout = get_deadline().clip(None)
+    if not _nav_sync_lock.acquire(timeout=-1 if timeout is None else timeout):
+        print("⚠️ 等待净值同步超过运行截止时间，使用库中已有净值")
+        return stats
+    try:
+        stats = store.sync(codes, fetch_daily_snapshot,
+                           lambda code: fetch_fund_info(code, NAV_INDICATOR),
+                           today=get_now_beijing().date(), workers=workers)
+    except Exception as e:
+        print(f"⚠️ 同步净值历史失败: {e}")
+        return stats
+    finally:
+        _nav_sync_lock.release()
+    # 已入内存的旧净值失效
+    for code in codes:
+        NAV_STORE.discard(code)
+    if stats['snapshot'] or stats['history']:
+        print(f"📥 净值同步：全市场快照更新 {stats['snapshot']} 只，逐只获取历史 {len(stats['history'])} 只")
+    return stats
+
+
 def get_cached_data(code, indicator):
     """获取缓存数据（优化 7）"""
-    if not os.path.exists(CACHE_DIR):
-        os.makedirs(CACHE_DIR)
+    if indicator != NAV_INDICATOR:
+        with _data_lock((code, indicator)):
+            return _load_fund_data(code, indicator)
+    series = get_nav_series(code)
+    return series.to_frame() if series is not None else None
+
+
+def get_nav_series(code):
+    """基金净值的紧凑表示（NavSeries：int32 日期偏移 + float 净值），当天已入库的直接从内存返回"""
+    with _data_lock((code, NAV_INDICATOR)):
+        version = get_cache_key(code, NAV_INDICATOR)
+        record = NAV_STORE.get(code, version)
+        if record is None:
+            series = _load_nav_series(code)
+            if series is None:
+                return None
+            record = FundRecord(code, series, name=PORTFOLIO.get(code, {}).get('name', ''), version=version)
+            NAV_STORE.put(record)
+        return record.series
+
+
+def _load_nav_series(code):
+    """录制/回放与替换数据源时直接获取；否则读取净值历史库（当天尚未同步的先同步）"""
+    if get_fixture_store().active or _nav_source is not None:
+        df = _load_fund_data(code, NAV_INDICATOR)
+        if df is None:
+            return None
+        try:
+            return NavSeries.from_frame(df)
+        except Exception as e:
+            print(f"⚠️ 基金 {code} 净值数据格式异常: {e}")
+            return None
+    
+    store = get_nav_history()
+    if store.checked(code) != get_now_beijing().date().isoformat() \
+            and not _nav_sync_abandoned.is_set() and not get_deadline().expired:
+        sync_nav_history([code])
+    return store.load(code)
+
+
+def nav_status(code):
+    """数据状态与最新净值日期：当天净值同步未完成的为 stale（录制/回放与替换数据源时总是 ok）"""
+    series = get_nav_series(code)
+    status = 'ok'
+    if not (get_fixture_store().active or _nav_source is not None) \
+            and get_nav_history().checked(code) != get_now_beijing().date().isoformat():
+        status = 'stale'
+    return {
+        'status': status,
+        'nav_date': str(series.dates[-1]) if series is not None and len(series) else None,
+    }
+
+
+def missing_result(code, info):
+    """超时或无数据的基金：只保留代码、名称与状态"""
+    return {'code': code, 'name': info['name'], 'status': 'missing'}
+
+
+def _load_fund_data(code, indicator):
+    """读取当天磁盘缓存或从数据源获取；录制/回放与替换数据源时不读写磁盘缓存，保证每个调用都经过夹具层"""
+    if get_fixture_store().active or _nav_source is not None:
+        try:
+            return fetch_fund_info(code, indicator)
+        except Exception as e:
+            print(f"⚠️ 获取数据失败: {e}")
+            return None
+    
+    os.makedirs(CACHE_DIR, exist_ok=True)
     
     cache_key = get_cache_key(code, indicator)
     cache_file = os.path.join(CACHE_DIR, f"{cache_key}.pkl")
     
     if os.path.exists(cache_file):
         try:
-            return pd.read_pickle(cache_file)
+            with tracer.span('cache_read', fund=code):
+                return pd.read_pickle(cache_file)
         except Exception as e:
             print(f"⚠️ 读取缓存失败: {e}")
     
     # 获取新数据
     try:
-        df = ak.fund_open_fund_info_em(symbol=code, indicator=indicator)
+        df = fetch_fund_info(code, indicator)
         # 保存缓存
         try:
-            df.to_pickle(cache_file)
+            with tracer.span('cache_write', fund=code):
+                df.to_pickle(cache_file)
         except:
             pass
         return df
@@ -163,16 +369,17 @@ def get_cached_data(code, indicator):
         return None
 
 
+@tracer.traced('nav_ma')
 def get_nav_and_ma(code):
     """获取基金净值和20日均线"""
     try:
-        df = get_cached_data(code, "单位净值走势")
-        if df is None:
+        series = get_nav_series(code)
+        if series is None:
             return None, None
         
-        df['单位净值'] = df['单位净值'].astype(float)
-        ma20 = df['单位净值'].rolling(window=20).mean().iloc[-1]
-        curr_nav = df.iloc[-1]['单位净值']
+        navs = pd.Series(series.navs, dtype=np.float64)
+        ma20 = navs.rolling(window=20).mean().iloc[-1]
+        curr_nav = navs.iloc[-1]
         return curr_nav, ma20
     except Exception as e:
         print(f"⚠️ 获取基金 {code} 数据失败: {e}")
@@ -193,36 +400,30 @@ def simulate_investment(info, curr_nav):
     return new_shares, avg_cost
 
 
+@tracer.traced('dca_simulation')
 def simulate_investment_accurate(info, code, curr_nav):
     """精确的定投模拟（优化 1：基于历史净值）"""
     try:
-        df = get_cached_data(code, "单位净值走势")
-        if df is None:
+        series = get_nav_series(code)
+        if series is None:
             return simulate_investment(info, curr_nav)
         
-        df['净值日期'] = pd.to_datetime(df['净值日期'])
-        df['单位净值'] = df['单位净值'].astype(float)
-        df = df.sort_values('净值日期')
+        start_day = to_day_offsets([info['start_date']])[0]
         
-        start_date = pd.to_datetime(info['start_date'])
-        total_shares = info['init_shares']
-        total_cost = info['init_shares'] * info['init_cost']
+        # 获取当前日期（北京时间，不带时区）
+        today = to_day_offsets([get_now_beijing().date()])[0]
         
-        # 获取当前日期（不带时区）
-        today = pd.Timestamp.now().normalize()
+        # 全部定投日（起始日后每 invest_cycle 天一次），在已排序的净值日期上二分查找最近的交易日净值
+        invest_days = np.arange(start_day + info['invest_cycle'], today + 1, info['invest_cycle'])
+        idx = np.searchsorted(series.days, invest_days, side='right') - 1
+        navs_on_date = series.navs[idx[idx >= 0]].astype(np.float64)
         
-        # 模拟每次定投
-        current_date = start_date + pd.Timedelta(days=info['invest_cycle'])
-        while current_date <= today:
-            # 找到最近的交易日净值
-            available_navs = df[df['净值日期'] <= current_date]
-            if len(available_navs) > 0:
-                nav_on_date = available_navs.iloc[-1]['单位净值']
-                shares_bought = info['invest_amount'] / nav_on_date
-                total_shares += shares_bought
-                total_cost += info['invest_amount']
-            
-            current_date += pd.Timedelta(days=info['invest_cycle'])
+        # 按定投顺序累加（cumsum 逐项相加，与逐次定投的累加结果一致）
+        shares_bought = info['invest_amount'] / navs_on_date
+        total_shares = np.cumsum(np.concatenate([[info['init_shares']], shares_bought]))[-1]
+        total_cost = np.cumsum(np.concatenate(
+            [[info['init_shares'] * info['init_cost']], np.full(len(navs_on_date), float(info['invest_amount']))]
+        ))[-1]
         
         avg_cost = total_cost / total_shares if total_shares > 0 else info['init_cost']
         return total_shares, avg_cost
@@ -231,17 +432,17 @@ def simulate_investment_accurate(info, code, curr_nav):
         return simulate_investment(info, curr_nav)
 
 
+@tracer.traced('risk_metrics')
 def calculate_risk_metrics(code, days=60):
     """计算夏普比率和波动率（优化 2）"""
     try:
-        df = get_cached_data(code, "单位净值走势")
-        if df is None:
+        series = get_nav_series(code)
+        if series is None:
             return 0, 0, 0
         
-        df['单位净值'] = df['单位净值'].astype(float)
-        df['return'] = df['单位净值'].pct_change()
+        returns = pd.Series(series.navs, dtype=np.float64).pct_change()
         
-        recent_returns = df['return'].tail(days).dropna()
+        recent_returns = returns.tail(days).dropna()
         
         if len(recent_returns) < 10:
             return 0, 0, 0
@@ -259,29 +460,16 @@ def calculate_risk_metrics(code, days=60):
         return 0, 0, 0
 
 
-def get_dynamic_thresholds(volatility, base_target, base_callback):
-    """根据波动率动态调整止盈阈值（优化 4）"""
-    if volatility > 0.3:  # 高波动（年化 > 30%）
-        # 波动大，提高止盈目标，放宽回撤容忍
-        return base_target * 1.5, base_callback * 1.5
-    elif volatility < 0.15:  # 低波动（年化 < 15%）
-        # 波动小，降低止盈目标，收紧回撤容忍
-        return base_target * 0.8, base_callback * 0.8
-    else:
-        return base_target, base_callback
-
-
+@tracer.traced('correlation')
 def analyze_portfolio_correlation():
     """分析投资组合相关性（优化 3）"""
     try:
         nav_data = {}
         for code, info in PORTFOLIO.items():
-            df = get_cached_data(code, "单位净值走势")
-            if df is None:
+            series = get_nav_series(code)
+            if series is None:
                 continue
-            df['净值日期'] = pd.to_datetime(df['净值日期'])
-            df = df.set_index('净值日期')
-            nav_data[info['name']] = df['单位净值'].astype(float)
+            nav_data[info['name']] = pd.Series(series.navs, index=series.dates, dtype=np.float64)
         
         if len(nav_data) < 2:
             return None, []
@@ -308,147 +496,210 @@ def analyze_portfolio_correlation():
         return None, []
 
 
-def send_serverchan_notification(title, content):
-    """
-    发送 Server酱 通知到微信
+def result_memo_key(code, info, peak):
+    """单只基金结果的缓存键：最新净值日期/数值、配置项、已发生定投期数、历史峰值、代码版本"""
+    series = get_nav_series(code)
+    if series is None or len(series) == 0:
+        return None
     
-    Args:
-        title: 通知标题
-        content: 通知内容（支持 Markdown）
-    """
-    sendkey = os.environ.get('SERVER_CHAN_KEY')
-    if not sendkey:
-        print("⚠️ 未配置 SERVER_CHAN_KEY，跳过通知发送")
-        return False
+    # 定投期数随日期增长，即使没有新净值也会改变成本
+    today = get_now_beijing().date()
+    days_passed = (today - datetime.strptime(info['start_date'], '%Y-%m-%d').date()).days
+    installments = days_passed // info['invest_cycle'] if days_passed >= 0 else 0
     
-    url = f"https://sctapi.ftqq.com/{sendkey}.send"
+    return RESULT_MEMO.make_key(code, {
+        'last_nav_date': str(series.dates[-1]),
+        'last_nav': series.last_nav,
+        'nav_count': len(series),
+        'config': info,
+        'installments': installments,
+        'peak': float(peak),
+    })
+
+
+def analyze_fund(code, info, peak_record):
+    """分析单只基金，更新 peak_record 并返回结果字典；无数据返回 None"""
+    with tracer.span('fund', fund=code):
+        result = _analyze_fund(code, info, peak_record)
+        if result is not None:
+            result = apply_nav_estimate(code, info, result, peak_record.get(code, 0))
+            result = {**result, **nav_status(code)}
+        return result
+
+
+# 提醒级别严重程度（估算净值触发更严重的提醒时提前预警）
+ALERT_SEVERITY = {"low": 0, "medium": 1, "high": 2, "critical": 3}
+
+
+@tracer.traced('nav_estimate')
+def apply_nav_estimate(code, info, result, peak):
+    """QDII 基金用代理 ETF 行情估算最新净值（不写入峰值、不进入结果缓存），建议在 decide_all 中给出"""
+    if _nav_source is not None:
+        return result
+    estimate = get_nav_estimator().estimate(code, get_nav_series(code))
+    if estimate is None:
+        return result
     
-    try:
-        response = requests.post(url, data={
-            "title": title,
-            "desp": content
-        }, timeout=10)
-        
-        result = response.json()
-        if result.get('code') == 0:
-            print(f"✅ Server酱通知发送成功")
-            return True
-        else:
-            print(f"⚠️ Server酱通知发送失败: {result.get('message', '未知错误')}")
-            return False
-    except Exception as e:
-        print(f"❌ Server酱通知发送异常: {e}")
-        return False
+    est_nav = estimate['nav']
+    return {
+        **result,
+        "est_nav": est_nav,
+        "est_change": estimate['change'],
+        "est_as_of": estimate['as_of'],
+        "est_profit_rate": (est_nav - result['cost']) / result['cost'],
+        "est_drawdown": max((peak - est_nav) / peak, 0) if peak > 0 else 0,
+    }
 
 
-def generate_report():
-    """生成监控报告"""
-    peak_record = load_peak_record()
+@tracer.traced('decision')
+def decide_all(results):
+    """
+    用规则表一次性给出全部基金的操作建议与提醒级别（含估算净值）
+    估算净值触发更严重的提醒时提前预警，操作建议标注"(估)"；缺失数据的基金不参与求值
+    """
+    rows = []
+    for r in results:
+        if r.get('status') == 'missing':
+            continue
+        info = PORTFOLIO[r['code']]
+        base = {
+            'sharpe': r['sharpe'],
+            'volatility': r['volatility'],
+            'base_target': info['target'],
+            'base_callback': info['callback'],
+        }
+        rows.append({**base, 'profit_rate': r['profit_rate'], 'drawdown': r['drawdown'],
+                     'is_broken_ma': r['nav'] < r['ma20']})
+        if r.get('est_nav') is not None:
+            rows.append({**base, 'profit_rate': r['est_profit_rate'], 'drawdown': r['est_drawdown'],
+                         'is_broken_ma': r['est_nav'] < r['ma20']})
+    
+    decisions = iter(ADVICE_RULES.evaluate_records(rows) if rows else ())
+    decided = []
+    for r in results:
+        if r.get('status') == 'missing':
+            decided.append({**r, "advice": MISSING_ADVICE, "alert_level": "unknown"})
+            continue
+        advice, alert_level = next(decisions)
+        r = {**r, "advice": advice, "alert_level": alert_level}
+        if r.get('est_nav') is not None:
+            est_advice, est_alert_level = next(decisions)
+            r.update(est_advice=est_advice, est_alert_level=est_alert_level)
+            if ALERT_SEVERITY[est_alert_level] > ALERT_SEVERITY[alert_level]:
+                r['advice'] = f"{est_advice}{ESTIMATE_MARK}"
+                r['alert_level'] = est_alert_level
+        decided.append(r)
+    return decided
+
+
+def _analyze_fund(code, info, peak_record):
+    curr_nav, ma20 = get_nav_and_ma(code)
+    if curr_nav is None:
+        return None
+    
+    # 更新峰值
+    if curr_nav > peak_record.get(code, 0):
+        peak_record[code] = curr_nav
+    
+    memo_key = result_memo_key(code, info, peak_record[code])
     
+    # 输入未变化（如 QDII 境外节假日无新净值）时直接复用上次结果
+    if memo_key is not None:
+        with tracer.span('memo_lookup'):
+            cached = RESULT_MEMO.get(memo_key)
+        if cached is not None:
+            RESULT_MEMO.record(code, reused=True)
+            return cached
+    
+    # 使用精确定投模拟（优化 1）
+    curr_shares, curr_cost = simulate_investment_accurate(info, code, curr_nav)
+    profit_rate = (curr_nav - curr_cost) / curr_cost
+    drawdown = (peak_record[code] - curr_nav) / peak_record[code] if peak_record[code] > 0 else 0
+    profit_amount = (curr_nav - curr_cost) * curr_shares
+    
+    # 计算风险指标（优化 2）；操作建议由 decide_all 按规则表统一给出
+    sharpe, volatility, ann_return = calculate_risk_metrics(code)
+    
+    result = {
+        "code": code,
+        "name": info['name'],
+        "nav": curr_nav,
+        "ma20": ma20,
+        "cost": curr_cost,
+        "profit_rate": profit_rate,
+        "profit_amount": profit_amount,
+        "drawdown": drawdown,
+        "sharpe": sharpe,
+        "volatility": volatility
+    }
+    
+    if memo_key is not None:
+        RESULT_MEMO.put(memo_key, result)
+    RESULT_MEMO.record(code, reused=False)
+    return result
+
+
+@tracer.traced('rendering')
+def build_report_tables(results):
+    """构建结果表格与逻辑说明表格"""
     # 添加更多列显示风险指标
     table = PrettyTable()
-    table.field_names = ["基金名称", "当前净值", "MA20", "动态成本", "收益率", "盈利金额", "回撤", "夏普比率", "波动率", "操作建议"]
+    table.field_names = ["基金名称", "数据", "当前净值", "估算净值", "MA20", "动态成本", "收益率", "盈利金额", "回撤", "夏普比率", "波动率", "操作建议"]
     table.align["基金名称"] = "l"
     
-    results = []
-    
-    # 先分析组合相关性
-    print("\n🔍 分析投资组合相关性...")
-    corr_matrix, high_corr_pairs = analyze_portfolio_correlation()
-    
-    for code, info in PORTFOLIO.items():
-        curr_nav, ma20 = get_nav_and_ma(code)
-        if curr_nav is None:
+    for r in results:
+        status = r.get('status', 'ok')
+        if status == 'missing':
+            table.add_row([r['name'], STATUS_LABELS[status]] + ["-"] * 9 + [r['advice']])
             continue
-        
-        # 更新峰值
-        if curr_nav > peak_record.get(code, 0):
-            peak_record[code] = curr_nav
-        
-        # 使用精确定投模拟（优化 1）
-        curr_shares, curr_cost = simulate_investment_accurate(info, code, curr_nav)
-        profit_rate = (curr_nav - curr_cost) / curr_cost
-        drawdown = (peak_record[code] - curr_nav) / peak_record[code] if peak_record[code] > 0 else 0
-        profit_amount = (curr_nav - curr_cost) * curr_shares
-        
-        # 计算风险指标（优化 2）
-        sharpe, volatility, ann_return = calculate_risk_metrics(code)
-        
-        # 动态调整阈值（优化 4）
-        dynamic_target, dynamic_callback = get_dynamic_thresholds(
-            volatility, info['target'], info['callback']
-        )
-        
-        is_broken_ma = curr_nav < ma20
-        
-        # 增强决策逻辑（包含优化 5：止损）
-        if profit_rate <= EMERGENCY_STOP_LOSS:
-            advice = "🛑 紧急止损"
-            alert_level = "critical"
-        elif profit_rate <= STOP_LOSS_THRESHOLD:
-            if is_broken_ma:
-                advice = "🛑 止损建议"
-                alert_level = "high"
-            else:
-                advice = "⚠️ 接近止损"
-                alert_level = "medium"
-        elif profit_rate >= dynamic_target:
-            # 使用动态阈值
-            if drawdown >= dynamic_callback and is_broken_ma:
-                advice = "🚨 趋势反转(止盈)"
-                alert_level = "high"
-            elif drawdown >= dynamic_callback:
-                advice = "⚠️ 触发回撤"
-                alert_level = "medium"
-            else:
-                # 根据夏普比率调整建议
-                if sharpe > 1.5:
-                    advice = "🔥 强势持有(高质量)"
-                else:
-                    advice = "🔥 强势持有"
-                alert_level = "low"
-        elif is_broken_ma:
-            advice = "🛡️ 均线下方"
-            alert_level = "low"
-        else:
-            advice = "🟢 定投中"
-            alert_level = "low"
-        
         table.add_row([
-            info['name'], 
-            f"{curr_nav:.4f}", 
-            f"{ma20:.4f}", 
-            f"{curr_cost:.4f}",
-            f"{profit_rate:.2%}", 
-            f"{profit_amount:.2f}", 
-            f"{drawdown:.2%}",
-            f"{sharpe:.2f}",
-            f"{volatility:.1%}",
-            advice
+            r['name'], 
+            STATUS_LABELS[status] if status == 'ok' else f"{STATUS_LABELS[status]}({r['nav_date']})",
+            f"{r['nav']:.4f}", 
+            f"{r['est_nav']:.4f} ({r['est_change']:+.2%})" if r.get('est_nav') is not None else "-",
+            f"{r['ma20']:.4f}", 
+            f"{r['cost']:.4f}",
+            f"{r['profit_rate']:.2%}", 
+            f"{r['profit_amount']:.2f}", 
+            f"{r['drawdown']:.2%}",
+            f"{r['sharpe']:.2f}",
+            f"{r['volatility']:.1%}",
+            r['advice']
         ])
-        
-        results.append({
-            "code": code,
-            "name": info['name'],
-            "nav": curr_nav,
-            "ma20": ma20,
-            "cost": curr_cost,
-            "profit_rate": profit_rate,
-            "profit_amount": profit_amount,
-            "drawdown": drawdown,
-            "sharpe": sharpe,
-            "volatility": volatility,
-            "advice": advice,
-            "alert_level": alert_level
-        })
-    
-    # 保存更新后的峰值记录
-    save_peak_record(peak_record)
-    
-    # 输出报告
+    
+    help_table = PrettyTable()
+    help_table.field_names = ["优先级", "状态显示", "背后逻辑"]
+    for row in ADVICE_RULES.help_rows():
+        help_table.add_row(row)
+    return table, help_table
+
+
+def data_status_notes(results, timed_out=()):
+    """缺失 / 净值未更新的基金与超时放弃的阶段（控制台、结果文件与通知共用）"""
+    notes = []
+    missing = [r['name'] for r in results if r.get('status') == 'missing']
+    stale = [f"{r['name']}({r['nav_date']})" for r in results if r.get('status') == 'stale']
+    if missing:
+        notes.append(f"数据缺失 {len(missing)} 只（超时或无数据，本次不给建议）: {'、'.join(missing)}")
+    if stale:
+        notes.append(f"净值未更新 {len(stale)} 只（当天同步未完成，沿用库中净值）: {'、'.join(stale)}")
+    stages = [STAGE_LABELS.get(name, name) for name in timed_out if not name.startswith('fund:')]
+    if stages:
+        notes.append(f"超时放弃: {'、'.join(stages)}")
+    return notes
+
+
+@tracer.traced('rendering')
+def print_report_tables(table, help_table, high_corr_pairs, notes=()):
+    """输出报告到控制台"""
     print(f"\n📊 增强型动态止盈监控 | 北京时间 (UTC+8): {get_now_beijing().strftime('%Y-%m-%d %H:%M:%S')}")
     print(table)
     
+    if notes:
+        print("\n⏱️ 数据不完整：")
+        for note in notes:
+            print(f"  • {note}")
+    
     # 输出相关性警告
     if high_corr_pairs:
         print("\n⚠️ 高相关性警告：")
@@ -457,15 +708,6 @@ def generate_report():
         print("  建议：考虑替换其中一只基金以提高分散度")
     
     print("\n📖 逻辑说明看板：")
-    help_table = PrettyTable()
-    help_table.field_names = ["优先级", "状态显示", "背后逻辑"]
-    help_table.add_row(["0", "🛑 紧急止损", "亏损 ≥ 30% (保护本金)"])
-    help_table.add_row(["1", "🛑 止损建议", "亏损 ≥ 20% + 跌破均线 (风险控制)"])
-    help_table.add_row(["2", "🚨 趋势反转", "收益达标 + 跌破均线 + 回撤超标 (锁定利润)"])
-    help_table.add_row(["3", "⚠️ 触发回撤", "收益达标 + 回撤超标 (警惕)"])
-    help_table.add_row(["4", "🔥 强势持有", "收益达标 + 未触发回撤 (继续持有)"])
-    help_table.add_row(["5", "🛡️ 均线下方", "收益未达标 + 跌破均线 (弱势观察)"])
-    help_table.add_row(["6", "🟢 定投中", "正常定投状态"])
     print(help_table)
     
     print("\n💡 优化说明：")
@@ -474,68 +716,244 @@ def generate_report():
     print("  ✅ 夏普比率：评估风险调整后收益质量")
     print("  ✅ 动态阈值：根据波动率自动调整止盈参数")
     print("  ✅ 数据缓存：提高运行速度")
-    
-    # 保存结果到文件
+
+
+@tracer.traced('persistence')
+def save_results(table, help_table, results, timed_out=()):
+    """保存结果到文本与 JSON 文件；缺失 / 净值未更新的基金与超时放弃的阶段单独标注"""
+    notes = data_status_notes(results, timed_out)
     with open('fund_monitor_result.txt', 'w', encoding='utf-8') as f:
         f.write(f"📊 增强型动态止盈监控 | 北京时间: {get_now_beijing().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
         f.write(str(table))
         f.write("\n\n")
+        if notes:
+            f.write("⏱️ 数据不完整：\n" + "".join(f"  • {note}\n" for note in notes) + "\n")
         f.write(str(help_table))
     
-    # 保存 JSON 格式结果
+    # 保存 JSON 格式结果（附各阶段、各基金耗时）
+    timestamp = get_now_beijing().isoformat()
+    output = {
+        "timestamp": timestamp,
+        "partial": bool(timed_out) or any(r.get('status', 'ok') != 'ok' for r in results),
+        "deadline": RUN_DEADLINE or None,
+        "timed_out": list(timed_out),
+        "stale": [r['code'] for r in results if r.get('status') == 'stale'],
+        "missing": [r['code'] for r in results if r.get('status') == 'missing'],
+        "results": results,
+        "memo": RESULT_MEMO.summary()
+    }
+    if tracer.enabled:
+        output["timings"] = tracer.summary()
     with open('fund_monitor_result.json', 'w', encoding='utf-8') as f:
-        json.dump({
-            "timestamp": get_now_beijing().isoformat(),
-            "results": results
-        }, f, ensure_ascii=False, indent=2)
+        json.dump(output, f, ensure_ascii=False, indent=2)
     
-    print("\n✅ 监控完成，结果已保存到 fund_monitor_result.txt 和 fund_monitor_result.json")
-    
-    # 检查是否需要发送通知（包含止损信号）
-    alert_funds = [r for r in results if r['alert_level'] in ['critical', 'high']]
+    # 追加到历史结果库（JSON/TXT 每次覆盖，历史保存在 SQLite 中）；缺失数据的基金不写入
+    append_results(timestamp, [r for r in results if r.get('status') != 'missing'])
+
+
+def build_notification(alert_funds, notes=()):
+    """构建通知标题与 Markdown 内容（notes 为数据不完整说明，见 data_status_notes）；没有提醒时只发送数据不完整摘要"""
+    notification_title = f"📊 基金监控提醒 ({len(alert_funds)}只基金)" if alert_funds else "⏱️ 基金监控数据不完整"
+    notification_content = "## 📊 基金监控提醒\n\n" if alert_funds else "## ⏱️ 基金监控数据不完整\n\n"
+    notification_content += f"**时间**: {get_now_beijing().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
     
-    if alert_funds:
-        # 构建通知内容
-        notification_title = f"📊 基金监控提醒 ({len(alert_funds)}只基金)"
-        notification_content = f"## 📊 基金监控提醒\n\n"
-        notification_content += f"**时间**: {get_now_beijing().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
+    for fund in alert_funds:
+        if fund['advice'].startswith("🛑"):
+            icon = "🛑"
+        elif fund['advice'].startswith("🚨 趋势反转(止盈)"):
+            icon = "🚨"
+        else:
+            icon = "⚠️"
         
-        for fund in alert_funds:
-            if fund['advice'].startswith("🛑"):
-                icon = "🛑"
-            elif fund['advice'] == "🚨 趋势反转(止盈)":
-                icon = "🚨"
-            else:
-                icon = "⚠️"
-            
-            notification_content += f"### {icon} {fund['name']} - {fund['advice']}\n"
-            notification_content += f"- 当前净值: **{fund['nav']:.4f}**\n"
-            notification_content += f"- 动态成本: {fund['cost']:.4f}\n"
-            notification_content += f"- 收益率: **{fund['profit_rate']:.2%}**\n"
-            notification_content += f"- 盈利金额: **{fund['profit_amount']:.2f}元**\n"
-            notification_content += f"- 回撤: {fund['drawdown']:.2%}\n"
-            notification_content += f"- 夏普比率: {fund['sharpe']:.2f}\n"
-            
-            if fund['advice'].startswith("🛑"):
-                notification_content += f"\n**建议**: 立即止损，保护本金\n"
-            elif fund['advice'] == "🚨 趋势反转(止盈)":
-                notification_content += f"\n**建议**: 考虑止盈锁定利润\n"
-            else:
-                notification_content += f"\n**建议**: 警惕回撤风险\n"
-            
-            notification_content += "\n---\n\n"
+        notification_content += f"### {icon} {fund['name']} - {fund['advice']}\n"
+        notification_content += f"- 当前净值: **{fund['nav']:.4f}**\n"
+        if fund.get('est_nav') is not None:
+            notification_content += f"- 估算净值: **{fund['est_nav']:.4f}** ({fund['est_change']:+.2%}，{fund['est_as_of']} 行情)\n"
+        notification_content += f"- 动态成本: {fund['cost']:.4f}\n"
+        notification_content += f"- 收益率: **{fund['profit_rate']:.2%}**\n"
+        notification_content += f"- 盈利金额: **{fund['profit_amount']:.2f}元**\n"
+        notification_content += f"- 回撤: {fund['drawdown']:.2%}\n"
+        notification_content += f"- 夏普比率: {fund['sharpe']:.2f}\n"
         
-        notification_content += f"[查看详细报告](https://github.com/cryboy007/fund-monitor/actions)"
+        if fund['advice'].startswith("🛑"):
+            notification_content += f"\n**建议**: 立即止损，保护本金\n"
+        elif fund['advice'].startswith("🚨 趋势反转(止盈)"):
+            notification_content += f"\n**建议**: 考虑止盈锁定利润\n"
+        else:
+            notification_content += f"\n**建议**: 警惕回撤风险\n"
         
-        # 发送通知
-        send_serverchan_notification(notification_title, notification_content)
-    else:
+        notification_content += "\n---\n\n"
+    
+    if notes:
+        notification_content += "### ⏱️ 数据不完整\n"
+        notification_content += "".join(f"- {note}\n" for note in notes) + "\n"
+    
+    notification_content += f"[查看详细报告](https://github.com/cryboy007/fund-monitor/actions)"
+    return notification_title, notification_content
+
+
+def generate_report():
+    """生成监控报告"""
+    tracer.reset()
+    with run_deadline(RUN_DEADLINE), tracer.span('generate_report'):
+        _generate_report()
+    
+    if tracer.enabled:
+        tracer.print_summary()
+        try:
+            tracer.write_chrome_trace(TRACE_FILE)
+        except Exception as e:
+            print(f"⚠️ 保存 Trace 失败: {e}")
+
+
+def _generate_report():
+    RESULT_MEMO.reset_stats()
+    _nav_sync_abandoned.clear()
+    deadline = get_deadline()
+    
+    # 报告流程按依赖关系组成 DAG：相关性分析、各基金分析并行，
+    # 峰值/结果文件写入与通知发送在后台执行，不阻塞报告输出；
+    # 数据阶段超过预算或截止时间时放弃，以降级结果（空同步 / 无相关性 / 缺失基金）继续生成报告
+    pipe = Pipeline()
+    pipe.add('nav_sync', lambda: sync_nav_history(list(PORTFOLIO)),
+             budget=deadline.budget(STAGE_BUDGETS['nav_sync']), fallback=_nav_sync_timed_out)
+    pipe.add('peak_record', load_peak_record)
+    pipe.add('correlation', lambda _synced: _correlation_stage(), inputs=['nav_sync'],
+             budget=deadline.budget(STAGE_BUDGETS['correlation']), fallback=lambda: (None, []))
+    fund_stages = []
+    for code, info in PORTFOLIO.items():
+        name = f'fund:{code}'
+        pipe.add(name, lambda peak_record, _synced, code=code, info=info: analyze_fund(code, info, peak_record),
+                 inputs=['peak_record', 'nav_sync'], budget=deadline.budget(STAGE_BUDGETS['fund']),
+                 fallback=lambda code=code, info=info: missing_result(code, info))
+        fund_stages.append(name)
+    pipe.add('results', _results_stage, inputs=fund_stages)
+    pipe.add('memo_report', _memo_report_stage, inputs=['results'])
+    pipe.add('save_peak_record', _save_peak_stage, inputs=['peak_record', 'results'], background=True)
+    pipe.add('tables', build_report_tables, inputs=['results'])
+    # 依赖 correlation 的阶段运行时，全部可放弃的阶段都已结束，pipe.timed_out 完整
+    pipe.add('print_report', lambda tables, corr, results:
+             print_report_tables(*tables, corr[1], data_status_notes(results, pipe.timed_out)),
+             inputs=['tables', 'correlation', 'results'])
+    pipe.add('save_results', lambda tables, results, _corr: save_results(*tables, results, list(pipe.timed_out)),
+             inputs=['tables', 'results', 'correlation'], background=True)
+    pipe.add('notification', lambda results, _printed:
+             _notification_stage(results, data_status_notes(results, pipe.timed_out)),
+             inputs=['results', 'print_report'], background=True)
+    pipe.run(deadline=deadline.child(DATA_DEADLINE_RATIO))
+    # 通知投递等待不超过剩余时间，未发出的消息留在发件箱下次重试
+    get_notification_queue().wait(deadline.clip(FLUSH_TIMEOUT))
+    
+    print(f"\n⚡ 关键路径耗时 {pipe.critical_path_time:.2f}s（后台写入与通知不计入）")
+    if pipe.timed_out:
+        print(f"⏱️ 运行截止时间 {RUN_DEADLINE:.0f}s：{len(pipe.timed_out)} 个阶段超时放弃，报告基于已到达的数据")
+    print("\n✅ 监控完成，结果已保存到 fund_monitor_result.txt 和 fund_monitor_result.json")
+
+
+def _nav_sync_timed_out():
+    """净值同步超时：本次运行不再逐只同步，各基金使用库中已有净值（标注为净值未更新）"""
+    _nav_sync_abandoned.set()
+    return {'snapshot': 0, 'history': [], 'failed': []}
+
+
+def _results_stage(*results):
+    # 无数据的基金与超时放弃的一样标注为缺失
+    return decide_all([r if r is not None else missing_result(code, info)
+                       for (code, info), r in zip(PORTFOLIO.items(), results)])
+
+
+def _correlation_stage():
+    # 先分析组合相关性
+    print("\n🔍 分析投资组合相关性...")
+    return analyze_portfolio_correlation()
+
+
+def _memo_report_stage(results):
+    memo = RESULT_MEMO.summary()
+    if memo['enabled']:
+        print(f"\n♻️ 结果复用：{memo['reused']} 只基金输入未变化直接复用，{memo['recomputed']} 只重新计算")
+
+
+def _save_peak_stage(peak_record, results):
+    # 保存更新后的峰值记录（所有基金分析完成后）
+    with tracer.span('persistence'):
+        save_peak_record(peak_record)
+        RESULT_MEMO.prune()
+        get_nav_estimator().save()
+
+
+@tracer.traced('notification')
+def _notification_stage(results, notes=()):
+    """提醒入队并启动后台投递；只发送状态发生变化的提醒（缺失数据的基金不改变已记录的状态）"""
+    notifier = get_notification_queue()
+    if not notifier.channels:
+        print("⚠️ 未配置通知渠道（SERVER_CHAN_KEY / NOTIFY_WEBHOOK_URL / NOTIFY_SMTP_TO），跳过通知发送")
+        return
+    
+    # 检查是否需要发送通知（包含止损信号），同一状态不重复提醒
+    alert_funds, unchanged = notifier.changed_alerts([r for r in results if r.get('status') != 'missing'])
+    if unchanged:
+        print(f"\n🔕 {unchanged} 只基金提醒状态未变化，不重复发送")
+    
+    # 处于提醒状态的基金本次数据缺失：无法确认提醒是否仍然成立，单独说明
+    missing = {r['code']: r['name'] for r in results if r.get('status') == 'missing'}
+    notes = list(notes) + [f"{missing[code]} 上次提醒为「{advice}」，本次数据缺失无法确认"
+                           for code, advice in notifier.recorded_alerts(list(missing)).items()]
+    
+    if alert_funds or notes:
+        # 构建通知内容并入队；没有状态变化的提醒时只发送数据不完整摘要
+        notification_title, notification_content = build_notification(alert_funds, notes)
+        notifier.enqueue(notification_title, notification_content)
+    elif not unchanged:
         print("\n💡 当前无需发送通知（未触发止盈、止损或回撤警告）")
+    
+    # 后台投递（含此前失败积压的消息），不阻塞分析流程
+    notifier.deliver_async()
 
 
-if __name__ == "__main__":
+def run_with_profile(top=25):
+    """在 cProfile + tracemalloc 下运行并打印热点"""
+    import cProfile
+    import pstats
+    import tracemalloc
+    
+    tracemalloc.start()
+    profiler = cProfile.Profile()
+    profiler.enable()
     try:
         generate_report()
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    
+    print(f"\n🔥 CPU 热点（按累计耗时前 {top}）：")
+    pstats.Stats(profiler).strip_dirs().sort_stats('cumulative').print_stats(top)
+    
+    print(f"🧠 内存：当前 {current / 1024 / 1024:.1f} MB，峰值 {peak / 1024 / 1024:.1f} MB")
+    print("🧠 内存分配热点（前 10）：")
+    for stat in snapshot.statistics('lineno')[:10]:
+        print(f"  {stat}")
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="基金监控")
+    parser.add_argument('--profile', action='store_true', help='使用 cProfile + tracemalloc 运行并输出热点')
+    parser.add_argument('--trace', default=TRACE_FILE, help='Trace 文件路径')
+    parser.add_argument('--deadline', type=float, default=RUN_DEADLINE,
+                        help='运行截止时间（秒，0 表示不限时），默认取 FUND_MONITOR_DEADLINE 或 240')
+    args = parser.parse_args()
+    TRACE_FILE = args.trace
+    RUN_DEADLINE = args.deadline
+    
+    try:
+        if args.profile:
+            run_with_profile()
+        else:
+            generate_report()
     except Exception as e:
         print(f"❌ 执行失败: {e}")
         import traceback
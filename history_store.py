@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基金监控历史结果存储（SQLite，只追加）
+每次运行的各基金结果追加写入，按 (code, 时间) 与 (alert_level, 时间) 建索引，
+时间范围查询无需重新计算。
+
+用法：
+    python history_store.py fund 017091 --days 90 --field profit_rate
+    python history_store.py alerts --level critical --since 2026-10-01
+    python history_store.py import fund_monitor_result.json
+"""
+
+import argparse
+import json
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import pytz
+
+
+HISTORY_DB = "fund_history.db"
+
+TZ_CHINA = pytz.timezone('Asia/Shanghai')
+
+# 结果字段（与 fund_monitor_result.json 中 results 的字段一致）
+RESULT_FIELDS = [
+    'code', 'name', 'nav', 'ma20', 'cost', 'profit_rate', 'profit_amount',
+    'drawdown', 'sharpe', 'volatility', 'advice', 'alert_level',
+]
+NUMERIC_FIELDS = ['nav', 'ma20', 'cost', 'profit_rate', 'profit_amount', 'drawdown', 'sharpe', 'volatility']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id    INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts        INTEGER NOT NULL,          -- Unix 秒
+    timestamp TEXT    NOT NULL           -- ISO 时间（北京时间）
+);
+CREATE TABLE IF NOT EXISTS fund_results (
+    run_id        INTEGER NOT NULL REFERENCES runs(run_id),
+    ts            INTEGER NOT NULL,
+    code          TEXT    NOT NULL,
+    name          TEXT,
+    nav           REAL,
+    ma20          REAL,
+    cost          REAL,
+    profit_rate   REAL,
+    profit_amount REAL,
+    drawdown      REAL,
+    sharpe        REAL,
+    volatility    REAL,
+    advice        TEXT,
+    alert_level   TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_results_code_ts ON fund_results(code, ts);
+CREATE INDEX IF NOT EXISTS idx_results_alert_ts ON fund_results(alert_level, ts);
+CREATE INDEX IF NOT EXISTS idx_runs_ts ON runs(ts);
+"""
+
+
+class HistoryStore:
+    """只追加的运行结果存储"""
+
+    def __init__(self, path: str = HISTORY_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        # WAL 模式：写入不阻塞读取，多个进程可同时查询
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def append_run(self, timestamp: str, results: List[Dict]) -> int:
+        """追加一次运行的全部基金结果，返回 run_id"""
+        ts = int(datetime.fromisoformat(timestamp).timestamp())
+        with self.conn:
+            cursor = self.conn.execute("INSERT INTO runs (ts, timestamp) VALUES (?, ?)", (ts, timestamp))
+            run_id = cursor.lastrowid
+            self.conn.executemany(
+                f"INSERT INTO fund_results (run_id, ts, {', '.join(RESULT_FIELDS)}) "
+                f"VALUES (?, ?, {', '.join('?' * len(RESULT_FIELDS))})",
+                [(run_id, ts, *[_to_db(r.get(f)) for f in RESULT_FIELDS]) for r in results]
+            )
+        return run_id
+
+    def query_fund(self, code: str, start: datetime = None, end: datetime = None,
+                   fields: List[str] = None) -> List[Dict]:
+        """查询单只基金在时间范围内的结果（按时间升序）"""
+        fields = fields or RESULT_FIELDS
+        for f in fields:
+            if f not in RESULT_FIELDS:
+                raise ValueError(f"未知字段: {f}")
+        sql = (f"SELECT r.timestamp, {', '.join('f.' + f for f in fields)} "
+               f"FROM fund_results f JOIN runs r USING (run_id) "
+               f"WHERE f.code = ? AND f.ts BETWEEN ? AND ? ORDER BY f.ts")
+        rows = self.conn.execute(sql, (code, *_range(start, end)))
+        return [dict(row) for row in rows]
+
+    def query_alerts(self, levels: List[str] = ('critical', 'high'), start: datetime = None,
+                     end: datetime = None) -> List[Dict]:
+        """查询时间范围内指定级别的提醒"""
+        placeholders = ', '.join('?' * len(levels))
+        sql = (f"SELECT r.timestamp, f.code, f.name, f.advice, f.alert_level, f.profit_rate, f.drawdown "
+               f"FROM fund_results f JOIN runs r USING (run_id) "
+               f"WHERE f.alert_level IN ({placeholders}) AND f.ts BETWEEN ? AND ? ORDER BY f.ts")
+        rows = self.conn.execute(sql, (*levels, *_range(start, end)))
+        return [dict(row) for row in rows]
+
+    def latest(self, code: str) -> Dict:
+        """某只基金最近一次结果"""
+        row = self.conn.execute(
+            "SELECT r.timestamp, f.* FROM fund_results f JOIN runs r USING (run_id) "
+            "WHERE f.code = ? ORDER BY f.ts DESC LIMIT 1", (code,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def run_count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+
+def _to_db(value):
+    """numpy 标量等转为 SQLite 可存储的 Python 类型"""
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def _range(start: datetime = None, end: datetime = None):
+    lo = int(start.timestamp()) if start else 0
+    hi = int(end.timestamp()) if end else 2 ** 62
+    return lo, hi
+
+
+def append_results(timestamp: str, results: List[Dict], path: str = HISTORY_DB):
+    """追加一次运行结果，失败只打印警告"""
+    try:
+        with HistoryStore(path) as store:
+            store.append_run(timestamp, results)
+    except Exception as e:
+        print(f"⚠️ 写入历史结果失败: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="基金监控历史结果查询")
+    parser.add_argument('--db', default=HISTORY_DB)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    fund = sub.add_parser('fund', help='查询单只基金历史')
+    fund.add_argument('code')
+    fund.add_argument('--days', type=int, default=90)
+    fund.add_argument('--field', action='append', help='输出字段，可重复；默认全部数值字段')
+
+    alerts = sub.add_parser('alerts', help='查询提醒记录')
+    alerts.add_argument('--level', action='append', help='提醒级别，可重复；默认 critical + high')
+    alerts.add_argument('--days', type=int, default=90)
+    alerts.add_argument('--since', help='起始日期 YYYY-MM-DD（优先于 --days），如本季度 2026-10-01')
+
+    imp = sub.add_parser('import', help='导入 fund_monitor_result.json')
+    imp.add_argument('files', nargs='+')
+
+    args = parser.parse_args()
+    since = datetime.now(TZ_CHINA) - timedelta(days=getattr(args, 'days', 0) or 0)
+    if getattr(args, 'since', None):
+        since = TZ_CHINA.localize(datetime.strptime(args.since, '%Y-%m-%d'))
+
+    with HistoryStore(args.db) as store:
+        if args.command == 'import':
+            for path in args.files:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                store.append_run(data['timestamp'], data['results'])
+                print(f"✅ 已导入 {path}（{len(data['results'])} 条）")
+            return
+
+        if args.command == 'fund':
+            fields = args.field or NUMERIC_FIELDS
+            rows = store.query_fund(args.code, start=since, fields=fields)
+            print(f"📈 {args.code} 最近 {args.days} 天（{len(rows)} 条）")
+            for row in rows:
+                values = '  '.join(f"{f}={row[f]:.4f}" if isinstance(row[f], float) else f"{f}={row[f]}"
+                                   for f in fields)
+                print(f"  {row['timestamp'][:19]}  {values}")
+        else:
+            levels = args.level or ['critical', 'high']
+            rows = store.query_alerts(levels, start=since)
+            print(f"🚨 {since.strftime('%Y-%m-%d')} 以来 {'/'.join(levels)} 提醒（{len(rows)} 条）")
+            for row in rows:
+                print(f"  {row['timestamp'][:19]}  {row['name']}({row['code']})  {row['advice']}  "
+                      f"收益率 {row['profit_rate']:.2%}  回撤 {row['drawdown']:.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP 请求弹性层
+- 指数退避 + 抖动重试
+- 按接口（host + path）统计延迟，动态计算超时
+- 熔断器：接口持续失败时快速失败，冷却后半开探测
+- 计数器：请求次数、失败次数、熔断状态
+- 运行截止时间（deadline.run_deadline）：单次超时不超过剩余时间，到期后不再重试
+"""
+
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+from deadline import DeadlineExceeded, get_deadline
+
+
+# 可以重试的 4xx（请求超时 / 限流）；其余 4xx 是请求本身的问题，重试无用，也不说明接口不健康
+RETRYABLE_CLIENT_STATUS = (408, 429)
+
+
+def is_client_error(error: Exception) -> bool:
+    """不应重试、不计入熔断的 4xx 响应"""
+    response = getattr(error, 'response', None)
+    if not isinstance(error, requests.HTTPError) or response is None:
+        return False
+    return 400 <= response.status_code < 500 and response.status_code not in RETRYABLE_CLIENT_STATUS
+
+
+class LatencyStats:
+    """滑动窗口延迟/错误统计"""
+
+    def __init__(self, window: int = 100):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)  # True 成功 / False 失败
+        self.lock = threading.Lock()
+
+    def record(self, latency: Optional[float], ok: bool):
+        """记录一次结果，latency 为 None 时只计入成功率"""
+        with self.lock:
+            if latency is not None:
+                self.latencies.append(latency)
+            self.outcomes.append(ok)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """延迟分位数（秒），无样本返回 None"""
+        with self.lock:
+            samples = sorted(self.latencies)
+        if not samples:
+            return None
+        idx = min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))
+        return samples[idx]
+
+    @property
+    def count(self) -> int:
+        return len(self.outcomes)
+
+    @property
+    def error_rate(self) -> float:
+        with self.lock:
+            if not self.outcomes:
+                return 0.0
+            return 1 - sum(self.outcomes) / len(self.outcomes)
+
+    def summary(self) -> Dict:
+        return {
+            'count': self.count,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'error_rate': round(self.error_rate, 4),
+        }
+
+
+class RetryPolicy:
+    """指数退避重试策略（full jitter）"""
+
+    def __init__(self, max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 8.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次失败后的等待时间（attempt 从 0 开始）"""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+
+class CircuitBreaker:
+    """
+    熔断器
+    closed: 正常放行；连续失败达到阈值后进入 open
+    open: 快速失败，冷却时间结束后进入 half_open
+    half_open: 只放行一个探测请求，其他调用方快速失败；探测成功则 closed，失败重新 open
+    （探测超过 recovery_timeout 仍未返回结果时允许再放行一个）
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.open_count = 0
+        self.probe_in_flight = False
+        self.probe_started = 0.0
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            if self.state == self.OPEN:
+                if now - self.opened_at < self.recovery_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+            elif self.state == self.CLOSED:
+                return True
+            elif self.probe_in_flight and now - self.probe_started < self.recovery_timeout:
+                return False
+            self.probe_in_flight = True
+            self.probe_started = now
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.consecutive_failures += 1
+            self.probe_in_flight = False
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.open_count += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开时快速失败"""
+
+
+class ResilientHTTP:
+    """带退避重试、自适应超时和熔断的 HTTP 客户端（连接池复用）"""
+
+    # 所有存活实例，供指标导出汇总
+    instances = weakref.WeakSet()
+
+    def __init__(self, session: requests.Session = None, retry: RetryPolicy = None,
+                 default_timeout: float = 15.0, min_timeout: float = 3.0,
+                 max_timeout: float = 30.0, timeout_multiplier: float = 3.0,
+                 failure_threshold: int = 5, recovery_timeout: float = 60.0):
+        """
+        Args:
+            default_timeout: 接口无延迟样本时的超时（秒）
+            min_timeout / max_timeout: 自适应超时的上下限
+            timeout_multiplier: 超时 = p95 延迟 × 倍数
+        """
+        self.session = session or requests.Session()
+        self.retry = retry or RetryPolicy()
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_multiplier = timeout_multiplier
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.latency = {}
+        self.breakers = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+        ResilientHTTP.instances.add(self)
+
+    @staticmethod
+    def endpoint_of(url: str) -> str:
+        parts = urlsplit(url)
+        return f"{parts.netloc}{parts.path}"
+
+    def _endpoint_state(self, endpoint: str):
+        with self.lock:
+            if endpoint not in self.breakers:
+                self.latency[endpoint] = LatencyStats()
+                self.breakers[endpoint] = CircuitBreaker(self.failure_threshold, self.recovery_timeout)
+                self.counters[endpoint] = {'attempts': 0, 'successes': 0, 'failures': 0,
+                                           'retries': 0, 'short_circuits': 0}
+            return self.latency[endpoint], self.breakers[endpoint], self.counters[endpoint]
+
+    def timeout_for(self, endpoint: str) -> float:
+        """按接口历史 p95 延迟计算超时"""
+        stats, _, _ = self._endpoint_state(endpoint)
+        p95 = stats.percentile(95)
+        if p95 is None or stats.count < 5:
+            return self.default_timeout
+        return max(self.min_timeout, min(self.max_timeout, p95 * self.timeout_multiplier))
+
+    def request(self, method: str, url: str, max_retries: int = None, **kwargs) -> requests.Response:
+        """
+        发送请求，失败按退避策略重试（408/429 以外的 4xx 直接抛出 HTTPError，不重试、不计入熔断）
+        熔断器打开时抛出 CircuitOpenError，最终失败时抛出最后一次异常；
+        超过运行截止时间时抛出 DeadlineExceeded（已有失败时抛出最后一次异常）
+        """
+        deadline = get_deadline()
+        endpoint = self.endpoint_of(url)
+        stats, breaker, counters = self._endpoint_state(endpoint)
+        retries = self.retry.max_retries if max_retries is None else max_retries
+        fixed_timeout = kwargs.pop('timeout', None)
+        last_error = None
+
+        for attempt in range(retries):
+            if deadline.expired:
+                if last_error is not None:
+                    raise last_error
+                raise DeadlineExceeded(f"接口 {endpoint} 请求超过运行截止时间")
+            if not breaker.allow():
+                counters['short_circuits'] += 1
+                raise CircuitOpenError(f"接口 {endpoint} 熔断中，快速失败")
+
+            counters['attempts'] += 1
+            timeout = deadline.clip(fixed_timeout or self.timeout_for(endpoint))
+            start = time.monotonic()
+            try:
+                response = self.session.request(method, url, timeout=timeout, **kwargs)
+                response.raise_for_status()
+            except Exception as e:
+                if is_client_error(e):
+                    # 接口正常响应，只是拒绝了这个请求：延迟有效，熔断器按成功处理（同时结束半开探测）
+                    stats.record(time.monotonic() - start, True)
+                    breaker.record_success()
+                    counters['failures'] += 1
+                    raise
+                # 失败请求的耗时不计入延迟样本，避免超时请求把超时阈值越推越高
+                stats.record(None, False)
+                breaker.record_failure()
+                counters['failures'] += 1
+                last_error = e
+                if attempt < retries - 1:
+                    delay = self.retry.backoff(attempt)
+                    # 退避后已过截止时间的不再重试
+                    if delay >= deadline.remaining():
+                        break
+                    counters['retries'] += 1
+                    time.sleep(delay)
+                continue
+
+            stats.record(time.monotonic() - start, True)
+            breaker.record_success()
+            counters['successes'] += 1
+            return response
+
+        raise last_error
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def stats_summary(self) -> Dict:
+        """各接口计数器、熔断状态与延迟分位数"""
+        summary = {}
+        for endpoint in list(self.breakers):
+            stats, breaker, counters = self._endpoint_state(endpoint)
+            summary[endpoint] = dict(counters)
+            summary[endpoint].update({
+                'breaker_state': breaker.state,
+                'breaker_opens': breaker.open_count,
+                'timeout': round(self.timeout_for(endpoint), 2),
+                'p50': stats.percentile(50),
+                'p95': stats.percentile(95),
+            })
+        return summary
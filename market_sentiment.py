@@ -3,10 +3,10 @@
 """
 A股市场情绪监控系统
 监控市场恐慌/贪婪指数，为网格交易提供决策参考
-数据源：akshare
+数据源：akshare（失败时自动切换 StockDataCrawler / efinance）
 """
 
-import akshare as ak
+import os
 import pandas as pd
 import time
 from datetime import datetime, timedelta
@@ -14,71 +14,79 @@ from typing import Dict, Tuple
 import warnings
 warnings.filterwarnings('ignore')
 
+from breadth_state import BreadthState
+from data_provider import MultiSourceProvider
+from deadline import run_deadline
+from pipeline import Pipeline
+from quote_stream import QuoteStream, stream_from_env
+from sector_map import SectorMap, get_sector_map, sector_breadth
+from metrics import REGISTRY, PANIC_SCORE, LAST_SUCCESS, LOOP_LAG, start_exporter
+from sentiment_scoring import grid_advice, panic_scores, score_levels, snapshot_row
+
+
+# 超过该比例的行业同向（涨跌比 >0.6 或 <0.4）时判定为普涨/普跌
+SECTOR_BROAD_RATIO = 0.8
+
+# 单次报告的截止时间（秒，0 表示不限时）：宽度 / 指数 / 北向资金并行获取，到期未返回的按缺失处理
+SENTIMENT_DEADLINE = float(os.environ.get('SENTIMENT_DEADLINE', 90))
+
 
 class MarketSentimentMonitor:
     """A股市场情绪监控系统"""
     
-    def __init__(self):
+    def __init__(self, provider: MultiSourceProvider = None, sector_map: SectorMap = None,
+                 stream: QuoteStream = None, deadline: float = None):
         self.history_days = 20  # 历史对比天数
+        # 单次报告的截止时间（秒），未指定时取 SENTIMENT_DEADLINE
+        self.deadline = SENTIMENT_DEADLINE if deadline is None else deadline
+        # 多数据源提供层：akshare 优先，失败或超时自动对冲到爬虫/efinance
+        self.provider = provider or MultiSourceProvider()
+        # 个股 → 行业映射：未指定时使用进程内常驻、每周刷新的 get_sector_map()
+        self.sector_map = sector_map
+        # 轮询快照之间保留的宽度状态（breadth_state.py）
+        self.breadth_state = BreadthState()
+        # 推送行情（quote_stream.py）：已收到行情时宽度与指数直接读取内存状态，不再拉取全量快照
+        self.stream = stream
+
+    def get_sector_breadth(self, df: pd.DataFrame) -> Dict:
+        """按板块、行业分组的市场宽度；行业映射不可用时只有板块维度"""
+        try:
+            return sector_breadth(df, self.sector_map or get_sector_map())
+        except Exception as e:
+            print(f"⚠️ 分组宽度计算失败: {e}")
+            return {}
         
     def get_market_breadth(self) -> Dict:
         """获取市场宽度数据（涨跌分布）"""
+        if self.stream is not None and self.stream.fresh():
+            breadth = self.stream.breadth()
+            breadth['sectors'] = self.get_sector_breadth(self.stream.to_frame())
+            return breadth
+        if self.stream is not None and self.stream.ready:
+            print(f"⚠️ 推送行情已 {self.stream.age:.0f}s 未更新，改用轮询快照")
         try:
-            df = ak.stock_zh_a_spot_em()
-            total = len(df)
-            up_count = len(df[df['涨跌幅'] > 0])
-            down_count = len(df[df['涨跌幅'] < 0])
-            flat_count = total - up_count - down_count
-            
-            # 涨跌停统计
-            limit_up = len(df[df['涨跌幅'] >= 9.9])
-            limit_down = len(df[df['涨跌幅'] <= -9.9])
-            
-            # 个股跌幅分布
-            drop_5 = len(df[df['涨跌幅'] <= -5])
-            drop_8 = len(df[df['涨跌幅'] <= -8])
-            
-            # 总成交额（亿元）
-            total_volume = df['成交额'].sum() / 100000000
-            
-            return {
-                'total': total,
-                'up_count': up_count,
-                'down_count': down_count,
-                'flat_count': flat_count,
-                'breadth_ratio': up_count / (up_count + down_count) if (up_count + down_count) > 0 else 0.5,
-                'limit_up': limit_up,
-                'limit_down': limit_down,
-                'drop_5_pct': drop_5,
-                'drop_8_pct': drop_8,
-                'total_volume': total_volume
-            }
+            df = self.provider.get_spot()
+            if df is None:
+                return None
+            # 与上一次快照按代码对齐，只按变化的股票调整涨跌 / 涨跌停 / 跌幅分档计数与成交额
+            self.breadth_state.apply_snapshot(df)
+            breadth = self.breadth_state.breadth()
+            if breadth is None:
+                return None
+            breadth['sectors'] = self.get_sector_breadth(df)
+            return breadth
         except Exception as e:
             print(f"市场宽度数据获取失败: {e}")
             return None
     
     def get_index_performance(self) -> Dict:
         """获取主要指数表现"""
+        if self.stream is not None and self.stream.fresh():
+            quotes = self.stream.index_quotes()
+            if quotes:
+                return quotes
         try:
-            df = ak.stock_zh_index_spot_em()
-            
-            indices = {
-                '000001': 'shanghai',  # 上证指数
-                '399001': 'shenzhen',  # 深证成指
-                '000300': 'csi300',    # 沪深300
-                '399006': 'chinext'    # 创业板指
-            }
-            
-            result = {}
-            for code, name in indices.items():
-                row = df[df['代码'] == code]
-                if not row.empty:
-                    result[name] = {
-                        'change_pct': float(row['涨跌幅'].values[0]),
-                        'volume': float(row['成交额'].values[0]) / 100000000  # 转为亿元
-                    }
-            
-            return result
+            return self.provider.get_index_quotes()
         except Exception as e:
             print(f"指数数据获取失败: {e}")
             return None
@@ -86,30 +94,10 @@ class MarketSentimentMonitor:
     def get_north_capital_flow(self) -> Dict:
         """获取北向资金流向"""
         try:
-            # 获取沪深港通资金流向
-            df = ak.stock_hsgt_hist_em(symbol="沪深港通")
-            if df is None or df.empty:
+            north_flow = self.provider.get_north_flow()
+            if not north_flow:
                 return {'net_flow': 0, 'signal': 'unknown'}
-            
-            # 获取最新一天的数据
-            latest = df.iloc[0]
-            
-            # 查找净流入列（可能的列名）
-            possible_columns = ['当日资金流入-净流入', '资金流入', '北上资金', '净流入']
-            net_flow = 0
-            
-            for col in possible_columns:
-                if col in latest.index:
-                    try:
-                        net_flow = float(latest[col]) / 100000000  # 转为亿元
-                        break
-                    except:
-                        continue
-            
-            return {
-                'net_flow': round(net_flow, 2),
-                'signal': 'inflow' if net_flow > 0 else 'outflow'
-            }
+            return north_flow
         except Exception as e:
             print(f"北向资金数据获取失败: {e}")
             # 返回默认值，不影响整体报告
@@ -127,103 +115,58 @@ class MarketSentimentMonitor:
         if not breadth or not indices:
             return 50, "数据不足"
         
-        score = 50  # 基础分
-        
-        # 1. 市场宽度贡献 (权重30%)
-        breadth_score = breadth['breadth_ratio'] * 60  # 0.5对应30分
-        score += (breadth_score - 30) * 0.3
-        
-        # 2. 指数表现贡献 (权重10%)
-        if 'csi300' in indices:
-            csi300_change = indices['csi300']['change_pct']
-            score += csi300_change * 2
-        
-        # 3. 极端情绪惩罚 (权重15%)
-        limit_down_ratio = breadth['limit_down'] / breadth['total']
-        drop_5_ratio = breadth['drop_5_pct'] / breadth['total']
-        
-        # 跌停家数超5%，极度恐慌
-        if limit_down_ratio > 0.05:
-            score -= 30
-        elif limit_down_ratio > 0.02:
-            score -= 15
-        
-        # 跌超5%家数占比
-        if drop_5_ratio > 0.3:
-            score -= 20
-        elif drop_5_ratio > 0.15:
-            score -= 10
-        
-        # 4. 北向资金贡献 (权重25%)
-        if north_flow and north_flow.get('net_flow') is not None:
-            net_flow = north_flow['net_flow']
-            # 流入>50亿加分，流出>50亿扣分
-            if net_flow > 50:
-                score += 15
-            elif net_flow > 20:
-                score += 8
-            elif net_flow < -50:
-                score -= 15
-            elif net_flow < -20:
-                score -= 8
-        
-        # 5. 量能异常判断 (权重20%)
-        # 缩量下跌 = 恐慌，放量下跌 = 恐慌性抛盘
-        volume = breadth['total_volume']
-        if 'csi300' in indices and indices['csi300']['change_pct'] < -1:
-            if volume > 15000:  # 两市成交超1.5万亿且下跌，恐慌抛售
-                score -= 10
-            elif volume < 8000:  # 两市成交不足8000亿且下跌，量能衰竭
-                score -= 8
-        
-        # 限制分数范围
-        score = max(0, min(100, score))
-        
-        # 情绪等级判断
-        if score < 20:
-            level = "极度恐慌 🔴🔴🔴"
-        elif score < 40:
-            level = "恐慌 🔴"
-        elif score < 60:
-            level = "中性震荡 🟡"
-        elif score < 80:
-            level = "贪婪 🟢"
-        else:
-            level = "极度贪婪 🟢🟢🟢"
-        
-        return round(score, 2), level
+        # 各项贡献与权重见 sentiment_scoring.DEFAULT_WEIGHTS（与历史回测共用同一套计算）
+        row = pd.DataFrame([snapshot_row(breadth, indices, north_flow)])
+        score = float(panic_scores(row)[0])
+        return round(score, 2), score_levels([score])[0]
     
     def generate_grid_strategy_advice(self, score: float, breadth: Dict) -> str:
         """基于情绪分生成网格交易建议"""
-        if score < 20:
-            return "🔴 极度恐慌区：激进策略可分批抄底，网格下轨扩大20%，密集布单"
-        elif score < 30:
-            return "🔴 恐慌区：适合开启网格买入单，下轨-10%，间距2%"
-        elif score < 40:
-            return "🟠 弱势区：谨慎布局，网格间距放宽至3%，控制仓位50%"
-        elif score < 60:
-            return "🟡 震荡区：标准网格策略，上下轨±8%，间距2%"
-        elif score < 70:
-            return "🟢 强势区：偏向卖出网格，上轨+10%，锁定利润"
-        elif score < 80:
-            return "🟢 贪婪区：止盈为主，网格上轨缩小至+5%，快速平仓"
-        else:
-            limit_up_ratio = breadth['limit_up'] / breadth['total'] if breadth else 0
-            if limit_up_ratio > 0.05:
-                return "🔴 极度贪婪+涨停潮：市场过热！建议暂停网格，等待回调"
-            else:
-                return "🟢 极度贪婪：高位震荡，网格间距扩大至5%，防范回调"
+        limit_up_ratio = breadth['limit_up'] / breadth['total'] if breadth else 0
+        return grid_advice([score], [limit_up_ratio])[0]
     
+    def print_sector_breadth(self, sectors: Dict, top: int = 5):
+        """打印板块宽度与涨跌幅居前/居后的行业，并区分普跌/普涨与结构性行情"""
+        if not sectors:
+            return
+        print(f"【板块宽度】")
+        for name, r in sectors['board'].iterrows():
+            print(f"  {name}: 涨跌比 {r['breadth_ratio']:.2%} | 中位涨幅 {r['median_change']:+.2f}% | "
+                  f"涨停 {int(r['limit_up']):3d} | 跌停 {int(r['limit_down']):3d} | 成交 {r['turnover']:.0f} 亿")
+        industry = sectors.get('industry')
+        if industry is not None and len(industry):
+            ranked = industry.sort_values('median_change', ascending=False)
+            for title, rows in (("领涨行业", ranked.head(top)), ("领跌行业", ranked.tail(top).iloc[::-1])):
+                print(f"  {title}: " + "，".join(f"{name} {r['median_change']:+.2f}%（{r['breadth_ratio']:.0%}）"
+                                                  for name, r in rows.iterrows()))
+            # 行业涨跌比一致偏向一边为普涨/普跌，否则为结构性行情
+            weak = (industry['breadth_ratio'] < 0.4).mean()
+            strong = (industry['breadth_ratio'] > 0.6).mean()
+            if weak >= SECTOR_BROAD_RATIO:
+                diagnosis = f"普跌：{weak:.0%} 的行业多数个股下跌"
+            elif strong >= SECTOR_BROAD_RATIO:
+                diagnosis = f"普涨：{strong:.0%} 的行业多数个股上涨"
+            else:
+                diagnosis = f"结构性：强势行业 {strong:.0%}，弱势行业 {weak:.0%}"
+            print(f"  行业分化: {diagnosis}")
+        print()
+
     def print_report(self):
         """生成并打印市场情绪报告"""
         print(f"\n{'='*70}")
         print(f"📊 A股市场情绪监控报告 | {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print(f"{'='*70}\n")
         
-        # 获取数据
-        breadth = self.get_market_breadth()
-        indices = self.get_index_performance()
-        north_flow = self.get_north_capital_flow()
+        # 获取数据：三类数据并行获取，超过截止时间仍未返回的放弃（按缺失处理），报告按时输出
+        with run_deadline(self.deadline) as deadline:
+            pipe = Pipeline(max_workers=3)
+            pipe.add('市场宽度', self.get_market_breadth, fallback=lambda: None)
+            pipe.add('主要指数', self.get_index_performance, fallback=lambda: None)
+            pipe.add('北向资金', self.get_north_capital_flow, fallback=lambda: {'net_flow': 0, 'signal': 'unknown'})
+            data = pipe.run(deadline=deadline)
+        breadth, indices, north_flow = data['市场宽度'], data['主要指数'], data['北向资金']
+        if pipe.timed_out:
+            print(f"⏱️ 超过 {self.deadline:.0f}s 未返回，按缺失处理: {'、'.join(pipe.timed_out)}\n")
         
         if not breadth:
             print("❌ 数据获取失败，请稍后重试")
@@ -235,6 +178,7 @@ class MarketSentimentMonitor:
         print(f"  涨跌比: {breadth['breadth_ratio']:.2%} | 涨停: {breadth['limit_up']:3d} | 跌停: {breadth['limit_down']:3d}")
         print(f"  跌超5%: {breadth['drop_5_pct']:4d} 家 | 跌超8%: {breadth['drop_8_pct']:4d} 家")
         print(f"  两市成交额: {breadth['total_volume']:.2f} 亿元\n")
+        self.print_sector_breadth(breadth.get('sectors'))
         
         # === 2. 指数表现 ===
         if indices:
@@ -257,10 +201,19 @@ class MarketSentimentMonitor:
             flow = north_flow['net_flow']
             emoji = "💰" if flow > 0 else "💸"
             print(f"【北向资金】")
-            print(f"  {emoji} 净流入: {flow:+.2f} 亿元 ({north_flow['signal']})\n")
+            print(f"  {emoji} 净流入: {flow:+.2f} 亿元 ({north_flow['signal']})")
+            if 'delta_5m' in north_flow:
+                # 分钟序列（north_flow.py）：盘中增量与加速度
+                print(f"  截至 {north_flow['minute']} | 5分钟 {north_flow['delta_5m']:+.2f} | "
+                      f"15分钟 {north_flow['delta_15m']:+.2f} | 30分钟 {north_flow['delta_30m']:+.2f} | "
+                      f"加速度 {north_flow['acceleration']:+.2f}")
+                print(f"  盘中高点 {north_flow['peak']:+.2f}（{north_flow['peak_minute']}）| "
+                      f"低点 {north_flow['trough']:+.2f}（{north_flow['trough_minute']}）")
+            print()
         
         # === 4. 恐慌指数 ===
         score, level = self.calculate_panic_score(breadth, indices, north_flow)
+        PANIC_SCORE.set(score)
         print(f"【恐慌/贪婪指数】")
         print(f"  综合评分: {score:.2f} / 100")
         print(f"  情绪等级: {level}\n")
@@ -287,7 +240,15 @@ class MarketSentimentMonitor:
                 print(f"  {w}")
             print()
         
+        if self.stream is not None:
+            print(f"【推送行情】")
+            age = self.stream.age
+            status = "未收到" if age is None else f"{age:.0f}s 前更新" + ("" if self.stream.fresh() else "（已过期，本次使用轮询快照）")
+            print(f"  已接收 {self.stream.ticks} 条 tick，{len(self.stream.state)} 只股票，{status}\n")
+        self.provider.print_stats()
+        
         print(f"{'='*70}\n")
+        LAST_SUCCESS.set(time.time(), component='report')
 
 
 def is_trading_time() -> bool:
@@ -311,24 +272,36 @@ def is_trading_time() -> bool:
 
 def main():
     """主函数"""
-    monitor = MarketSentimentMonitor()
+    monitor = MarketSentimentMonitor(stream=stream_from_env())
+    metrics_file = start_exporter()
     
     print("🚀 A股市场情绪监控系统已启动...")
     print(f"📅 当前时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"⏰ 监控时段: 周一至周五 09:25-11:32, 13:00-15:02")
-    print(f"🔄 更新频率: 交易时段每小时，非交易时段每10分钟检查\n")
+    print(f"🔄 更新频率: 交易时段每小时，非交易时段每10分钟检查")
+    print(f"📈 指标文件: {metrics_file}\n")
+    
+    # 计划执行时间（单调时钟），用于计算主循环延迟
+    next_due = time.monotonic()
     
     while True:
         try:
+            started = time.monotonic()
+            LOOP_LAG.set(max(0.0, started - next_due))
+            
             if is_trading_time():
                 monitor.print_report()
                 # 交易时段每小时执行一次
-                time.sleep(3600)
+                interval = 3600
             else:
                 now = datetime.now()
                 print(f"[{now.strftime('%H:%M:%S')}] 当前非交易时段，脚本休眠中...")
                 # 非交易时段每10分钟检查一次
-                time.sleep(600)
+                interval = 600
+            
+            write_metrics(metrics_file)
+            next_due = started + interval
+            time.sleep(max(0.0, next_due - time.monotonic()))
         
         except KeyboardInterrupt:
             print("\n\n⏹️  监控系统已停止")
@@ -336,8 +309,18 @@ def main():
         except Exception as e:
             print(f"\n❌ 系统异常: {e}")
             print("⏸️  等待60秒后重试...\n")
+            write_metrics(metrics_file)
+            next_due = time.monotonic() + 60
             time.sleep(60)
 
 
+def write_metrics(path: str):
+    """写入指标文件，失败不影响监控"""
+    try:
+        REGISTRY.write_textfile(path)
+    except Exception as e:
+        print(f"⚠️ 写入指标文件失败: {e}")
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prometheus 文本格式指标
+- Counter / Gauge / Histogram，按标签区分
+- 导出方式：写入文本文件（node_exporter textfile collector）或本地 HTTP 端点 /metrics
+- 采集回调：渲染前从响应缓存、HTTP 客户端等对象拉取最新计数
+
+环境变量：
+- METRICS_TEXTFILE: 指标文件路径（默认 market_sentiment.prom）
+- METRICS_PORT:     设置后在 127.0.0.1:<port>/metrics 提供 HTTP 端点
+"""
+
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Tuple
+
+
+METRICS_TEXTFILE_ENV = "METRICS_TEXTFILE"
+METRICS_PORT_ENV = "METRICS_PORT"
+DEFAULT_TEXTFILE = "market_sentiment.prom"
+
+# 数据获取延迟直方图桶（秒）
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _label_key(labels: Dict) -> Tuple:
+    return tuple(sorted((labels or {}).items()))
+
+
+def _escape_label(value) -> str:
+    """按 Prometheus 文本格式转义标签值：反斜杠、双引号、换行"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(key: Tuple, extra: Dict = None) -> str:
+    items = list(key) + list((extra or {}).items())
+    if not items:
+        return ''
+    body = ','.join(f'{k}="{_escape_label(v)}"' for k, v in items)
+    return '{' + body + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def set_total(self, value: float, **labels):
+        """从外部累计值同步（用于采集回调）"""
+        with self.lock:
+            self.values[_label_key(labels)] = value
+
+    def render(self) -> List[str]:
+        with self.lock:
+            return self.header() + [f"{self.name}{_format_labels(k)} {_format_value(v)}"
+                                    for k, v in self.values.items()]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        with self.lock:
+            self.values[_label_key(labels)] = value
+
+    def render(self) -> List[str]:
+        with self.lock:
+            return self.header() + [f"{self.name}{_format_labels(k)} {_format_value(v)}"
+                                    for k, v in self.values.items()]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            state = self.values.setdefault(key, {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0})
+            for i, upper in enumerate(self.buckets):
+                if value <= upper:
+                    state['counts'][i] += 1
+            state['sum'] += value
+            state['count'] += 1
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        with self.lock:
+            for key, state in self.values.items():
+                for upper, count in zip(self.buckets, state['counts']):
+                    lines.append(f"{self.name}_bucket{_format_labels(key, {'le': _format_value(upper)})} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(state['sum'])}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {state['count']}")
+        return lines
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self.metrics: Dict[str, _Metric] = {}
+        self.collectors: List[Callable] = []
+        self.lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, help_text: str, **kwargs):
+        with self.lock:
+            if name not in self.metrics:
+                self.metrics[name] = cls(name, help_text, **kwargs)
+            return self.metrics[name]
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._get_or_create(Counter, name, help_text)
+
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text)
+
+    def histogram(self, name: str, help_text: str, buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, buckets=buckets)
+
+    def register_collector(self, fn: Callable):
+        """注册采集回调，每次渲染前调用"""
+        self.collectors.append(fn)
+
+    def render(self) -> str:
+        for collect in self.collectors:
+            try:
+                collect(self)
+            except Exception as e:
+                print(f"⚠️ 指标采集失败: {e}")
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path: str):
+        """原子写入指标文件"""
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+    def serve(self, port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+        """后台线程提供 /metrics 端点"""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+        return server
+
+
+REGISTRY = Registry()
+
+# ===================== 公共指标 =====================
+
+FETCH_LATENCY = REGISTRY.histogram(
+    'market_fetch_latency_seconds', '各数据源获取耗时（秒）')
+FETCH_TOTAL = REGISTRY.counter(
+    'market_fetch_total', '各数据源获取次数')
+LAST_SUCCESS = REGISTRY.gauge(
+    'market_last_success_timestamp_seconds', '最近一次成功的 Unix 时间戳')
+PANIC_SCORE = REGISTRY.gauge(
+    'market_panic_score', '当前恐慌/贪婪评分（0-100）')
+LOOP_LAG = REGISTRY.gauge(
+    'market_monitor_loop_lag_seconds', '主循环实际执行时间相对计划时间的延迟（秒）')
+
+
+def _collect_cache(registry: Registry):
+    from response_cache import get_response_cache
+    cache = get_response_cache()
+    requests_total = registry.counter('response_cache_requests_total', '响应缓存请求次数')
+    requests_total.set_total(cache.hits, result='hit')
+    requests_total.set_total(cache.misses, result='miss')
+    requests_total.set_total(cache.revalidated, result='revalidated')
+    requests_total.set_total(cache.stale, result='stale')
+    registry.counter('response_cache_lock_timeouts_total', '等待缓存键锁超时次数').set_total(cache.lock_timeouts)
+    registry.gauge('response_cache_hit_ratio', '响应缓存命中率').set(cache.hit_rate())
+
+
+def _collect_http(registry: Registry):
+    from http_resilience import ResilientHTTP
+    counters = registry.counter('http_requests_total', 'HTTP 请求计数（attempts/successes/failures/retries/short_circuits）')
+    breaker_state = registry.gauge('http_circuit_breaker_open', '熔断器是否打开（1 打开 / 0.5 半开 / 0 关闭）')
+    breaker_opens = registry.counter('http_circuit_breaker_opens_total', '熔断器打开次数')
+    state_value = {'closed': 0, 'half_open': 0.5, 'open': 1}
+    for client in list(ResilientHTTP.instances):
+        for endpoint, stats in client.stats_summary().items():
+            for field in ('attempts', 'successes', 'failures', 'retries', 'short_circuits'):
+                counters.set_total(stats[field], endpoint=endpoint, result=field)
+            breaker_state.set(state_value[stats['breaker_state']], endpoint=endpoint)
+            breaker_opens.set_total(stats['breaker_opens'], endpoint=endpoint)
+
+
+REGISTRY.register_collector(_collect_cache)
+REGISTRY.register_collector(_collect_http)
+
+
+def start_exporter() -> str:
+    """按环境变量启动 HTTP 端点，返回指标文件路径"""
+    port = os.environ.get(METRICS_PORT_ENV)
+    if port:
+        try:
+            REGISTRY.serve(int(port))
+            print(f"📈 指标端点: http://127.0.0.1:{port}/metrics")
+        except Exception as e:
+            print(f"⚠️ 指标端点启动失败: {e}")
+    return os.environ.get(METRICS_TEXTFILE_ENV, DEFAULT_TEXTFILE)
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+QDII / 指数基金盘中估值
+基金净值每天只公布一次且晚一天，本模块用跟踪指数的 ETF 行情与汇率快照估算最新净值：
+
+    估算净值 = 最新公布净值 × (1 + β × 代理涨跌幅)
+    代理涨跌幅 = (ETF 价格 × 美元兑人民币) 相对最新净值日的变化
+
+- 代理使用美股上市 ETF（以美元计价，已包含欧元/英镑/日元等汇率变化），再乘美元兑人民币
+- β 每日用已公布净值重新校准：把此前的估算（代理涨跌幅）与之后公布的真实净值涨跌比较，
+  取最近 60 组做过原点回归；样本不足时使用默认 β
+- 校准状态保存在 cache/nav_calibration.json
+
+环境变量 NAV_ESTIMATE=0 关闭估值。
+
+用法：
+    python nav_estimator.py              # 打印组合内各基金估值
+    python nav_estimator.py --watch 60   # 每 60 秒刷新
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import pandas as pd
+
+from nav_store import NavSeries
+
+
+CALIBRATION_FILE = os.path.join("cache", "nav_calibration.json")
+ESTIMATE_ENV = "NAV_ESTIMATE"
+
+# 基金 → 代理 ETF（新浪 gb_ 代码）与汇率
+FUND_PROXIES = {
+    "006282": {"proxy": "gb_vgk", "fx": "fx_susdcny"},   # 摩根欧洲 → FTSE 欧洲 ETF
+    "017091": {"proxy": "gb_qtec", "fx": "fx_susdcny"},  # 纳指科技 → 纳斯达克100科技 ETF
+    "539003": {"proxy": "gb_ewu", "fx": "fx_susdcny"},   # 建信富时100 → MSCI 英国 ETF
+    "019449": {"proxy": "gb_ewj", "fx": "fx_susdcny"},   # 摩根日本 → MSCI 日本 ETF
+    "009974": {"proxy": "gb_xly", "fx": "fx_susdcny"},   # 华宝标普美国消费 → 可选消费 ETF
+    "016858": {"proxy": "gb_qqq", "fx": "fx_susdcny"},   # 华安纳指100联接A → 纳指100 ETF
+    "501312": {"proxy": "gb_xlk", "fx": "fx_susdcny"},   # 华宝海外科技 → 科技 ETF
+}
+
+# 默认 β（基金股票仓位约 95%）与校准参数
+DEFAULT_BETA = 0.95
+CALIBRATION_WINDOW = 60
+MIN_CALIBRATION_PAIRS = 5
+
+# 行情快照有效期（秒），同一次运行内各基金共用一次请求
+QUOTE_TTL = 60
+
+
+class NavEstimator:
+    """基于代理行情的净值估算与每日校准"""
+
+    def __init__(self, proxies: Dict = None, path: str = CALIBRATION_FILE, crawler=None):
+        self.proxies = FUND_PROXIES if proxies is None else proxies
+        self.path = path
+        self.crawler = crawler
+        self.enabled = os.environ.get(ESTIMATE_ENV, '1') != '0'
+        self.lock = threading.RLock()
+        self.state = None
+        self.quotes = None
+        self.quotes_at = 0.0
+
+    # ---------- 状态 ----------
+
+    def _load(self) -> Dict:
+        if self.state is None:
+            self.state = {'funds': {}, 'levels': {}}
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        self.state = json.load(f)
+                except Exception as e:
+                    print(f"⚠️ 读取估值校准数据失败: {e}")
+        return self.state
+
+    def save(self):
+        with self.lock:
+            if self.state is None:
+                return
+            try:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                tmp = self.path + '.tmp'
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump(self.state, f, ensure_ascii=False, indent=2)
+                os.replace(tmp, self.path)
+            except Exception as e:
+                print(f"⚠️ 保存估值校准数据失败: {e}")
+
+    # ---------- 行情 ----------
+
+    def _get_crawler(self):
+        if self.crawler is None:
+            from stock_data_crawler import StockDataCrawler
+            self.crawler = StockDataCrawler()
+        return self.crawler
+
+    def refresh_quotes(self) -> Optional[Dict]:
+        """一次请求获取全部代理 ETF 与汇率行情（有效期内复用）"""
+        with self.lock:
+            if self.quotes is not None and time.monotonic() - self.quotes_at < QUOTE_TTL:
+                return self.quotes
+            symbols = sorted({s for p in self.proxies.values() for s in (p['proxy'], p['fx'])})
+            self.quotes = self._get_crawler().get_global_quotes(symbols) or {}
+            self.quotes_at = time.monotonic()
+
+            # 记录各代理在行情交易日的人民币计价水平，供之后跨多日估算
+            levels = self._load().setdefault('levels', {})
+            for p in self.proxies.values():
+                level = self._cny_level(p)
+                if level is not None:
+                    levels.setdefault(p['proxy'], {})[level[1].isoformat()] = level[0]
+                    # 只保留最近的记录
+                    for old in sorted(levels[p['proxy']])[:-CALIBRATION_WINDOW]:
+                        del levels[p['proxy']][old]
+            return self.quotes
+
+    def _cny_level(self, proxy: Dict):
+        """(代理 ETF 人民币计价水平, 交易日)"""
+        quote = self.quotes.get(proxy['proxy'])
+        fx = self.quotes.get(proxy['fx'])
+        if not quote or not fx:
+            return None
+        return quote['current'] * fx['current'], quote['date']
+
+    # ---------- 校准 ----------
+
+    def beta(self, code: str) -> float:
+        pairs = self._load()['funds'].get(code, {}).get('pairs', [])
+        if len(pairs) < MIN_CALIBRATION_PAIRS:
+            return DEFAULT_BETA
+        sxy = sum(x * y for x, y in pairs)
+        sxx = sum(x * x for x, _ in pairs)
+        return sxy / sxx if sxx > 0 else DEFAULT_BETA
+
+    def recalibrate(self, code: str, navs: pd.Series):
+        """用已公布净值校验此前的估算，更新 β；navs 为按日期索引的单位净值"""
+        with self.lock:
+            fund = self._load()['funds'].setdefault(code, {'pending': {}, 'pairs': []})
+            by_date = {pd.Timestamp(d).date().isoformat(): float(v) for d, v in navs.items()}
+            for target, pending in list(fund['pending'].items()):
+                if target not in by_date:
+                    continue
+                base = by_date.get(pending['base_date'])
+                if base:
+                    fund['pairs'].append([pending['change'], by_date[target] / base - 1])
+                del fund['pending'][target]
+            fund['pairs'] = fund['pairs'][-CALIBRATION_WINDOW:]
+            # 长期未公布（如代理交易日与基金不一致）的待校准记录不再保留
+            for target in sorted(fund['pending'])[:-5]:
+                del fund['pending'][target]
+
+    def tracking_error(self, code: str) -> Optional[float]:
+        """校准样本上的平均绝对估算误差"""
+        pairs = self._load()['funds'].get(code, {}).get('pairs', [])
+        if not pairs:
+            return None
+        b = self.beta(code)
+        return sum(abs(y - b * x) for x, y in pairs) / len(pairs)
+
+    # ---------- 估算 ----------
+
+    def estimate(self, code: str, series: NavSeries) -> Optional[Dict]:
+        """
+        估算最新净值；无代理、无行情或公布净值已覆盖行情交易日时返回 None
+
+        Returns:
+            {'nav', 'change', 'beta', 'as_of', 'base_date', 'proxy'}
+        """
+        proxy = self.proxies.get(code)
+        if not self.enabled or proxy is None or series is None or len(series) == 0:
+            return None
+        with self.lock:
+            try:
+                navs = pd.Series(series.navs, index=series.dates, dtype=float)
+                self.recalibrate(code, navs)
+                if not self.refresh_quotes():
+                    return None
+                level = self._cny_level(proxy)
+                if level is None:
+                    return None
+            except Exception as e:
+                print(f"⚠️ 基金 {code} 估值失败: {e}")
+                return None
+
+            level_now, quote_date = level
+            base_date = navs.index[-1].date()
+            if quote_date <= base_date:
+                return None
+
+            # 优先用最新净值日的代理水平（跨多个交易日也准确），否则用代理当日涨跌
+            base_level = self._load()['levels'].get(proxy['proxy'], {}).get(base_date.isoformat())
+            if base_level:
+                change = level_now / base_level - 1
+            else:
+                quote, fx = self.quotes[proxy['proxy']], self.quotes[proxy['fx']]
+                change = (quote['current'] / quote['prev_close']) * (fx['current'] / fx['prev_close']) - 1
+
+            beta = self.beta(code)
+            fund = self._load()['funds'].setdefault(code, {'pending': {}, 'pairs': []})
+            fund['pending'][quote_date.isoformat()] = {'change': change, 'base_date': base_date.isoformat()}
+            return {
+                'nav': float(navs.iloc[-1]) * (1 + beta * change),
+                'change': beta * change,
+                'beta': beta,
+                'as_of': quote_date.isoformat(),
+                'base_date': base_date.isoformat(),
+                'proxy': proxy['proxy'],
+            }
+
+
+_estimator = None
+
+
+def get_nav_estimator() -> NavEstimator:
+    """进程内共享的估值器"""
+    global _estimator
+    if _estimator is None:
+        _estimator = NavEstimator()
+    return _estimator
+
+
+def main():
+    import fund_monitor
+
+    parser = argparse.ArgumentParser(description="QDII 基金盘中估值")
+    parser.add_argument('--watch', type=float, default=0, help='刷新间隔（秒），0 为只运行一次')
+    args = parser.parse_args()
+
+    estimator = get_nav_estimator()
+    while True:
+        print(f"\n📈 基金估值 | {fund_monitor.get_now_beijing().strftime('%Y-%m-%d %H:%M:%S')}")
+        for code, info in fund_monitor.PORTFOLIO.items():
+            estimate = estimator.estimate(code, fund_monitor.get_nav_series(code))
+            if estimate is None:
+                print(f"  {info['name']:<12} 无需估值或暂无行情")
+                continue
+            error = estimator.tracking_error(code)
+            print(f"  {info['name']:<12} 估算 {estimate['nav']:.4f} ({estimate['change']:+.2%}) "
+                  f"基准 {estimate['base_date']} → {estimate['as_of']}  β={estimate['beta']:.2f}"
+                  + (f"  误差 {error:.2%}" if error is not None else ''))
+        estimator.save()
+        if not args.watch:
+            break
+        time.sleep(args.watch)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基金净值历史存储（SQLite WAL）与每日批量更新
+- 每只基金每个净值日一行（int32 天数偏移 + 单位净值），按 (code, day) upsert
+- 每天只请求一次全市场开放式基金净值快照（ak.fund_open_fund_daily_em，含最近两个净值日），
+  把所有已跟踪基金的最新净值写入历史库
+- 只有无历史、快照与已有历史之间存在缺口（中间有工作日未覆盖）或长期未更新的基金，
+  才逐只调用 ak.fund_open_fund_info_em 获取完整历史并整体替换
+
+一次快照请求代替 N 次历史请求，数千只基金的每日更新从分钟级降到秒级。
+
+用法：
+    python nav_history.py sync                # 按 fund_monitor 组合同步
+    python nav_history.py sync 017091 006282  # 同步指定基金（首次会获取完整历史）
+    python nav_history.py show 017091 --tail 10
+    python nav_history.py status
+"""
+
+import argparse
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from nav_store import NavSeries, default_nav_dtype, from_day_offsets, to_day_offsets
+
+
+NAV_HISTORY_DB = "nav_history.db"
+
+# 超过该天数没有新净值的基金，即使快照中没有缺口也重新获取完整历史（防止长期停更后漏数据）
+MAX_STALE_DAYS = 10
+
+# 快照列名形如 "2026-10-16-单位净值"
+SNAPSHOT_NAV_COLUMN = re.compile(r'^(\d{4}-\d{2}-\d{2})-单位净值$')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS navs (
+    code  TEXT    NOT NULL,
+    day   INTEGER NOT NULL,   -- 相对 1970-01-01 的天数
+    nav   REAL    NOT NULL,
+    PRIMARY KEY (code, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS funds (
+    code     TEXT PRIMARY KEY,
+    checked  TEXT NOT NULL,   -- 最近一次确认净值为最新的日期（快照或完整历史）
+    source   TEXT NOT NULL    -- snapshot / history
+);
+CREATE TABLE IF NOT EXISTS universe (
+    code  TEXT PRIMARY KEY,       -- 最近一次全市场快照中的全部基金
+    name  TEXT
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    day      TEXT PRIMARY KEY,  -- 请求快照的日期
+    fetched  INTEGER NOT NULL,
+    funds    INTEGER NOT NULL
+);
+"""
+
+
+def parse_daily_snapshot(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    全市场净值快照 → 长表 [code, day, nav]（只保留有效净值）
+
+    快照每只基金一行，最近两个净值日各一列"<日期>-单位净值"；未公布（如 QDII 晚一天）的为空字符串。
+    """
+    date_columns = [(c, m.group(1)) for c in df.columns if (m := SNAPSHOT_NAV_COLUMN.match(str(c)))]
+    if '基金代码' not in df.columns or not date_columns:
+        raise ValueError(f"无法识别的净值快照格式: {list(df.columns)[:6]}")
+    codes = df['基金代码'].astype(str).str.zfill(6).to_numpy()
+    parts = []
+    for column, day in date_columns:
+        navs = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64)
+        valid = ~np.isnan(navs) & (navs > 0)
+        parts.append(pd.DataFrame({
+            'code': codes[valid],
+            'day': np.full(valid.sum(), to_day_offsets([day])[0], dtype=np.int32),
+            'nav': navs[valid],
+        }))
+    return pd.concat(parts, ignore_index=True)
+
+
+def snapshot_names(df: pd.DataFrame) -> Dict[str, str]:
+    """全市场净值快照 → {基金代码: 基金简称}"""
+    names = df['基金简称'].astype(str) if '基金简称' in df.columns else pd.Series('', index=df.index)
+    return dict(zip(df['基金代码'].astype(str).str.zfill(6), names))
+
+
+class NavHistoryStore:
+    """按基金存取净值历史（多线程共享一个连接，写入串行化）"""
+
+    def __init__(self, path: str = NAV_HISTORY_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.RLock()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # ---------- 读取 ----------
+
+    def load(self, code: str, dtype=None) -> Optional[NavSeries]:
+        """读取单只基金的完整净值序列（按日期升序），无记录时返回 None"""
+        with self.lock:
+            rows = self.conn.execute("SELECT day, nav FROM navs WHERE code = ? ORDER BY day", (code,)).fetchall()
+        if not rows:
+            return None
+        arr = np.array(rows, dtype=np.float64)
+        return NavSeries(arr[:, 0].astype(np.int32), arr[:, 1].astype(dtype or default_nav_dtype()))
+
+    def last_days(self, codes: Iterable[str] = None) -> Dict[str, int]:
+        """各基金最新净值日（天数偏移）"""
+        with self.lock:
+            rows = self.conn.execute("SELECT code, MAX(day) FROM navs GROUP BY code").fetchall()
+        last = dict(rows)
+        if codes is not None:
+            last = {code: last[code] for code in codes if code in last}
+        return last
+
+    def checked(self, code: str) -> Optional[str]:
+        with self.lock:
+            row = self.conn.execute("SELECT checked FROM funds WHERE code = ?", (code,)).fetchone()
+        return row[0] if row else None
+
+    def checked_all(self) -> Dict[str, str]:
+        with self.lock:
+            return dict(self.conn.execute("SELECT code, checked FROM funds"))
+
+    def universe(self) -> Dict[str, str]:
+        """最近一次全市场快照中的基金 {代码: 简称}"""
+        with self.lock:
+            return dict(self.conn.execute("SELECT code, name FROM universe ORDER BY code"))
+
+    def load_window(self, start_day: int):
+        """
+        一次读取全部基金在 start_day 之后的净值，按 (基金, 日期) 排序的扁平数组
+
+        Returns:
+            (codes, offsets, days, navs)：第 i 只基金的数据为 days/navs[offsets[i]:offsets[i + 1]]
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT code, day, nav FROM navs WHERE day >= ? ORDER BY code, day", (int(start_day),)
+            ).fetchall()
+        if not rows:
+            return np.array([], dtype=object), np.zeros(1, dtype=np.int64), \
+                np.array([], dtype=np.int32), np.array([], dtype=np.float64)
+        frame = pd.DataFrame(rows, columns=['code', 'day', 'nav'])
+        code_col = frame['code'].to_numpy()
+        starts = np.flatnonzero(np.concatenate([[True], code_col[1:] != code_col[:-1]]))
+        offsets = np.append(starts, len(code_col)).astype(np.int64)
+        return (code_col[starts], offsets, frame['day'].to_numpy(dtype=np.int32),
+                frame['nav'].to_numpy(dtype=np.float64))
+
+    def tracked_codes(self) -> List[str]:
+        with self.lock:
+            return [code for code, in self.conn.execute("SELECT code FROM funds ORDER BY code")]
+
+    def snapshot_fetched(self, day: str) -> bool:
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM snapshots WHERE day = ?", (day,)).fetchone() is not None
+
+    # ---------- 写入 ----------
+
+    def replace_history(self, code: str, series: NavSeries, checked: str):
+        """用完整历史整体替换（净值修正也随之更新）"""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM navs WHERE code = ?", (code,))
+            self.conn.executemany(
+                "INSERT INTO navs (code, day, nav) VALUES (?, ?, ?)",
+                zip([code] * len(series), series.days.tolist(), series.navs.astype(np.float64).tolist())
+            )
+            self._mark(code, checked, 'history')
+
+    def upsert_points(self, points: pd.DataFrame, checked: str):
+        """写入快照中的最新净值点 [code, day, nav]，并标记这些基金已是最新"""
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO navs (code, day, nav) VALUES (?, ?, ?) "
+                "ON CONFLICT(code, day) DO UPDATE SET nav = excluded.nav",
+                zip(points['code'].tolist(), points['day'].astype(int).tolist(), points['nav'].tolist())
+            )
+            for code in points['code'].unique():
+                self._mark(code, checked, 'snapshot')
+
+    def mark_checked(self, codes: Iterable[str], checked: str):
+        with self.lock, self.conn:
+            for code in codes:
+                self._mark(code, checked, 'snapshot')
+
+    def _mark(self, code: str, checked: str, source: str):
+        self.conn.execute(
+            "INSERT INTO funds (code, checked, source) VALUES (?, ?, ?) "
+            "ON CONFLICT(code) DO UPDATE SET checked = excluded.checked, source = excluded.source",
+            (code, checked, source)
+        )
+
+    def record_snapshot(self, day: str, names: Dict[str, str]):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM universe")
+            self.conn.executemany("INSERT INTO universe (code, name) VALUES (?, ?)", names.items())
+            self.conn.execute("INSERT OR REPLACE INTO snapshots (day, fetched, funds) VALUES (?, ?, ?)",
+                              (day, int(time.time()), len(names)))
+
+    # ---------- 同步 ----------
+
+    def sync(self, codes: Iterable[str], fetch_snapshot: Callable[[], pd.DataFrame],
+             fetch_history: Callable[[str], pd.DataFrame], today: date = None, workers: int = 1) -> Dict:
+        """
+        每日同步：当天首次调用时请求一次全市场快照，更新所有已跟踪基金与 codes；
+        无历史或有缺口的基金逐只获取完整历史（workers > 1 时并行获取）
+
+        Returns:
+            {'snapshot': 快照更新的基金数, 'history': [逐只获取的基金], 'failed': [失败的基金]}
+        """
+        today = today or date.today()
+        checked = today.isoformat()
+        codes = list(dict.fromkeys(codes))
+        stats = {'snapshot': 0, 'history': [], 'failed': []}
+
+        if not self.snapshot_fetched(checked):
+            tracked = list(dict.fromkeys(self.tracked_codes() + codes))
+            try:
+                snapshot = fetch_snapshot()
+                points = parse_daily_snapshot(snapshot)
+                stats['snapshot'] = self._apply_snapshot(points, tracked, today)
+                self.record_snapshot(checked, snapshot_names(snapshot))
+            except Exception as e:
+                print(f"⚠️ 获取全市场净值快照失败，逐只获取历史: {e}")
+
+        checked_all = self.checked_all()
+        missing = [code for code in codes if checked_all.get(code) != checked]
+
+        def backfill(code):
+            try:
+                df = fetch_history(code)
+                if df is None or len(df) == 0:
+                    raise ValueError("无净值数据")
+                self.replace_history(code, NavSeries.from_frame(df, dtype=np.float64), checked)
+                return True
+            except Exception as e:
+                print(f"⚠️ 基金 {code} 获取净值历史失败: {e}")
+                return False
+
+        if workers > 1 and len(missing) > 1:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='nav-backfill') as pool:
+                done = list(pool.map(backfill, missing))
+        else:
+            done = [backfill(code) for code in missing]
+        for code, ok in zip(missing, done):
+            stats['history' if ok else 'failed'].append(code)
+        return stats
+
+    def _apply_snapshot(self, points: pd.DataFrame, tracked: List[str], today: date) -> int:
+        """把快照写入没有缺口的已跟踪基金，返回更新的基金数（有缺口的留给逐只获取）"""
+        last_days = self.last_days(tracked)
+        if not last_days:
+            return 0
+        today_day = to_day_offsets([today])[0]
+        points = points[points['code'].isin(last_days)]
+        codes = np.array(list(last_days), dtype=object)
+        last = np.array(list(last_days.values()), dtype=np.int32)
+        first_new = points.groupby('code')['day'].min().reindex(codes).to_numpy()
+        has_new = ~np.isnan(first_new)
+        first_new = np.where(has_new, first_new, last + 1).astype(np.int32)
+
+        # 快照最早的净值日与已有历史之间没有未覆盖的工作日 → 连续；
+        # 快照中暂无新净值（如 QDII 尚未公布）且未长期停更 → 已有历史仍是最新
+        gap_days = np.busday_count(from_day_offsets(last + 1), from_day_offsets(np.maximum(first_new, last + 1)))
+        contiguous = (first_new <= last + 1) | (gap_days == 0)
+        covered = np.where(has_new, contiguous, today_day - last <= MAX_STALE_DAYS)
+
+        self.upsert_points(points[points['code'].isin(codes[covered & has_new])], today.isoformat())
+        self.mark_checked(codes[covered & ~has_new].tolist(), today.isoformat())
+        return int(covered.sum())
+
+
+def main():
+    import fund_monitor
+
+    parser = argparse.ArgumentParser(description="基金净值历史存储")
+    parser.add_argument('--db', default=NAV_HISTORY_DB)
+    sub = parser.add_subparsers(dest='command', required=True)
+    sync = sub.add_parser('sync', help='每日同步（一次全市场快照 + 缺口基金逐只获取）')
+    sync.add_argument('codes', nargs='*', help='基金代码（默认 fund_monitor 组合）')
+    show = sub.add_parser('show', help='查看基金净值历史')
+    show.add_argument('code')
+    show.add_argument('--tail', type=int, default=10)
+    sub.add_parser('status', help='查看已跟踪基金')
+    args = parser.parse_args()
+
+    with NavHistoryStore(args.db) as store:
+        if args.command == 'sync':
+            start = time.perf_counter()
+            stats = fund_monitor.sync_nav_history(args.codes or list(fund_monitor.PORTFOLIO), store=store)
+            print(f"✅ 快照更新 {stats['snapshot']} 只，逐只获取 {len(stats['history'])} 只，"
+                  f"失败 {len(stats['failed'])} 只，耗时 {time.perf_counter() - start:.1f}s")
+        elif args.command == 'show':
+            series = store.load(args.code)
+            if series is None:
+                print(f"⚠️ 基金 {args.code} 无净值历史")
+                return
+            print(series.to_frame().tail(args.tail).to_string(index=False))
+        else:
+            last_days = store.last_days()
+            for code in store.tracked_codes():
+                last = last_days.get(code)
+                last = from_day_offsets(np.array([last], dtype=np.int32))[0] if last is not None else '-'
+                print(f"  {code}  最新净值日 {last}  确认于 {store.checked(code)}")
+
+
+if __name__ == "__main__":
+    main()
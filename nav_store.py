@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+紧凑的基金净值内存表示
+- 入库时规范化：只保留净值日期与单位净值，去重、按日期排序
+- 日期存为 int32 天数偏移（相对 1970-01-01），净值默认 float64，可选 float32（NAV_FLOAT32=1）
+- 每只基金一条 __slots__ 记录（代码、名称、类型、净值序列），整个基金池可常驻内存
+
+akshare fund_open_fund_info_em 返回的净值日期为 object（datetime.date），每次访问都需
+astype(float) / pd.to_datetime；规范化后 to_frame() 直接给出已类型化的两列 DataFrame。
+"""
+
+import os
+import sys
+import threading
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+
+FLOAT32_ENV = "NAV_FLOAT32"
+
+DATE_COLUMN = '净值日期'
+NAV_COLUMN = '单位净值'
+
+
+def default_nav_dtype():
+    return np.float32 if os.environ.get(FLOAT32_ENV) == '1' else np.float64
+
+
+def to_day_offsets(values) -> np.ndarray:
+    """日期序列（date / 字符串 / datetime64）→ int32 天数偏移"""
+    days = pd.DatetimeIndex(pd.to_datetime(np.asarray(values))).to_numpy().astype('datetime64[D]')
+    return days.astype(np.int64).astype(np.int32)
+
+
+def from_day_offsets(days: np.ndarray) -> np.ndarray:
+    """int32 天数偏移 → datetime64[D]"""
+    return days.astype('datetime64[D]')
+
+
+class NavSeries:
+    """单只基金的净值序列（按日期升序，日期唯一）"""
+
+    __slots__ = ('days', 'navs')
+
+    def __init__(self, days: np.ndarray, navs: np.ndarray):
+        self.days = days
+        self.navs = navs
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, dtype=None) -> 'NavSeries':
+        """从 akshare 格式 DataFrame 规范化（丢弃其他列，同一日期保留最后一条）"""
+        days = to_day_offsets(df[DATE_COLUMN].to_numpy())
+        navs = pd.to_numeric(df[NAV_COLUMN], errors='coerce').to_numpy(dtype=dtype or default_nav_dtype())
+        valid = ~np.isnan(navs)
+        days, navs = days[valid], navs[valid]
+        order = np.argsort(days, kind='stable')
+        days, navs = days[order], navs[order]
+        # 同一日期保留最后一条
+        keep = np.append(days[1:] != days[:-1], True) if len(days) else np.zeros(0, dtype=bool)
+        return cls(days[keep], navs[keep])
+
+    def to_frame(self) -> pd.DataFrame:
+        """还原为已类型化的 DataFrame（净值日期 datetime64 / 单位净值 float）"""
+        return pd.DataFrame({
+            DATE_COLUMN: from_day_offsets(self.days),
+            NAV_COLUMN: self.navs,
+        })
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    @property
+    def dates(self) -> np.ndarray:
+        return from_day_offsets(self.days)
+
+    @property
+    def last_nav(self) -> Optional[float]:
+        return float(self.navs[-1]) if len(self.navs) else None
+
+    @property
+    def nbytes(self) -> int:
+        return self.days.nbytes + self.navs.nbytes
+
+
+class FundRecord:
+    """基金元数据 + 净值序列"""
+
+    __slots__ = ('code', 'name', 'kind', 'version', 'series')
+
+    def __init__(self, code: str, series: NavSeries, name: str = '', kind: str = '', version: str = ''):
+        self.code = code
+        self.name = name
+        self.kind = kind
+        self.version = version  # 数据版本（如缓存日期），版本不同视为过期
+        self.series = series
+
+    @property
+    def nbytes(self) -> int:
+        """记录占用内存（对象本身 + 数组数据，不含共享的字符串常量）"""
+        series = self.series
+        return (sys.getsizeof(self) + sys.getsizeof(series)
+                + series.days.__sizeof__() + series.navs.__sizeof__())
+
+
+class NavStore:
+    """常驻内存的基金净值库（线程安全）"""
+
+    def __init__(self):
+        self.records: Dict[str, FundRecord] = {}
+        self.lock = threading.Lock()
+
+    def get(self, code: str, version: str = '') -> Optional[FundRecord]:
+        record = self.records.get(code)
+        if record is None or record.version != version:
+            return None
+        return record
+
+    def put(self, record: FundRecord):
+        with self.lock:
+            self.records[record.code] = record
+
+    def ingest(self, code: str, df: pd.DataFrame, version: str = '', name: str = '',
+               kind: str = '', dtype=None) -> FundRecord:
+        """规范化 akshare DataFrame 并入库"""
+        record = FundRecord(code, NavSeries.from_frame(df, dtype=dtype), name=name, kind=kind, version=version)
+        self.put(record)
+        return record
+
+    def discard(self, code: str):
+        with self.lock:
+            self.records.pop(code, None)
+
+    def clear(self):
+        with self.lock:
+            self.records = {}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self) -> Iterator[FundRecord]:
+        return iter(list(self.records.values()))
+
+    def nbytes(self) -> int:
+        return sum(record.nbytes for record in self)
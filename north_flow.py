@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+北向资金分钟序列
+- 每个交易日的分钟级累计净流入（沪股通 / 深股通 / 合计，亿元）按 (日期, 分钟) 存入 SQLite WAL，
+  进程内保留当天序列；多个进程（如每分钟一次的 run_sentiment_once.py）共享同一份历史
+- 轮询时只解析上次已存分钟之后的部分：数据源每次返回全天序列（按分钟顺序，未到的分钟为 "-"），
+  按时间跳过不晚于已存最后一分钟的条目（数据源缺分钟或补发时不会错位）
+- 由分钟序列给出 5/15/30 分钟增量、流入加速度、盘中高低点与上午/下午净流入
+
+用法：
+    python north_flow.py show                 # 今天的分钟序列摘要
+    python north_flow.py show --day 2024-05-10
+"""
+
+import argparse
+import json
+import re
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+NORTH_FLOW_DB = "north_flow.db"
+
+# 增量统计的分钟窗口
+DELTA_WINDOWS = (5, 15, 30)
+# 加速度：最近 N 分钟增量 - 之前 N 分钟增量
+ACCELERATION_WINDOW = 5
+# 上午收盘（分钟数，11:30）
+MORNING_CLOSE = 11 * 60 + 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS minutes (
+    day       TEXT    NOT NULL,
+    minute    INTEGER NOT NULL,
+    shanghai  REAL    NOT NULL,
+    shenzhen  REAL    NOT NULL,
+    total     REAL    NOT NULL,
+    PRIMARY KEY (day, minute)
+) WITHOUT ROWID;
+"""
+
+# 每行：分钟数（距 0 点）, 沪股通, 深股通, 合计（累计净流入，亿元）
+ROW_WIDTH = 4
+
+
+def minute_of(text: str) -> int:
+    """'9:31' / '09:31' / '09:31:00' → 距 0 点的分钟数"""
+    hour, minute = text.split(':')[:2]
+    return int(hour) * 60 + int(minute)
+
+
+def format_minute(minute: int) -> str:
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+def parse_kamt_minutes(payload, last_minute: Callable[[date], int],
+                       today: date = None) -> Optional[Tuple[date, np.ndarray]]:
+    """
+    解析东方财富 kamt.rtmin 接口（JSONP 或 JSON 文本 / 已解码的 dict）
+
+    data.s2n 为全天分钟列表 "时间,沪股通净流入,沪股通余额,深股通净流入,合计净流入"（万元），
+    只解析时间晚于 last_minute(当天) 的条目，遇到未到的分钟（"-"）即停止
+    """
+    if isinstance(payload, str):
+        match = re.search(r'\((.*)\)\s*;?\s*$', payload, re.S)
+        payload = json.loads(match.group(1) if match else payload)
+    data = (payload or {}).get('data')
+    if not data or not data.get('s2n'):
+        return None
+
+    today = today or date.today()
+    day = today
+    if data.get('s2nDate'):
+        month, dom = (int(x) for x in data['s2nDate'].split('-')[-2:])
+        day = date(today.year, month, dom)
+        if day > today + timedelta(days=1):  # 跨年：1 月初读到上一年 12 月的数据
+            day = date(today.year - 1, month, dom)
+
+    last = last_minute(day)
+    rows = []
+    for line in data['s2n']:
+        parts = line.split(',')
+        if len(parts) < 5 or '-' in (parts[1], parts[3], parts[4]):
+            break
+        minute = minute_of(parts[0])
+        if minute > last:
+            rows.append((minute, float(parts[1]), float(parts[3]), float(parts[4])))
+    points = np.array(rows, dtype=float).reshape(-1, ROW_WIDTH)
+    points[:, 1:] /= 10000  # 万元 → 亿元
+    return day, points
+
+
+def parse_akshare_minutes(df: pd.DataFrame, last_minute: Callable[[date], int]) -> Optional[Tuple[date, np.ndarray]]:
+    """
+    解析 ak.stock_hsgt_fund_min_em(symbol='北向资金')（列：日期, 时间, 沪股通, 深股通, 北向资金；万元）
+    时间列按分钟递增，二分查找第一个晚于 last_minute(当天) 的行，只转换其后的数值
+    """
+    if df is None or df.empty:
+        return None
+    day = pd.to_datetime(df['日期'].iloc[-1]).date()
+    all_minutes = np.array([minute_of(str(t)) for t in df['时间']], dtype=float)
+    start = int(np.searchsorted(all_minutes, last_minute(day), side='right'))
+    values = df[['沪股通', '深股通', '北向资金']].iloc[start:].apply(pd.to_numeric, errors='coerce')
+    valid = values.notna().all(axis=1).to_numpy()
+    # 未到的分钟为空值，只取第一个空值之前的部分
+    count = len(valid) if valid.all() else int(np.argmin(valid))
+    minutes = all_minutes[start:start + count]
+    points = np.column_stack([minutes, values.to_numpy(dtype=float)[:count] / 10000]).reshape(-1, ROW_WIDTH)
+    return day, points
+
+
+class NorthFlowStore:
+    """按 (日期, 分钟) 存储北向资金累计净流入"""
+
+    def __init__(self, path: str = NORTH_FLOW_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def load(self, day: date) -> np.ndarray:
+        rows = self.conn.execute(
+            "SELECT minute, shanghai, shenzhen, total FROM minutes WHERE day = ? ORDER BY minute",
+            (day.isoformat(),)).fetchall()
+        return np.array(rows, dtype=float).reshape(-1, ROW_WIDTH)
+
+    def append(self, day: date, points: np.ndarray):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO minutes (day, minute, shanghai, shenzhen, total) VALUES (?, ?, ?, ?, ?)",
+                [(day.isoformat(), int(m), float(sh), float(sz), float(t)) for m, sh, sz, t in points])
+
+    def days(self):
+        return [date.fromisoformat(d) for (d,) in
+                self.conn.execute("SELECT DISTINCT day FROM minutes ORDER BY day")]
+
+
+def summarize(points: np.ndarray) -> Optional[Dict]:
+    """由分钟序列计算当前净流入、各窗口增量、加速度、盘中高低点与上午/下午净流入（亿元）"""
+    if len(points) == 0:
+        return None
+    minutes, shanghai, shenzhen, total = points.T
+    # 开盘前累计为 0，窗口超出已有分钟时从 0 起算
+    cumulative = np.concatenate([[0.0], total])
+    last = len(total)
+
+    def delta(window: int, end: int = last) -> float:
+        return float(cumulative[end] - cumulative[max(end - window, 0)])
+
+    net_flow = float(total[-1])
+    peak, trough = int(np.argmax(total)), int(np.argmin(total))
+    morning = minutes <= MORNING_CLOSE
+    morning_flow = float(total[morning][-1]) if morning.any() else 0.0
+    summary = {
+        'net_flow': round(net_flow, 2),
+        'signal': 'inflow' if net_flow > 0 else 'outflow',
+        'shanghai': round(float(shanghai[-1]), 2),
+        'shenzhen': round(float(shenzhen[-1]), 2),
+        'minute': format_minute(int(minutes[-1])),
+        'minutes': last,
+        'peak': round(float(total[peak]), 2),
+        'peak_minute': format_minute(int(minutes[peak])),
+        'trough': round(float(total[trough]), 2),
+        'trough_minute': format_minute(int(minutes[trough])),
+        'morning': round(morning_flow, 2),
+        'afternoon': round(net_flow - morning_flow, 2) if not morning.all() else 0.0,
+    }
+    for window in DELTA_WINDOWS:
+        summary[f'delta_{window}m'] = round(delta(window), 2)
+    recent = delta(ACCELERATION_WINDOW)
+    previous = delta(ACCELERATION_WINDOW, max(last - ACCELERATION_WINDOW, 0))
+    summary['acceleration'] = round(recent - previous, 2)
+    return summary
+
+
+class NorthFlowTracker:
+    """当天北向资金分钟序列（内存）+ 分钟历史（SQLite），线程安全"""
+
+    def __init__(self, path: str = NORTH_FLOW_DB):
+        self.path = path
+        self._store = None
+        self.day = None
+        self.points = np.empty((0, ROW_WIDTH))
+        self._lock = threading.Lock()
+
+    @property
+    def store(self) -> NorthFlowStore:
+        if self._store is None:
+            self._store = NorthFlowStore(self.path)
+        return self._store
+
+    def _switch(self, day: date):
+        if day != self.day:
+            self.day = day
+            self.points = self.store.load(day)
+
+    def last_minute(self, day: date) -> int:
+        """该日已存的最后一分钟（无数据为 -1）：数据源返回的全天序列中晚于它的才是新数据"""
+        self._switch(day)
+        return int(self.points[-1, 0]) if len(self.points) else -1
+
+    def update(self, payload, parse: Callable) -> Optional[Dict]:
+        """
+        追加数据源返回的新分钟，返回 summarize() 结果；无数据时返回 None
+
+        Args:
+            payload: 数据源原始返回（请求在锁外完成，对冲的多个数据源互不阻塞）
+            parse: parse_kamt_minutes / parse_akshare_minutes，按 last_minute 跳过已存的分钟
+        """
+        if payload is None:
+            return None
+        with self._lock:
+            result = parse(payload, self.last_minute)
+            if result is None:
+                return None
+            day, points = result
+            self._switch(day)
+            if len(points):
+                last = self.points[-1, 0] if len(self.points) else -1
+                points = points[points[:, 0] > last]
+            if len(points):
+                self.store.append(day, points)
+                self.points = np.concatenate([self.points, points])
+            return summarize(self.points)
+
+    def summary(self, day: date = None) -> Optional[Dict]:
+        with self._lock:
+            if day is not None:
+                self._switch(day)
+            return summarize(self.points)
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_north_flow_tracker() -> NorthFlowTracker:
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = NorthFlowTracker()
+        return _tracker
+
+
+def main():
+    parser = argparse.ArgumentParser(description="北向资金分钟序列")
+    parser.add_argument('command', choices=['show'])
+    parser.add_argument('--day', help='日期（YYYY-MM-DD），默认今天')
+    parser.add_argument('--db', default=NORTH_FLOW_DB)
+    args = parser.parse_args()
+
+    day = date.fromisoformat(args.day) if args.day else datetime.now().date()
+    with NorthFlowStore(args.db) as store:
+        points = store.load(day)
+        days = store.days()
+    summary = summarize(points)
+    if not summary:
+        print(f"❌ {day} 无分钟数据（已有 {len(days)} 个交易日）")
+        return
+    print(f"📈 {day} 北向资金 {summary['minutes']} 分钟，截至 {summary['minute']}")
+    print(f"  净流入: {summary['net_flow']:+.2f} 亿元（沪股通 {summary['shanghai']:+.2f} / 深股通 {summary['shenzhen']:+.2f}）")
+    print("  增量: " + " | ".join(f"{w}分钟 {summary[f'delta_{w}m']:+.2f}" for w in DELTA_WINDOWS)
+          + f" | 加速度 {summary['acceleration']:+.2f}")
+    print(f"  高点: {summary['peak']:+.2f}（{summary['peak_minute']}）| 低点: {summary['trough']:+.2f}（{summary['trough_minute']}）")
+    print(f"  上午: {summary['morning']:+.2f} | 下午: {summary['afternoon']:+.2f}")
+
+
+if __name__ == "__main__":
+    main()
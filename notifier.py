@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步通知队列（SQLite 持久化，多渠道并行投递）
+- 去重：按基金记录上次通知的（操作建议, 提醒级别），状态未变化的提醒不重复发送
+- 合并：同一渠道积压的多条消息合并为一条摘要投递
+- 异步：后台线程投递，各渠道并行；失败消息保留在队列中，下次运行继续重试
+- 渠道：Server酱、Webhook、SMTP 邮件（可指向本地 SMTP 测试服务）
+
+环境变量：
+- SERVER_CHAN_KEY:   Server酱 SendKey
+- NOTIFY_WEBHOOK_URL: Webhook 地址（POST JSON {"title", "content"}）
+- NOTIFY_SMTP_TO:    收件人（逗号分隔），设置后启用邮件渠道
+- NOTIFY_SMTP_HOST / NOTIFY_SMTP_PORT / NOTIFY_SMTP_FROM / NOTIFY_SMTP_USER / NOTIFY_SMTP_PASSWORD
+  本地测试可运行 `python -m aiosmtpd -n -l localhost:1025` 并使用默认 localhost:1025
+
+用法：
+    python notifier.py status     # 查看队列
+    python notifier.py flush      # 立即投递积压消息
+"""
+
+import argparse
+import contextlib
+import os
+import smtplib
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.header import Header
+from email.mime.text import MIMEText
+from typing import Dict, List, Tuple
+
+from http_resilience import ResilientHTTP, RetryPolicy
+
+
+NOTIFY_DB = "notify_queue.db"
+
+# 单条消息最多尝试次数（跨运行累计），超过后标记为 failed
+MAX_ATTEMPTS = 5
+
+# 等待后台投递完成的最长时间（秒），超时未发出的消息留在队列中
+FLUSH_TIMEOUT = 20
+
+# 需要通知的提醒级别
+ALERT_LEVELS = ('critical', 'high')
+
+# 估算净值触发的提醒在操作建议后的标注（fund_monitor.decide_all）；
+# 去重时与正式净值确认后的同一提醒视为同一状态，不重复通知
+ESTIMATE_MARK = "(估)"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel      TEXT    NOT NULL,
+    created      INTEGER NOT NULL,
+    title        TEXT    NOT NULL,
+    content      TEXT    NOT NULL,
+    status       TEXT    NOT NULL DEFAULT 'pending',  -- pending / sent / failed
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    last_error   TEXT,
+    sent_at      INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_channel_status ON outbox(channel, status);
+CREATE TABLE IF NOT EXISTS fund_state (
+    code         TEXT PRIMARY KEY,
+    advice       TEXT,
+    alert_level  TEXT,
+    updated      INTEGER NOT NULL
+);
+"""
+
+
+# ===================== 通知渠道 =====================
+
+class Channel:
+    """通知渠道基类：send 失败时抛出异常"""
+
+    name = 'base'
+
+    @classmethod
+    def from_env(cls):
+        """根据环境变量创建渠道，未配置返回 None"""
+        raise NotImplementedError
+
+    def send(self, title: str, content: str):
+        raise NotImplementedError
+
+
+# 通知请求：复用连接池，指数退避重试，接口持续失败时熔断
+NOTIFY_HTTP = ResilientHTTP(retry=RetryPolicy(max_retries=2), default_timeout=10)
+
+
+class ServerChanChannel(Channel):
+    name = 'serverchan'
+
+    def __init__(self, sendkey: str):
+        self.url = f"https://sctapi.ftqq.com/{sendkey}.send"
+
+    @classmethod
+    def from_env(cls):
+        sendkey = os.environ.get('SERVER_CHAN_KEY')
+        return cls(sendkey) if sendkey else None
+
+    def send(self, title: str, content: str):
+        result = NOTIFY_HTTP.post(self.url, data={"title": title, "desp": content}).json()
+        if result.get('code') != 0:
+            raise RuntimeError(result.get('message', '未知错误'))
+
+
+class WebhookChannel(Channel):
+    name = 'webhook'
+
+    def __init__(self, url: str):
+        self.url = url
+
+    @classmethod
+    def from_env(cls):
+        url = os.environ.get('NOTIFY_WEBHOOK_URL')
+        return cls(url) if url else None
+
+    def send(self, title: str, content: str):
+        NOTIFY_HTTP.post(self.url, json={"title": title, "content": content})
+
+
+class SmtpChannel(Channel):
+    name = 'smtp'
+
+    def __init__(self, host: str, port: int, sender: str, recipients: List[str],
+                 user: str = None, password: str = None):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipients = recipients
+        self.user = user
+        self.password = password
+
+    @classmethod
+    def from_env(cls):
+        recipients = [r.strip() for r in os.environ.get('NOTIFY_SMTP_TO', '').split(',') if r.strip()]
+        if not recipients:
+            return None
+        return cls(
+            host=os.environ.get('NOTIFY_SMTP_HOST', 'localhost'),
+            port=int(os.environ.get('NOTIFY_SMTP_PORT', 1025)),
+            sender=os.environ.get('NOTIFY_SMTP_FROM', 'fund-monitor@localhost'),
+            recipients=recipients,
+            user=os.environ.get('NOTIFY_SMTP_USER'),
+            password=os.environ.get('NOTIFY_SMTP_PASSWORD'),
+        )
+
+    def send(self, title: str, content: str):
+        message = MIMEText(content, 'plain', 'utf-8')
+        message['Subject'] = Header(title, 'utf-8')
+        message['From'] = self.sender
+        message['To'] = ', '.join(self.recipients)
+        with smtplib.SMTP(self.host, self.port, timeout=10) as smtp:
+            if self.user:
+                smtp.starttls()
+                smtp.login(self.user, self.password)
+            smtp.sendmail(self.sender, self.recipients, message.as_string())
+
+
+CHANNEL_TYPES = (ServerChanChannel, WebhookChannel, SmtpChannel)
+
+
+def channels_from_env() -> List[Channel]:
+    channels = []
+    for cls in CHANNEL_TYPES:
+        try:
+            channel = cls.from_env()
+        except Exception as e:
+            print(f"⚠️ 通知渠道 {cls.name} 配置无效: {e}")
+            continue
+        if channel is not None:
+            channels.append(channel)
+    return channels
+
+
+# ===================== 通知队列 =====================
+
+
+def alert_state(result: Dict) -> Tuple[str, str]:
+    """用于去重的提醒状态：(去掉估算标注的操作建议, 提醒级别)"""
+    advice = result['advice']
+    if advice.endswith(ESTIMATE_MARK):
+        advice = advice[:-len(ESTIMATE_MARK)]
+    return advice, result['alert_level']
+
+class NotificationQueue:
+    """持久化出站队列"""
+
+    def __init__(self, path: str = NOTIFY_DB, channels: List[Channel] = None):
+        self.path = path
+        self.channels = channels if channels is not None else channels_from_env()
+        self.worker = None
+        with self._db() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextlib.contextmanager
+    def _db(self):
+        # 每次操作单独连接，后台投递线程与主线程互不共享连接
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def recorded_alerts(self, codes: List[str], levels=ALERT_LEVELS) -> Dict[str, str]:
+        """指定基金上次记录的提醒（级别在 levels 内），返回 {代码: 操作建议}"""
+        if not codes:
+            return {}
+        with self._db() as conn:
+            rows = conn.execute(
+                f"SELECT code, advice, alert_level FROM fund_state WHERE code IN ({', '.join('?' * len(codes))})",
+                list(codes))
+            return {row['code']: row['advice'] for row in rows if row['alert_level'] in levels}
+
+    def changed_alerts(self, results: List[Dict], levels=ALERT_LEVELS) -> Tuple[List[Dict], int]:
+        """
+        与上次记录的各基金状态比较，返回 (状态发生变化的提醒列表, 未变化而跳过的提醒数)
+        状态为去掉估算标注的操作建议 + 提醒级别；所有基金的当前状态都会写回，基金退出提醒状态后再次进入会重新通知
+        """
+        now = int(time.time())
+        changed, unchanged = [], 0
+        with self._db() as conn:
+            # 旧版本写入的状态可能带估算标注，读取时同样去掉
+            previous = {row['code']: alert_state(row)
+                        for row in conn.execute("SELECT code, advice, alert_level FROM fund_state")}
+            for r in results:
+                if r['alert_level'] not in levels:
+                    continue
+                if previous.get(r['code']) == alert_state(r):
+                    unchanged += 1
+                else:
+                    changed.append(r)
+            conn.executemany(
+                "INSERT INTO fund_state (code, advice, alert_level, updated) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(code) DO UPDATE SET advice=excluded.advice, "
+                "alert_level=excluded.alert_level, updated=excluded.updated",
+                [(r['code'], *alert_state(r), now) for r in results]
+            )
+        return changed, unchanged
+
+    def enqueue(self, title: str, content: str) -> int:
+        """为每个已配置渠道各写入一条待发送消息，返回写入条数"""
+        now = int(time.time())
+        with self._db() as conn:
+            conn.executemany(
+                "INSERT INTO outbox (channel, created, title, content) VALUES (?, ?, ?, ?)",
+                [(channel.name, now, title, content) for channel in self.channels]
+            )
+        return len(self.channels)
+
+    def pending(self, channel: str) -> List[sqlite3.Row]:
+        with self._db() as conn:
+            return conn.execute(
+                "SELECT * FROM outbox WHERE channel = ? AND status = 'pending' ORDER BY id", (channel,)
+            ).fetchall()
+
+    @staticmethod
+    def digest(rows: List[sqlite3.Row]) -> Tuple[str, str]:
+        """多条积压消息合并为一条摘要"""
+        if len(rows) == 1:
+            return rows[0]['title'], rows[0]['content']
+        title = f"{rows[-1]['title']}（合并 {len(rows)} 条）"
+        content = "\n\n---\n\n".join(
+            f"#### {time.strftime('%Y-%m-%d %H:%M', time.localtime(row['created']))} {row['title']}\n\n{row['content']}"
+            for row in rows
+        )
+        return title, content
+
+    def _deliver_channel(self, channel: Channel) -> bool:
+        rows = self.pending(channel.name)
+        if not rows:
+            return True
+        title, content = self.digest(rows)
+        ids = [row['id'] for row in rows]
+        marks = ', '.join('?' * len(ids))
+        try:
+            channel.send(title, content)
+        except Exception as e:
+            with self._db() as conn:
+                conn.execute(f"UPDATE outbox SET attempts = attempts + 1, last_error = ? WHERE id IN ({marks})",
+                             (str(e)[:500], *ids))
+                conn.execute(f"UPDATE outbox SET status = 'failed' WHERE id IN ({marks}) AND attempts >= ?",
+                             (*ids, MAX_ATTEMPTS))
+            print(f"⚠️ {channel.name} 通知发送失败（{len(rows)} 条保留在队列中）: {e}")
+            return False
+        with self._db() as conn:
+            conn.execute(f"UPDATE outbox SET status = 'sent', sent_at = ?, attempts = attempts + 1 "
+                         f"WHERE id IN ({marks})", (int(time.time()), *ids))
+        print(f"✅ {channel.name} 通知发送成功（{len(rows)} 条）")
+        return True
+
+    def deliver(self) -> Dict[str, bool]:
+        """各渠道并行投递积压消息，返回 {渠道: 是否成功}"""
+        if not self.channels:
+            return {}
+        with ThreadPoolExecutor(max_workers=len(self.channels), thread_name_prefix='notify') as pool:
+            futures = {channel.name: pool.submit(self._deliver_channel, channel) for channel in self.channels}
+        return {name: future.result() for name, future in futures.items()}
+
+    def deliver_async(self):
+        """后台线程投递，不阻塞调用方"""
+        def run():
+            try:
+                self.deliver()
+            except Exception as e:
+                print(f"⚠️ 通知投递异常: {e}")
+
+        self.worker = threading.Thread(target=run, name='notify-delivery', daemon=True)
+        self.worker.start()
+
+    def wait(self, timeout: float = FLUSH_TIMEOUT) -> bool:
+        """等待后台投递结束；超时返回 False（未发出的消息留待下次运行）"""
+        if self.worker is None:
+            return True
+        self.worker.join(timeout)
+        if self.worker.is_alive():
+            print(f"⚠️ 通知投递超过 {timeout}s 未完成，未发送的消息将在下次运行时重试")
+            return False
+        return True
+
+    def status(self) -> Dict[str, Dict[str, int]]:
+        with self._db() as conn:
+            rows = conn.execute("SELECT channel, status, COUNT(*) AS n FROM outbox GROUP BY channel, status")
+            summary = {}
+            for row in rows:
+                summary.setdefault(row['channel'], {})[row['status']] = row['n']
+            return summary
+
+
+_queue = None
+
+
+def get_notification_queue() -> NotificationQueue:
+    """进程内共享的通知队列（首次使用时按环境变量配置渠道）"""
+    global _queue
+    if _queue is None:
+        _queue = NotificationQueue()
+    return _queue
+
+
+def main():
+    parser = argparse.ArgumentParser(description="通知队列")
+    parser.add_argument('--db', default=NOTIFY_DB)
+    parser.add_argument('command', choices=['status', 'flush'])
+    args = parser.parse_args()
+
+    queue = NotificationQueue(args.db)
+    print(f"📮 已配置渠道: {', '.join(c.name for c in queue.channels) or '无'}")
+    if args.command == 'flush':
+        queue.deliver()
+    for channel, counts in queue.status().items():
+        print(f"  {channel:<12} " + '  '.join(f"{k}={v}" for k, v in sorted(counts.items())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基金净值峰值存储（SQLite WAL）
+- 每只基金一行，按基金 upsert，峰值只增不减（MAX 合并），多个并发运行互不覆盖
+- 单条事务提交，进程崩溃不会留下写了一半的文件
+- 首次使用时自动导入旧版 peak_record.json
+
+用法：
+    python peak_store.py show
+    python peak_store.py import peak_record.json
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import time
+from typing import Dict
+
+
+PEAK_DB = "peak_record.db"
+LEGACY_PEAK_FILE = "peak_record.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS peaks (
+    code     TEXT PRIMARY KEY,
+    peak     REAL    NOT NULL,
+    updated  INTEGER NOT NULL
+);
+"""
+
+
+class PeakStore:
+    """按基金存取历史峰值"""
+
+    def __init__(self, path: str = PEAK_DB, legacy_file: str = LEGACY_PEAK_FILE):
+        self.path = path
+        fresh = not os.path.exists(path)
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        if fresh and legacy_file and os.path.exists(legacy_file):
+            self.import_json(legacy_file)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def load(self) -> Dict[str, float]:
+        return {code: peak for code, peak in self.conn.execute("SELECT code, peak FROM peaks")}
+
+    def upsert(self, peaks: Dict[str, float]):
+        """写入各基金峰值，已有记录取较大值（并发运行各自写入也不会丢失更高的峰值）"""
+        now = int(time.time())
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO peaks (code, peak, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(code) DO UPDATE SET peak = MAX(peak, excluded.peak), updated = excluded.updated "
+                "WHERE excluded.peak > peak",
+                [(code, float(peak), now) for code, peak in peaks.items()]
+            )
+
+    def import_json(self, path: str):
+        with open(path, 'r', encoding='utf-8') as f:
+            self.upsert(json.load(f))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="基金峰值记录")
+    parser.add_argument('--db', default=PEAK_DB)
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('show', help='查看各基金峰值')
+    imp = sub.add_parser('import', help='导入 peak_record.json')
+    imp.add_argument('file')
+    args = parser.parse_args()
+
+    with PeakStore(args.db, legacy_file=None) as store:
+        if args.command == 'import':
+            store.import_json(args.file)
+            print(f"✅ 已导入 {args.file}")
+        for code, peak in sorted(store.load().items()):
+            print(f"  {code}  {peak:.4f}")
+
+
+if __name__ == "__main__":
+    main()
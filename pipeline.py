@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按依赖关系并发执行的阶段流水线（DAG）
+每个阶段声明输入阶段，输入全部完成后立即提交到线程池；互不依赖的阶段并行执行。
+后台阶段（写文件、发通知等阻塞 I/O）不在关键路径上，关键路径完成时间单独记录。
+
+声明了 fallback 的阶段可以被放弃：开始后超过 budget 秒、或超过 run(deadline=...) 的截止时间仍未完成时，
+不再等待（工作线程为守护线程，挂起的请求不阻塞退出），以 fallback() 的返回值作为输出继续下游阶段；
+截止时间已过时尚未开始的此类阶段直接使用 fallback。没有 fallback 的阶段（汇总、输出、保存）总会执行。
+
+用法：
+    pipe = Pipeline(max_workers=4)
+    pipe.add('peak', load_peak_record)
+    pipe.add('fund', analyze, inputs=['peak'], budget=30, fallback=lambda: None)
+    pipe.add('save', save, inputs=['fund'], background=True)
+    outputs = pipe.run(deadline=Deadline(60))
+    pipe.timed_out                # 被放弃的阶段
+"""
+
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from deadline import Deadline, DaemonExecutor
+
+
+WORKERS_ENV = "FUND_MONITOR_WORKERS"
+DEFAULT_WORKERS = 8
+
+
+class PipelineError(Exception):
+    """阶段定义错误（重名、未知输入、循环依赖）"""
+
+
+class Stage:
+    __slots__ = ('name', 'fn', 'inputs', 'background', 'budget', 'fallback')
+
+    def __init__(self, name: str, fn: Callable, inputs: Sequence[str], background: bool,
+                 budget: float = None, fallback: Callable = None):
+        self.name = name
+        self.fn = fn
+        self.inputs = list(inputs)
+        self.background = background
+        self.budget = budget
+        self.fallback = fallback
+
+
+class Pipeline:
+    """阶段 DAG，fn 按 inputs 顺序接收各输入阶段的返回值"""
+
+    def __init__(self, max_workers: int = None):
+        self.max_workers = max_workers or int(os.environ.get(WORKERS_ENV, DEFAULT_WORKERS))
+        self.stages: Dict[str, Stage] = {}
+        self.timings: Dict[str, float] = {}
+        self.started: Dict[str, float] = {}
+        self.timed_out: List[str] = []
+        self.critical_path_time = None
+
+    def add(self, name: str, fn: Callable, inputs: Sequence[str] = (), background: bool = False,
+            budget: float = None, fallback: Callable = None):
+        """
+        Args:
+            budget: 阶段开始后最多等待的秒数（需同时指定 fallback）
+            fallback: 阶段被放弃时代替其输出的无参函数；未指定时阶段不会被放弃
+        """
+        if name in self.stages:
+            raise PipelineError(f"阶段重名: {name}")
+        if budget is not None and fallback is None:
+            raise PipelineError(f"阶段 {name} 指定了 budget 但没有 fallback")
+        self.stages[name] = Stage(name, fn, inputs, background, budget, fallback)
+
+    def _validate(self):
+        for stage in self.stages.values():
+            for dep in stage.inputs:
+                if dep not in self.stages:
+                    raise PipelineError(f"阶段 {stage.name} 依赖未知阶段: {dep}")
+        # 拓扑排序检测循环依赖
+        pending = {name: set(s.inputs) for name, s in self.stages.items()}
+        while pending:
+            ready = [name for name, deps in pending.items() if not deps]
+            if not ready:
+                raise PipelineError(f"存在循环依赖: {', '.join(sorted(pending))}")
+            for name in ready:
+                del pending[name]
+            for deps in pending.values():
+                deps.difference_update(ready)
+
+    def _timed(self, stage: Stage, args: List[Any]):
+        self.started[stage.name] = time.monotonic()
+        start = time.perf_counter()
+        try:
+            return stage.fn(*args)
+        finally:
+            self.timings[stage.name] = time.perf_counter() - start
+
+    def _expires_at(self, name: str, deadline: Optional[Deadline]) -> Optional[float]:
+        """可放弃阶段的放弃时刻（单调时钟）：min(开始 + budget, 截止时间)；不可放弃返回 None"""
+        stage = self.stages[name]
+        if stage.fallback is None:
+            return None
+        limits = []
+        if deadline is not None and deadline.enabled:
+            limits.append(deadline.expires_at)
+        if stage.budget is not None:
+            # 排队尚未开始的按此刻开始估计，开始后按实际开始时间重新计算
+            limits.append(self.started.get(name, time.monotonic()) + stage.budget)
+        return min(limits) if limits else None
+
+    def _give_up(self, name: str, outputs: Dict[str, Any], reason: str):
+        self.timed_out.append(name)
+        outputs[name] = self.stages[name].fallback()
+        print(f"⏱️ 阶段 {name} {reason}，使用降级结果")
+
+    def run(self, deadline: Deadline = None) -> Dict[str, Any]:
+        """
+        执行全部阶段并返回 {阶段名: 返回值}；任一阶段异常时等待其余阶段结束后抛出首个异常
+        可放弃的阶段超过 budget 或 deadline 时以 fallback() 作为输出，记录在 self.timed_out
+        """
+        self._validate()
+        start = time.perf_counter()
+        self.started.clear()
+        self.timed_out = []
+        outputs: Dict[str, Any] = {}
+        errors: Dict[str, BaseException] = {}
+        skipped = set()
+        waiting = dict(self.stages)
+        running = {}
+        critical = {name for name, s in self.stages.items() if not s.background}
+
+        with DaemonExecutor(max_workers=self.max_workers, thread_name_prefix='pipeline') as pool:
+            while waiting or running:
+                expired = deadline is not None and deadline.expired
+                for name, stage in list(waiting.items()):
+                    if any(dep in errors or dep in skipped for dep in stage.inputs):
+                        skipped.add(name)
+                        del waiting[name]
+                    elif all(dep in outputs for dep in stage.inputs):
+                        del waiting[name]
+                        if expired and stage.fallback is not None:
+                            self._give_up(name, outputs, "未开始，已过截止时间")
+                            continue
+                        args = [outputs[dep] for dep in stage.inputs]
+                        running[pool.submit(self._timed, stage, args)] = name
+                if not running:
+                    continue
+                now = time.monotonic()
+                limits = [t for t in (self._expires_at(n, deadline) for n in running.values()) if t is not None]
+                timeout = max(min(limits) - now, 0) if limits else None
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        outputs[name] = future.result()
+                    except Exception as e:
+                        errors[name] = e
+                        print(f"⚠️ 阶段 {name} 失败: {e}")
+                # 超过预算或截止时间的阶段不再等待（未开始的直接取消）
+                now = time.monotonic()
+                for future, name in list(running.items()):
+                    expires_at = self._expires_at(name, deadline)
+                    if expires_at is not None and now >= expires_at and not future.done():
+                        del running[future]
+                        if future.cancel():
+                            self._give_up(name, outputs, "未开始，已过截止时间")
+                        else:
+                            self._give_up(name, outputs, f"超时（已运行 {now - self.started.get(name, now):.1f}s）")
+                if self.critical_path_time is None and critical.isdisjoint(waiting) \
+                        and critical.isdisjoint(running.values()):
+                    self.critical_path_time = time.perf_counter() - start
+
+        if skipped:
+            print(f"⚠️ 因上游失败跳过阶段: {', '.join(sorted(skipped))}")
+        if errors:
+            raise next(iter(errors.values()))
+        return outputs
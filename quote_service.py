@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+新浪批量行情服务
+- 任意数量的指数 / A 股 / ETF / 美股 / 汇率代码，按 URL 长度切分为多批，并行请求（每批一次往返）
+- 每个响应用一次正则扫描解析为按代码索引的表，不再逐个代码搜索全文
+- 支持的代码：s_sh000300（指数简版）、sh510300 / sz159915（A 股、场内 ETF、指数完整版）、
+  gb_qqq（美股 / 美股 ETF）、fx_susdcny（汇率）
+
+用法：
+    python quote_service.py s_sh000300 sh510300 gb_qqq fx_susdcny
+    python quote_service.py --qdii        # 全部 QDII 代理 ETF、汇率与主要 / 行业指数
+"""
+
+import argparse
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+SINA_QUOTE_URL = "https://hq.sinajs.cn/list="
+SINA_HEADERS = {'Referer': 'https://finance.sina.com.cn/'}
+
+# 单个请求 URL 的长度上限（新浪对过长的 list 会直接返回错误）
+MAX_URL_LENGTH = 1800
+QUOTE_WORKERS = 8
+
+QUOTE_COLUMNS = ['name', 'current', 'prev_close', 'change_pct', 'amount', 'date']
+
+# 主要宽基与申万一级行业指数（简版），供 --qdii 一并请求
+SECTOR_INDEX_SYMBOLS = [
+    's_sh000001', 's_sz399001', 's_sh000300', 's_sz399006', 's_sh000905', 's_sh000852', 's_sh000688',
+    's_sz399986', 's_sz399975', 's_sz399967', 's_sz399971', 's_sz399932', 's_sz399933', 's_sz399989',
+    's_sh000827', 's_sz399808', 's_sz399997', 's_sh000993', 's_sz399995', 's_sz399998',
+]
+
+_QUOTE_PATTERN = re.compile(r'hq_str_(\w+)="([^"]*)"')
+
+
+def split_batches(symbols: Iterable[str], max_length: int = MAX_URL_LENGTH) -> List[List[str]]:
+    """按 URL 长度切分（代码间以逗号分隔）"""
+    batches, batch, length = [], [], len(SINA_QUOTE_URL)
+    for symbol in symbols:
+        extra = len(symbol) + (1 if batch else 0)
+        if batch and length + extra > max_length:
+            batches.append(batch)
+            batch, length, extra = [], len(SINA_QUOTE_URL), len(symbol)
+        batch.append(symbol)
+        length += extra
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _parse_fields(symbol: str, data: List[str]) -> Optional[tuple]:
+    """单个代码的字段 → (name, current, prev_close, change_pct, amount(元), date)"""
+    if symbol.startswith('s_'):
+        # 名称,最新价,涨跌额,涨跌幅,成交量(手),成交额(万元)
+        current, change = float(data[1]), float(data[2])
+        return data[0], current, current - change, float(data[3]), float(data[5]) * 10000, None
+    if symbol.startswith('gb_'):
+        # 名称,最新价,涨跌幅,时间(北京时间),涨跌额,...；美股收盘在北京时间次日凌晨，回推 12 小时得到美东交易日
+        current = float(data[1])
+        quote_time = datetime.strptime(data[3], '%Y-%m-%d %H:%M:%S')
+        return (data[0], current, current - float(data[4]), float(data[2]), np.nan,
+                (quote_time - timedelta(hours=12)).date())
+    if symbol.startswith('fx_'):
+        # 时间,买入,卖出,昨收,点差,开盘,最高,最低,最新,名称,...,日期
+        current, prev_close = float(data[8]), float(data[3])
+        return (data[9], current, prev_close, (current - prev_close) / prev_close * 100 if prev_close else np.nan,
+                np.nan, datetime.strptime(data[-1], '%Y-%m-%d').date())
+    if symbol[:2] in ('sh', 'sz', 'bj'):
+        # 名称,今开,昨收,最新价,最高,最低,买一,卖一,成交量(股),成交额(元),...,日期(30),时间(31)
+        prev_close, current = float(data[2]), float(data[3])
+        return (data[0], current, prev_close, (current - prev_close) / prev_close * 100 if prev_close else np.nan,
+                float(data[9]), datetime.strptime(data[30], '%Y-%m-%d').date())
+    return None
+
+
+def parse_sina_quotes(text: str) -> pd.DataFrame:
+    """一次扫描解析新浪行情响应，返回以代码为索引的表（列见 QUOTE_COLUMNS）；无效或空行情跳过"""
+    symbols, rows = [], []
+    for match in _QUOTE_PATTERN.finditer(text):
+        symbol, body = match.groups()
+        if not body:
+            continue
+        try:
+            row = _parse_fields(symbol, body.split(','))
+        except (ValueError, IndexError):
+            continue
+        # 停牌 / 未开盘时最新价为 0
+        if row is None or not row[1] > 0 or not row[2] > 0:
+            continue
+        symbols.append(symbol)
+        rows.append(row)
+    df = pd.DataFrame(rows, columns=QUOTE_COLUMNS, index=pd.Index(symbols, name='symbol'))
+    df['change_pct'] = df['change_pct'].astype(float).round(2)
+    return df
+
+
+class QuoteService:
+    """批量行情：切分、并行请求、一次解析（请求经由 StockDataCrawler 的重试 / 熔断 / 缓存 / 夹具层）"""
+
+    def __init__(self, crawler=None, workers: int = QUOTE_WORKERS, max_url_length: int = MAX_URL_LENGTH):
+        self._crawler = crawler
+        self.workers = workers
+        self.max_url_length = max_url_length
+        self.stats = {'requests': 0, 'symbols': 0}
+
+    @property
+    def crawler(self):
+        if self._crawler is None:
+            from stock_data_crawler import StockDataCrawler
+            self._crawler = StockDataCrawler()
+        return self._crawler
+
+    def fetch_batch(self, symbols: List[str]) -> pd.DataFrame:
+        response = self.crawler._request_with_retry(SINA_QUOTE_URL + ','.join(symbols), kind='index',
+                                                    headers=SINA_HEADERS)
+        if not response:
+            return parse_sina_quotes('')
+        response.encoding = 'gbk'
+        return parse_sina_quotes(response.text)
+
+    def get_quotes(self, symbols: Iterable[str]) -> pd.DataFrame:
+        """获取全部代码的行情（去重后按批并行请求）；失败的批次对应代码不在结果中"""
+        symbols = list(dict.fromkeys(symbols))
+        self.stats['symbols'] += len(symbols)
+        batches = split_batches(symbols, self.max_url_length)
+        self.stats['requests'] += len(batches)
+        if len(batches) <= 1:
+            frames = [self.fetch_batch(b) for b in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(batches)),
+                                    thread_name_prefix='quote') as pool:
+                frames = list(pool.map(self.fetch_batch, batches))
+        if not frames:
+            return parse_sina_quotes('')
+        df = pd.concat(frames)
+        return df[~df.index.duplicated()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="新浪批量行情")
+    parser.add_argument('symbols', nargs='*', help='新浪行情代码')
+    parser.add_argument('--qdii', action='store_true', help='全部 QDII 代理 ETF、汇率与主要 / 行业指数')
+    parser.add_argument('--workers', type=int, default=QUOTE_WORKERS)
+    args = parser.parse_args()
+
+    symbols = list(args.symbols)
+    if args.qdii:
+        from nav_estimator import FUND_PROXIES
+        symbols += sorted({s for p in FUND_PROXIES.values() for s in (p['proxy'], p['fx'])})
+        symbols += SECTOR_INDEX_SYMBOLS
+    if not symbols:
+        parser.error('请指定行情代码或 --qdii')
+
+    service = QuoteService(workers=args.workers)
+    start = time.perf_counter()
+    df = service.get_quotes(symbols)
+    print(f"✅ {len(df)}/{len(set(symbols))} 个代码，{service.stats['requests']} 次请求，"
+          f"耗时 {time.perf_counter() - start:.2f}s")
+    with pd.option_context('display.max_rows', None, 'display.width', 160):
+        print(df)
+
+
+if __name__ == "__main__":
+    main()
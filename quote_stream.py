@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+推送式行情接入
+全市场快照轮询（约 5000 只股票）是情绪监控最耗时的一步，且分辨率受轮询间隔限制。
+本模块从行情推送源逐条接收增量行情（tick），在内存中维护市场宽度（breadth_state.BreadthState，
+每条 O(1)）与指数状态，MarketSentimentMonitor 可直接读取，不再拉取全量快照。
+
+- 推送格式：每行一个 JSON，{"ts": 秒, "kind": "stock", "code", "name", "price", "change", "amount"}
+  或 {"ts": 秒, "kind": "index", "key": "csi300", "change", "volume"}（volume 为亿元）；
+  空闲时推送源应定期发送心跳 {"kind": "heartbeat"}
+- SocketFeed：TCP 按行读取推送，断线或超过 READ_TIMEOUT 没有任何数据（含心跳，半开连接）时自动重连
+- QuoteStream.fresh()：超过 STREAM_STALE_AFTER 秒没有收到行情时视为过期，情绪监控改用轮询快照
+- ReplayServer：本地回放服务，按录制时间间隔（可加速）推送录制好的 tick、空闲时发送心跳，便于离线开发与基准测试
+- 录制：相邻两次快照只为变化的股票生成 tick；可用合成行情或真实轮询录制
+
+用法：
+    python quote_stream.py record --synthetic --stocks 5000 --minutes 240 --output ticks.jsonl
+    python quote_stream.py record --live --samples 30 --interval 60 --output ticks.jsonl
+    python quote_stream.py serve ticks.jsonl --port 9300 --speed 10
+    python quote_stream.py consume --port 9300 --report-every 30
+    python quote_stream.py bench ticks.jsonl                      # 回放全部 tick，测吞吐并与全量计算核对
+
+    QUOTE_STREAM=127.0.0.1:9300 python market_sentiment.py        # 情绪监控使用推送行情
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from typing import Dict, Iterable, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from breadth_state import DROP_5_PCT, DROP_8_PCT, LIMIT_PCT, BreadthState
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 9300
+
+# 设置为 host:port 时 market_sentiment.py 使用推送行情
+STREAM_ENV = "QUOTE_STREAM"
+
+RECONNECT_DELAY = 3.0
+SOCKET_TIMEOUT = 30.0
+# 超过该时间没有收到任何数据（含心跳）视为连接已断开，重新连接
+READ_TIMEOUT = 60.0
+# 回放服务空闲时的心跳间隔
+HEARTBEAT_INTERVAL = 15.0
+HEARTBEAT = b'{"kind": "heartbeat"}\n'
+# 超过该时间没有收到行情，推送状态视为过期（午休、收盘、推送源故障），改用轮询快照
+STREAM_STALE_AFTER = 120.0
+
+
+# ===================== 推送源 =====================
+
+class QuoteFeed:
+    """推送源基类：迭代返回 tick（dict）"""
+
+    def __iter__(self) -> Iterator[Dict]:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SocketFeed(QuoteFeed):
+    """TCP 行协议推送源（每行一个 JSON），断线后自动重连"""
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, reconnect: bool = True):
+        self.host, self.port = host, port
+        self.reconnect = reconnect
+        self.closed = False
+        self._sock = None
+
+    def __iter__(self) -> Iterator[Dict]:
+        while not self.closed:
+            try:
+                self._sock = socket.create_connection((self.host, self.port), timeout=SOCKET_TIMEOUT)
+                # 推送源空闲时发送心跳，读超时说明连接已失效（半开连接不会报错，只会一直阻塞）
+                self._sock.settimeout(READ_TIMEOUT)
+                with self._sock.makefile('r', encoding='utf-8') as lines:
+                    for line in lines:
+                        if line.strip():
+                            tick = json.loads(line)
+                            if tick.get('kind') != 'heartbeat':
+                                yield tick
+            except (OSError, ValueError) as e:
+                if self.closed:
+                    return
+                print(f"⚠️ 行情推送连接中断: {e}")
+            finally:
+                if self._sock is not None:
+                    self._sock.close()
+            if not self.reconnect or self.closed:
+                return
+            time.sleep(RECONNECT_DELAY)
+
+    def close(self):
+        self.closed = True
+        if self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class FileFeed(QuoteFeed):
+    """直接读取录制文件（不经网络、不按时间间隔）"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def __iter__(self) -> Iterator[Dict]:
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+# ===================== 接入 =====================
+
+class QuoteStream:
+    """后台线程消费推送源，维护市场宽度与指数状态"""
+
+    def __init__(self, feed: QuoteFeed):
+        self.feed = feed
+        self.state = BreadthState()
+        self.indices: Dict[str, Dict] = {}
+        self.lock = threading.Lock()
+        self.ticks = 0
+        self.last_tick = None
+        self.last_received = None
+        self._thread = None
+
+    @property
+    def ready(self) -> bool:
+        return len(self.state) > 0
+
+    @property
+    def age(self) -> Optional[float]:
+        """距上一条行情到达的秒数；尚未收到时为 None"""
+        return None if self.last_received is None else time.monotonic() - self.last_received
+
+    def fresh(self, max_age: float = STREAM_STALE_AFTER) -> bool:
+        """已有行情且最近 max_age 秒内仍有推送"""
+        age = self.age
+        return self.ready and age is not None and age <= max_age
+
+    def apply(self, tick: Dict):
+        with self.lock:
+            if tick.get('kind') == 'index':
+                self.indices[tick['key']] = {'change_pct': float(tick['change']), 'volume': float(tick['volume'])}
+            else:
+                self.state.update(tick['code'], float(tick['change']), float(tick['amount']),
+                                  tick.get('price'), tick.get('name'))
+            self.ticks += 1
+            self.last_tick = tick.get('ts')
+            self.last_received = time.monotonic()
+
+    def consume(self, feed: Iterable[Dict] = None):
+        for tick in feed or self.feed:
+            self.apply(tick)
+
+    def start(self) -> 'QuoteStream':
+        self._thread = threading.Thread(target=self.consume, name='quote-stream', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.feed.close()
+
+    def breadth(self) -> Optional[Dict]:
+        with self.lock:
+            return self.state.breadth()
+
+    def index_quotes(self) -> Optional[Dict]:
+        with self.lock:
+            return dict(self.indices) or None
+
+    def to_frame(self) -> pd.DataFrame:
+        with self.lock:
+            return self.state.to_frame()
+
+
+def stream_from_env() -> Optional[QuoteStream]:
+    """QUOTE_STREAM=host:port 时连接推送源并启动接入线程"""
+    address = os.environ.get(STREAM_ENV)
+    if not address:
+        return None
+    host, _, port = address.rpartition(':')
+    return QuoteStream(SocketFeed(host or DEFAULT_HOST, int(port))).start()
+
+
+# ===================== 录制 =====================
+
+def snapshot_ticks(previous: Optional[pd.DataFrame], current: pd.DataFrame, ts: float) -> Iterator[Dict]:
+    """相邻两次快照之间变化（或新出现）的股票生成 tick"""
+    current = current.set_index('代码')
+    if previous is not None:
+        previous = previous.set_index('代码').reindex(current.index)
+        changed = ((previous['涨跌幅'].to_numpy() != current['涨跌幅'].to_numpy())
+                   | (previous['成交额'].to_numpy() != current['成交额'].to_numpy()))
+        current = current[changed]
+    for code, name, price, change, amount in zip(current.index, current['名称'], current['最新价'],
+                                                 current['涨跌幅'], current['成交额']):
+        yield {'ts': ts, 'kind': 'stock', 'code': code, 'name': name, 'price': float(price),
+               'change': float(change), 'amount': float(amount)}
+
+
+def index_ticks(indices: Dict, ts: float) -> Iterator[Dict]:
+    for key, quote in (indices or {}).items():
+        yield {'ts': ts, 'kind': 'index', 'key': key, 'change': float(quote['change_pct']),
+               'volume': float(quote.get('volume', 0))}
+
+
+def record(samples: Iterable, path: str) -> int:
+    """samples 为 (时间戳, 全市场快照, 指数行情) 序列，写入 tick 文件，返回 tick 数"""
+    count = 0
+    previous = None
+    with open(path, 'w', encoding='utf-8') as f:
+        for ts, spot, indices in samples:
+            for tick in index_ticks(indices, ts):
+                f.write(json.dumps(tick, ensure_ascii=False) + '\n')
+                count += 1
+            for tick in snapshot_ticks(previous, spot, ts):
+                f.write(json.dumps(tick, ensure_ascii=False) + '\n')
+                count += 1
+            previous = spot
+    return count
+
+
+def synthetic_samples(n_stocks: int, minutes: int, seed: int = 0) -> Iterator:
+    """合成分钟快照（synthetic_data.generate_spot_series），指数按全市场中位涨跌幅"""
+    from data_provider import INDEX_CODES
+    from synthetic_data import generate_spot_series
+    start = time.time()
+    for minute, spot in enumerate(generate_spot_series(n_stocks, minutes, seed)):
+        move = float(np.median(spot['涨跌幅']))
+        indices = {key: {'change_pct': round(move, 2), 'volume': 0.0} for key in INDEX_CODES.values()}
+        yield start + minute * 60, spot, indices
+
+
+def live_samples(samples: int, interval: float) -> Iterator:
+    """轮询真实行情（MultiSourceProvider）"""
+    from data_provider import MultiSourceProvider
+    provider = MultiSourceProvider()
+    for i in range(samples):
+        started = time.time()
+        spot = provider.get_spot()
+        if spot is not None:
+            yield started, spot, provider.get_index_quotes()
+        if i < samples - 1:
+            time.sleep(max(0.0, interval - (time.time() - started)))
+
+
+# ===================== 回放服务 =====================
+
+class ReplayServer(socketserver.ThreadingTCPServer):
+    """
+    本地回放服务：每个连接从头推送录制文件中的 tick，
+    按录制时间间隔 / speed 等待（speed=0 时不等待，尽快推送），等待超过 HEARTBEAT_INTERVAL 时发送心跳
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, path: str, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 speed: float = 1.0, loop: bool = False):
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        super().__init__((host, port), _ReplayHandler)
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self) -> 'ReplayServer':
+        threading.Thread(target=self.serve_forever, name='replay-server', daemon=True).start()
+        return self
+
+
+class _ReplayHandler(socketserver.StreamRequestHandler):
+
+    def _wait(self, delay: float):
+        self.wfile.flush()
+        while delay > HEARTBEAT_INTERVAL:
+            time.sleep(HEARTBEAT_INTERVAL)
+            delay -= HEARTBEAT_INTERVAL
+            self.wfile.write(HEARTBEAT)
+            self.wfile.flush()
+        time.sleep(delay)
+
+    def handle(self):
+        server = self.server
+        try:
+            while True:
+                started, first_ts = time.monotonic(), None
+                with open(server.path, 'rb') as f:
+                    for line in f:
+                        if server.speed > 0:
+                            ts = json.loads(line)['ts']
+                            first_ts = ts if first_ts is None else first_ts
+                            delay = (ts - first_ts) / server.speed - (time.monotonic() - started)
+                            if delay > 0:
+                                self._wait(delay)
+                        self.wfile.write(line)
+                self.wfile.flush()
+                if not server.loop:
+                    return
+        except (BrokenPipeError, ConnectionResetError):
+            return
+
+
+# ===================== 命令行 =====================
+
+def print_breadth(stream: QuoteStream):
+    breadth = stream.breadth()
+    if not breadth:
+        print("（尚未收到行情）")
+        return
+    print(f"[{time.strftime('%H:%M:%S')}] tick {stream.ticks} | {breadth['total']} 只 | "
+          f"上涨 {breadth['up_count']} 下跌 {breadth['down_count']} | 涨跌比 {breadth['breadth_ratio']:.2%} | "
+          f"涨停 {breadth['limit_up']} 跌停 {breadth['limit_down']} | 成交 {breadth['total_volume']:.0f} 亿")
+
+
+def bench(path: str) -> Dict:
+    """本地回放（不限速）全部 tick：接入吞吐，以及最终宽度与全量重新计算是否一致"""
+    server = ReplayServer(path, port=0, speed=0).start()
+    try:
+        stream = QuoteStream(SocketFeed(DEFAULT_HOST, server.port, reconnect=False))
+        start = time.perf_counter()
+        stream.consume()
+        elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    # 全量重新计算（与 get_market_breadth 相同的分档）核对增量维护的结果
+    frame = stream.to_frame()
+    change = frame['涨跌幅'].to_numpy()
+    up, down = int((change > 0).sum()), int((change < 0).sum())
+    expected = {
+        'total': len(frame), 'up_count': up, 'down_count': down, 'flat_count': len(frame) - up - down,
+        'limit_up': int((change >= LIMIT_PCT).sum()), 'limit_down': int((change <= -LIMIT_PCT).sum()),
+        'drop_5_pct': int((change <= DROP_5_PCT).sum()), 'drop_8_pct': int((change <= DROP_8_PCT).sum()),
+        'total_volume': frame['成交额'].sum() / 100000000,
+    }
+    actual = stream.breadth()
+    mismatched = [k for k in expected if not np.isclose(expected[k], actual[k])]
+    return {'ticks': stream.ticks, 'seconds': elapsed, 'ticks_per_second': stream.ticks / elapsed,
+            'stocks': len(frame), 'mismatched': mismatched}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="推送式行情接入")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    rec = sub.add_parser('record', help='录制 tick 文件')
+    source = rec.add_mutually_exclusive_group(required=True)
+    source.add_argument('--synthetic', action='store_true', help='合成分钟行情')
+    source.add_argument('--live', action='store_true', help='轮询真实行情')
+    rec.add_argument('--stocks', type=int, default=5000)
+    rec.add_argument('--minutes', type=int, default=240)
+    rec.add_argument('--samples', type=int, default=30)
+    rec.add_argument('--interval', type=float, default=60)
+    rec.add_argument('--output', default='ticks.jsonl')
+
+    serve = sub.add_parser('serve', help='本地回放服务')
+    serve.add_argument('path')
+    serve.add_argument('--host', default=DEFAULT_HOST)
+    serve.add_argument('--port', type=int, default=DEFAULT_PORT)
+    serve.add_argument('--speed', type=float, default=1.0, help='回放倍速，0 为不限速')
+    serve.add_argument('--loop', action='store_true', help='推送完后从头循环')
+
+    consume = sub.add_parser('consume', help='连接推送源并定期打印市场宽度')
+    consume.add_argument('--host', default=DEFAULT_HOST)
+    consume.add_argument('--port', type=int, default=DEFAULT_PORT)
+    consume.add_argument('--report-every', type=float, default=10, help='打印间隔（秒）')
+
+    bench_parser = sub.add_parser('bench', help='回放吞吐基准')
+    bench_parser.add_argument('path')
+
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        samples = (synthetic_samples(args.stocks, args.minutes) if args.synthetic
+                   else live_samples(args.samples, args.interval))
+        count = record(samples, args.output)
+        print(f"✅ 已录制 {count} 条 tick 到 {args.output}")
+    elif args.command == 'serve':
+        server = ReplayServer(args.path, args.host, args.port, args.speed, args.loop)
+        print(f"📡 回放 {args.path} @ {args.host}:{server.port}（{args.speed or '不限'} 倍速）")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
+    elif args.command == 'consume':
+        stream = QuoteStream(SocketFeed(args.host, args.port)).start()
+        try:
+            while True:
+                time.sleep(args.report_every)
+                print_breadth(stream)
+        except KeyboardInterrupt:
+            stream.stop()
+    else:
+        result = bench(args.path)
+        print(f"⏱️ {result['ticks']} 条 tick，{result['stocks']} 只股票，耗时 {result['seconds']:.2f}s，"
+              f"{result['ticks_per_second']:.0f} tick/s")
+        print("✅ 与全量计算一致" if not result['mismatched'] else f"❌ 不一致: {result['mismatched']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共享响应缓存
+- 按 接口 + 参数 生成缓存键，不同数据类型使用不同 TTL
+- 文件存储（写临时文件后原子 rename），多个进程/入口脚本共享同一份快照
+- 同一缓存键加文件锁，并发调用只有一个进程真正请求上游；等锁不超过运行截止时间与 LOCK_WAIT_MAX，
+  等不到时返回过期条目，没有条目则不加锁直接请求（持锁进程挂起不会拖住其他进程）
+- HTTP 响应缓存过期后携带 ETag / Last-Modified 发起条件请求，304 时直接续期
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from deadline import get_deadline
+
+try:
+    import fcntl
+except ImportError:  # Windows 下不加锁，仅依赖原子 rename
+    fcntl = None
+
+
+# 缓存目录
+HTTP_CACHE_DIR = os.path.join("cache", "http")
+
+# 各数据类型 TTL（秒）
+CACHE_TTLS = {
+    'spot': 30,           # 全市场快照
+    'index': 30,          # 指数行情
+    'north': 60,          # 北向资金
+    'fund_nav': 6 * 3600, # 基金净值
+}
+DEFAULT_TTL = 30
+
+# 等待其他进程持有的缓存键锁的最长时间与轮询间隔（秒）
+LOCK_WAIT_MAX = 10.0
+LOCK_POLL_INTERVAL = 0.05
+
+# 不参与缓存键计算的参数（JSONP 回调、时间戳等每次都变化的参数）
+VOLATILE_PARAMS = ('cb', '_')
+
+# 设置该环境变量可关闭缓存
+DISABLE_ENV = "RESPONSE_CACHE_DISABLE"
+
+# 录制/回放夹具模式下关闭缓存，保证每次调用都经过夹具层（见 fixtures.py）
+FIXTURE_MODE_ENV = "FIXTURE_MODE"
+
+
+def make_cache_key(endpoint: str, params: Dict = None, ignore: Iterable[str] = VOLATILE_PARAMS) -> str:
+    """生成缓存键：接口 + 排序后的参数"""
+    stable = {k: v for k, v in (params or {}).items() if k not in ignore}
+    raw = endpoint + '?' + json.dumps(stable, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def entry_from_response(response: requests.Response) -> Dict:
+    """把 requests.Response 转为可序列化的字典"""
+    return {
+        'status_code': response.status_code,
+        'headers': dict(response.headers),
+        'content': response.content,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+    }
+
+
+def response_from_entry(entry: Dict, url: str) -> requests.Response:
+    """把缓存条目还原为 requests.Response"""
+    response = requests.Response()
+    response.status_code = entry['status_code']
+    response.headers = CaseInsensitiveDict(entry['headers'])
+    response._content = entry['content']
+    response.url = url
+    response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+    return response
+
+
+class ResponseCache:
+    """文件存储的 TTL 响应缓存"""
+
+    def __init__(self, cache_dir: str = HTTP_CACHE_DIR, ttls: Dict[str, float] = None):
+        self.cache_dir = cache_dir
+        self.ttls = dict(CACHE_TTLS, **(ttls or {}))
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.stale = 0          # 等不到锁时返回的过期条目
+        self.lock_timeouts = 0
+
+    @property
+    def enabled(self) -> bool:
+        return not os.environ.get(DISABLE_ENV) and os.environ.get(FIXTURE_MODE_ENV, 'off') == 'off'
+
+    def ttl_for(self, kind: str) -> float:
+        return self.ttls.get(kind, DEFAULT_TTL)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def load(self, key: str):
+        """读取缓存条目，不存在或损坏返回 None"""
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            return None
+
+    def store(self, key: str, entry: Dict):
+        """原子写入缓存条目"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._path(key))
+        except Exception as e:
+            print(f"⚠️ 写入响应缓存失败: {e}")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def is_fresh(self, entry: Dict, kind: str) -> bool:
+        return entry is not None and time.time() - entry['stored_at'] < self.ttl_for(kind)
+
+    @contextmanager
+    def lock(self, key: str):
+        """
+        同一缓存键的跨进程互斥锁，yield 是否拿到锁
+        非阻塞轮询，最多等待 min(运行剩余时间, LOCK_WAIT_MAX) 秒
+        """
+        if fcntl is None:
+            yield True
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with open(os.path.join(self.cache_dir, f"{key}.lock"), 'w') as f:
+            give_up = time.monotonic() + min(get_deadline().remaining(), LOCK_WAIT_MAX)
+            while True:
+                try:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= give_up:
+                        self.lock_timeouts += 1
+                        yield False
+                        return
+                    time.sleep(LOCK_POLL_INTERVAL)
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def cached_call(self, kind: str, name: str, fetch: Callable, params: Dict = None):
+        """
+        缓存任意函数调用结果（如 akshare DataFrame）
+
+        Args:
+            kind: 数据类型，决定 TTL
+            name: 调用名，参与缓存键
+            fetch: 无参函数，缓存未命中时调用
+            params: 参与缓存键的参数
+        """
+        if not self.enabled:
+            return fetch()
+
+        key = make_cache_key(name, params)
+        entry = self.load(key)
+        if self.is_fresh(entry, kind):
+            self.hits += 1
+            return entry['value']
+
+        with self.lock(key) as locked:
+            # 等锁期间其他进程可能已经刷新
+            entry = self.load(key)
+            if self.is_fresh(entry, kind):
+                self.hits += 1
+                return entry['value']
+            if not locked and entry is not None:
+                # 等不到锁：持锁进程仍在请求，先用过期条目
+                self.stale += 1
+                return entry['value']
+            self.misses += 1
+            value = fetch()
+            if value is not None:
+                self.store(key, {'stored_at': time.time(), 'value': value})
+            return value
+
+    def fetch_http(self, http, url: str, kind: str, params: Dict = None,
+                   headers: Dict = None) -> requests.Response:
+        """
+        带缓存的 HTTP GET
+
+        Args:
+            http: 提供 get(url, params=..., headers=...) 的客户端（requests.Session / ResilientHTTP）
+        """
+        if not self.enabled:
+            return http.get(url, params=params, headers=headers)
+
+        key = make_cache_key(url, params)
+        entry = self.load(key)
+        if self.is_fresh(entry, kind):
+            self.hits += 1
+            return response_from_entry(entry, url)
+
+        with self.lock(key) as locked:
+            entry = self.load(key)
+            if self.is_fresh(entry, kind):
+                self.hits += 1
+                return response_from_entry(entry, url)
+            if not locked and entry is not None:
+                self.stale += 1
+                return response_from_entry(entry, url)
+
+            request_headers = dict(headers or {})
+            if entry is not None:
+                if entry.get('etag'):
+                    request_headers['If-None-Match'] = entry['etag']
+                if entry.get('last_modified'):
+                    request_headers['If-Modified-Since'] = entry['last_modified']
+
+            response = http.get(url, params=params, headers=request_headers or None)
+
+            if response.status_code == 304 and entry is not None:
+                # 上游确认未变化，只续期
+                self.revalidated += 1
+                entry['stored_at'] = time.time()
+                self.store(key, entry)
+                return response_from_entry(entry, url)
+
+            self.misses += 1
+            entry = entry_from_response(response)
+            entry['stored_at'] = time.time()
+            self.store(key, entry)
+            return response
+
+    def hit_rate(self) -> float:
+        served = self.hits + self.revalidated + self.stale
+        total = served + self.misses
+        return served / total if total else 0.0
+
+    def prune(self, max_age: float = 86400):
+        """删除超过 max_age 秒的缓存文件"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        cutoff = time.time() - max_age
+        for fname in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, fname)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                continue
+
+
+# 进程内共享实例
+_default_cache = None
+
+
+def get_response_cache() -> ResponseCache:
+    """获取默认缓存实例（首次调用时清理过期文件）"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResponseCache()
+        _default_cache.prune()
+    return _default_cache
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+单只基金分析结果的内容寻址缓存
+缓存键 = hash(最新净值日期与数值、配置项、定投期数、峰值、代码版本)，
+输入未变化（如 QDII 境外节假日没有新净值）时直接复用上次结果，跳过定投模拟、风险指标与决策。
+
+环境变量 FUND_MONITOR_MEMO=0 关闭复用。
+"""
+
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Optional
+
+
+MEMO_DIR = os.path.join("cache", "results")
+MEMO_ENV = "FUND_MONITOR_MEMO"
+
+# 超过该时间未使用的缓存条目会被清理（秒）
+MEMO_MAX_AGE = 30 * 86400
+
+
+def source_version(*paths: str) -> str:
+    """代码版本：参与计算的源文件内容哈希"""
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+class ResultMemo:
+    """按内容哈希存取单只基金结果"""
+
+    def __init__(self, code_version: str, memo_dir: str = MEMO_DIR):
+        self.code_version = code_version
+        self.memo_dir = memo_dir
+        self.enabled = os.environ.get(MEMO_ENV, '1') != '0'
+        self.reused = []
+        self.recomputed = []
+
+    def reset_stats(self):
+        self.reused = []
+        self.recomputed = []
+
+    def make_key(self, code: str, inputs: Dict) -> str:
+        payload = json.dumps({'code': code, 'version': self.code_version, **inputs},
+                             sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.memo_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict]:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+            os.utime(path)  # 记录最近使用时间，供清理判断
+            return result
+        except Exception:
+            return None
+
+    def put(self, key: str, result: Dict):
+        if not self.enabled:
+            return
+        try:
+            os.makedirs(self.memo_dir, exist_ok=True)
+            tmp = self._path(key) + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, default=float)
+            os.replace(tmp, self._path(key))
+        except Exception as e:
+            print(f"⚠️ 保存结果缓存失败: {e}")
+
+    def record(self, code: str, reused: bool):
+        (self.reused if reused else self.recomputed).append(code)
+
+    def summary(self) -> Dict:
+        return {
+            'enabled': self.enabled,
+            'reused': len(self.reused),
+            'recomputed': len(self.recomputed),
+            'reused_codes': list(self.reused),
+        }
+
+    def prune(self, max_age: float = MEMO_MAX_AGE):
+        """删除长期未使用的缓存条目"""
+        if not os.path.isdir(self.memo_dir):
+            return
+        cutoff = time.time() - max_age
+        for fname in os.listdir(self.memo_dir):
+            path = os.path.join(self.memo_dir, fname)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                continue
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+全市场基金筛选
+对净值历史库（nav_history.py）中的全部开放式基金，用与 generate_report() 相同的指标与规则表
+（MA20、回撤、60 日波动率 / 夏普、advice_rules）给出信号，按条件过滤并排序。
+
+- 全部基金的窗口内净值一次读出为扁平数组（按基金、日期排序 + 每只基金的偏移），
+  各指标用前缀和 / reduceat / searchsorted 批量计算，不逐只循环
+- 收益率按窗口内模拟定投（每 cycle 天一次，等额）的平均成本计算；回撤相对窗口内最高净值
+- 首次运行时缺少历史的基金并行回填（--workers），之后每天只需一次全市场快照
+
+用法：
+    python screener.py --filter "sharpe > 1.5 and drawdown < 0.05" --sort sharpe --top 30
+    python screener.py --filter "advice == '🛡️ 均线下方' and volatility < 0.2" --output screen.csv
+    python screener.py --no-sync --limit 500      # 只用已有历史，取前 500 只
+"""
+
+import argparse
+import time
+from datetime import date
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+from prettytable import PrettyTable
+
+from advice_rules import RuleEngine
+from nav_history import MAX_STALE_DAYS, NavHistoryStore
+from nav_store import from_day_offsets, to_day_offsets
+
+
+# 指标参数（与 fund_monitor 一致）
+MA_WINDOW = 20
+RISK_DAYS = 60
+MIN_RISK_SAMPLES = 10
+RISK_FREE_RATE = 0.025
+
+# 筛选默认参数
+DEFAULT_LOOKBACK_DAYS = 365   # 窗口（自然日）：定投模拟与回撤峰值的区间
+DEFAULT_CYCLE = 7             # 模拟定投周期（天）
+DEFAULT_TARGET = 0.15
+DEFAULT_CALLBACK = 0.06
+DEFAULT_WORKERS = 16
+
+# 窗口较短时也至少读取该天数的净值，保证 MA20 与 60 日风险指标有足够样本
+MIN_HISTORY_DAYS = 120
+
+DISPLAY_COLUMNS = ['code', 'name', 'nav', 'ma20', 'profit_rate', 'drawdown', 'volatility', 'sharpe',
+                   'advice', 'alert_level', 'last_date']
+
+
+def _segment_tail_sum(values: np.ndarray, offsets: np.ndarray, window_start: np.ndarray) -> np.ndarray:
+    """各基金 [window_start, 结束) 区间的和（values 中 NaN 视为 0）"""
+    csum = np.concatenate([[0.0], np.cumsum(np.nan_to_num(values))])
+    return csum[offsets[1:]] - csum[window_start]
+
+
+def compute_signals(offsets: np.ndarray, days: np.ndarray, navs: np.ndarray, today_day: int,
+                    lookback_start: int, cycle: int) -> Dict[str, np.ndarray]:
+    """
+    批量计算全部基金的指标（输入为 NavHistoryStore.load_window 的扁平数组）
+
+    Returns:
+        {'nav', 'ma20', 'peak', 'drawdown', 'volatility', 'sharpe', 'annual_return', 'profit_rate', 'last_day'}
+    """
+    starts, ends = offsets[:-1], offsets[1:]
+    lengths = ends - starts
+    n = len(starts)
+    seg = np.repeat(np.arange(n), lengths)
+    last = ends - 1
+
+    nav = navs[last]
+    last_day = days[last]
+
+    # MA20：不足 20 个净值时为 NaN（与 rolling(20).mean() 一致）
+    ma_start = np.maximum(ends - MA_WINDOW, starts)
+    ma20 = _segment_tail_sum(navs, offsets, ma_start) / MA_WINDOW
+    ma20[lengths < MA_WINDOW] = np.nan
+
+    # 窗口内最高净值与回撤
+    peak = np.maximum.reduceat(np.where(days >= lookback_start, navs, -np.inf), starts) if n else np.array([])
+    peak = np.maximum(peak, nav)
+    drawdown = np.where(peak > 0, (peak - nav) / peak, 0.0)
+
+    # 最近 60 个日收益率：年化收益、波动率（样本标准差）、夏普
+    returns = np.full(len(navs), np.nan)
+    returns[1:] = navs[1:] / navs[:-1] - 1
+    returns[starts] = np.nan
+    risk_start = np.maximum(ends - RISK_DAYS, starts + 1)
+    count = np.maximum(ends - risk_start, 0)
+    in_window = np.arange(len(navs)) >= risk_start[seg]
+    mean = _segment_tail_sum(returns, offsets, np.minimum(risk_start, ends)) / np.maximum(count, 1)
+    squared = np.where(in_window, (returns - mean[seg]) ** 2, 0.0)
+    std = np.sqrt(_segment_tail_sum(squared, offsets, np.minimum(risk_start, ends)) / np.maximum(count - 1, 1))
+    enough = count >= MIN_RISK_SAMPLES
+    annual_return = np.where(enough, mean * 252, 0.0)
+    volatility = np.where(enough, std * np.sqrt(252), 0.0)
+    sharpe = np.divide(annual_return - RISK_FREE_RATE, volatility,
+                       out=np.zeros(n), where=enough & (volatility > 0))
+
+    # 模拟定投：每个定投日取该日及之前最近的净值（按 (基金, 日期) 组合键二分查找）
+    invest_days = np.arange(lookback_start + cycle, today_day + 1, cycle, dtype=np.int64)
+    keys = (seg.astype(np.int64) << 32) | days.astype(np.int64)
+    queries = (np.arange(n, dtype=np.int64)[:, None] << 32) | invest_days[None, :]
+    idx = np.searchsorted(keys, queries, side='right') - 1
+    valid = idx >= starts[:, None]
+    inv_nav = np.where(valid, 1.0 / navs[np.maximum(idx, 0)], 0.0)
+    installments = valid.sum(axis=1)
+    avg_cost = np.divide(installments, inv_nav.sum(axis=1), out=np.full(n, np.nan), where=installments > 0)
+    profit_rate = nav / avg_cost - 1
+
+    return {
+        'nav': nav, 'ma20': ma20, 'peak': peak, 'drawdown': drawdown, 'volatility': volatility,
+        'sharpe': sharpe, 'annual_return': annual_return, 'profit_rate': profit_rate, 'last_day': last_day,
+    }
+
+
+def screen(store: NavHistoryStore, rules: RuleEngine, today: date = None, filter_expr: str = None,
+           sort: str = 'sharpe', ascending: bool = False, top: int = None,
+           lookback: int = DEFAULT_LOOKBACK_DAYS, cycle: int = DEFAULT_CYCLE,
+           target: float = DEFAULT_TARGET, callback: float = DEFAULT_CALLBACK, limit: int = None) -> pd.DataFrame:
+    """对净值历史库中的全部基金计算信号，过滤并排序"""
+    today = today or date.today()
+    today_day = int(to_day_offsets([today])[0])
+    lookback_start = today_day - lookback
+    codes, offsets, days, navs = store.load_window(min(lookback_start, today_day - MIN_HISTORY_DAYS))
+    if limit is not None:
+        offsets = offsets[:limit + 1]
+        codes = codes[:limit]
+        days, navs = days[:offsets[-1]], navs[:offsets[-1]]
+    if len(codes) == 0:
+        return pd.DataFrame(columns=DISPLAY_COLUMNS)
+
+    signals = compute_signals(offsets, days, navs, today_day, lookback_start, cycle)
+    names = store.universe()
+    df = pd.DataFrame({'code': codes, 'name': [names.get(c, '') for c in codes], **signals})
+    # 长期未更新（清盘、暂停估值）或窗口内无定投的基金不参与筛选
+    df = df[(today_day - df['last_day'] <= MAX_STALE_DAYS) & df['profit_rate'].notna()]
+
+    decisions = rules.evaluate(df.assign(
+        is_broken_ma=df['nav'] < df['ma20'],
+        base_target=target,
+        base_callback=callback,
+    ))
+    df = df.assign(advice=decisions['advice'], alert_level=decisions['alert_level'],
+                   last_date=from_day_offsets(df['last_day'].to_numpy(dtype=np.int32)).astype(str))
+
+    if filter_expr:
+        df = df.query(filter_expr)
+    df = df.sort_values(sort, ascending=ascending, kind='stable')
+    if top:
+        df = df.head(top)
+    return df.reset_index(drop=True)
+
+
+def sync_universe(store: NavHistoryStore, workers: int = DEFAULT_WORKERS) -> Dict:
+    """当天首次运行时请求全市场快照，缺少历史的基金并行回填"""
+    import fund_monitor
+    fund_monitor.sync_nav_history([], store=store)
+    return fund_monitor.sync_nav_history(list(store.universe()), store=store, workers=workers)
+
+
+def print_results(df: pd.DataFrame):
+    table = PrettyTable()
+    table.field_names = ["代码", "名称", "净值", "MA20", "定投收益", "回撤", "波动率", "夏普", "操作建议", "净值日期"]
+    table.align["名称"] = "l"
+    table.align["操作建议"] = "l"
+    for r in df.itertuples():
+        table.add_row([r.code, r.name, f"{r.nav:.4f}", f"{r.ma20:.4f}" if r.ma20 == r.ma20 else '-',
+                       f"{r.profit_rate:+.2%}", f"{r.drawdown:.2%}", f"{r.volatility:.2%}", f"{r.sharpe:.2f}",
+                       r.advice, r.last_date])
+    print(table)
+
+
+def main():
+    import fund_monitor
+
+    parser = argparse.ArgumentParser(description="全市场基金信号筛选")
+    parser.add_argument('--filter', help="过滤表达式（DataFrame.query 语法），如 \"sharpe > 1.5 and drawdown < 0.05\"")
+    parser.add_argument('--sort', default='sharpe', help='排序字段')
+    parser.add_argument('--ascending', action='store_true', help='升序排列（默认降序）')
+    parser.add_argument('--top', type=int, default=50, help='显示前 N 只，0 为全部')
+    parser.add_argument('--lookback', type=int, default=DEFAULT_LOOKBACK_DAYS, help='定投模拟与回撤窗口（自然日）')
+    parser.add_argument('--cycle', type=int, default=DEFAULT_CYCLE, help='模拟定投周期（天）')
+    parser.add_argument('--target', type=float, default=DEFAULT_TARGET, help='止盈目标（按波动率动态调整）')
+    parser.add_argument('--callback', type=float, default=DEFAULT_CALLBACK, help='回撤容忍（按波动率动态调整）')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='回填历史的并行数')
+    parser.add_argument('--limit', type=int, help='只筛选前 N 只基金（调试用）')
+    parser.add_argument('--no-sync', action='store_true', help='不请求数据，只用净值历史库中已有的数据')
+    parser.add_argument('--db', default=fund_monitor.NAV_HISTORY_DB)
+    parser.add_argument('--output', help='结果写入 CSV / JSON（按扩展名）')
+    args = parser.parse_args()
+
+    with NavHistoryStore(args.db) as store:
+        start = time.perf_counter()
+        if not args.no_sync:
+            stats = sync_universe(store, args.workers)
+            print(f"📥 同步 {time.perf_counter() - start:.1f}s：快照更新 {stats['snapshot']} 只，"
+                  f"回填历史 {len(stats['history'])} 只，失败 {len(stats['failed'])} 只")
+
+        scan_start = time.perf_counter()
+        df = screen(store, fund_monitor.ADVICE_RULES, today=fund_monitor.get_now_beijing().date(),
+                    filter_expr=args.filter, sort=args.sort, ascending=args.ascending, top=args.top or None,
+                    lookback=args.lookback, cycle=args.cycle, target=args.target, callback=args.callback,
+                    limit=args.limit)
+        print(f"🔍 筛选耗时 {time.perf_counter() - scan_start:.1f}s，符合条件 {len(df)} 只")
+
+    print_results(df)
+    if args.output:
+        columns = DISPLAY_COLUMNS + ['annual_return', 'peak']
+        if args.output.endswith('.json'):
+            df[columns].to_json(args.output, orient='records', force_ascii=False, indent=2)
+        else:
+            df[columns].to_csv(args.output, index=False, encoding='utf-8-sig')
+        print(f"✅ 结果已保存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+个股 → 行业 / 板块映射与分组市场宽度
+- 行业映射来自东方财富行业板块成分股（ak.stock_board_industry_name_em + stock_board_industry_cons_em），
+  缓存在 cache/sector_map.pkl，每周刷新一次，进程内常驻；过期时先用旧映射、后台刷新，
+  没有缓存时同样在后台请求，完成前只给出板块维度（不阻塞情绪报告）
+- 板块（主板 / 创业板 / 科创板 / 北交所）按代码前缀判断，不需要请求
+- 分组宽度：对全市场快照按行业、板块各做一次 groupby，给出涨跌家数、涨跌比、涨跌停、成交额与涨跌幅中位数
+
+用法：
+    python sector_map.py refresh      # 立即刷新行业映射
+    python sector_map.py show
+"""
+
+import argparse
+import os
+import pickle
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import akshare as ak
+except ImportError:  # akshare 未安装时只能使用已缓存的映射
+    ak = None
+
+from fixtures import get_fixture_store
+
+
+SECTOR_MAP_FILE = os.path.join("cache", "sector_map.pkl")
+SECTOR_MAP_TTL = 7 * 86400
+# 请求失败后的重试间隔（秒），期间只输出板块维度
+SECTOR_MAP_RETRY = 3600
+
+UNKNOWN_INDUSTRY = "其他"
+
+# 板块：(名称, 代码前缀, 涨跌幅限制%)，按顺序匹配
+BOARDS = (
+    ('创业板', ('30',), 20.0),
+    ('科创板', ('68',), 20.0),
+    ('北交所', ('8', '4', '92'), 30.0),
+    ('主板', ('60', '00'), 10.0),
+)
+OTHER_BOARD = '其他'
+ST_LIMIT = 5.0
+
+# 行业成分股并行请求数
+FETCH_WORKERS = 4
+
+
+def board_of(codes) -> np.ndarray:
+    """按代码前缀判断所属板块"""
+    codes = pd.Series(codes, dtype=str)
+    conditions = [codes.str.startswith(prefixes).to_numpy() for _, prefixes, _ in BOARDS]
+    return np.select(conditions, [name for name, _, _ in BOARDS], default=OTHER_BOARD).astype(object)
+
+
+def limit_pct_of(codes, names=None) -> np.ndarray:
+    """各股涨跌幅限制（%）：按板块，主板 ST 股为 5%"""
+    boards = board_of(codes)
+    limits = np.full(len(boards), 10.0)
+    for name, _, limit in BOARDS:
+        limits[boards == name] = limit
+    if names is not None:
+        is_st = pd.Series(names, dtype=str).str.contains('ST', regex=False).to_numpy()
+        limits[is_st & (boards == '主板')] = ST_LIMIT
+    return limits
+
+
+class SectorMap:
+    """个股 → 行业映射（代码排序数组 + 行业下标，二分查找）"""
+
+    __slots__ = ('codes', 'industry_ids', 'industries', 'built_at')
+
+    def __init__(self, mapping: Dict[str, str], built_at: float = None):
+        codes = np.array(sorted(mapping), dtype=object)
+        labels = pd.Categorical([mapping[c] for c in codes])
+        self.codes = codes.astype(str)
+        self.industry_ids = labels.codes.astype(np.int16)
+        self.industries = np.array(list(labels.categories) + [UNKNOWN_INDUSTRY], dtype=object)
+        self.built_at = built_at or time.time()
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.built_at
+
+    def industry_of(self, codes) -> np.ndarray:
+        """批量查询行业，未收录的股票归入"其他\""""
+        codes = np.asarray(codes, dtype=str)
+        if len(self.codes) == 0:
+            return np.full(len(codes), UNKNOWN_INDUSTRY, dtype=object)
+        pos = np.searchsorted(self.codes, codes)
+        pos = np.minimum(pos, len(self.codes) - 1)
+        found = self.codes[pos] == codes
+        ids = np.where(found, self.industry_ids[pos], len(self.industries) - 1)
+        return self.industries[ids]
+
+
+def fetch_sector_map() -> SectorMap:
+    """请求东方财富行业板块及其成分股（经过录制/回放夹具层）"""
+    fixtures = get_fixture_store()
+    boards = fixtures.call('akshare', 'ak.stock_board_industry_name_em',
+                           lambda: ak.stock_board_industry_name_em())
+    names = boards['板块名称'].astype(str).tolist()
+
+    def members(name):
+        df = fixtures.call('akshare', 'ak.stock_board_industry_cons_em',
+                           lambda: ak.stock_board_industry_cons_em(symbol=name), params={'symbol': name})
+        return name, df['代码'].astype(str).tolist()
+
+    mapping = {}
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix='sector-map') as pool:
+        for name, codes in pool.map(members, names):
+            for code in codes:
+                mapping.setdefault(code, name)
+    if not mapping:
+        raise ValueError("行业成分股为空")
+    return SectorMap(mapping)
+
+
+def load_sector_map(path: str = SECTOR_MAP_FILE) -> Optional[SectorMap]:
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except Exception as e:
+        print(f"⚠️ 读取行业映射失败: {e}")
+        return None
+
+
+def save_sector_map(sector_map: SectorMap, path: str = SECTOR_MAP_FILE):
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(sector_map, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except Exception as e:
+        print(f"⚠️ 保存行业映射失败: {e}")
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+_sector_map = None
+_sector_map_lock = threading.Lock()
+_refreshing = False
+_last_failure = 0.0
+
+
+def refresh_sector_map() -> Optional[SectorMap]:
+    """重新请求行业映射并写入缓存，失败返回 None"""
+    global _sector_map, _last_failure
+    try:
+        sector_map = fetch_sector_map()
+    except Exception as e:
+        print(f"⚠️ 刷新行业映射失败: {e}")
+        _last_failure = time.time()
+        return None
+    save_sector_map(sector_map)
+    _sector_map = sector_map
+    return sector_map
+
+
+def _refresh_in_background():
+    global _refreshing
+    try:
+        refresh_sector_map()
+    finally:
+        _refreshing = False
+
+
+def _start_refresh():
+    """启动后台刷新；已在刷新或上次失败不到 SECTOR_MAP_RETRY 秒时不启动"""
+    global _refreshing
+    if not _refreshing and time.time() - _last_failure >= SECTOR_MAP_RETRY:
+        _refreshing = True
+        threading.Thread(target=_refresh_in_background, name='sector-map-refresh', daemon=True).start()
+
+
+def get_sector_map() -> Optional[SectorMap]:
+    """
+    进程内常驻的行业映射：首次从缓存文件加载；没有缓存时在后台请求并返回 None，
+    超过一周时继续使用旧映射并在后台刷新（刷新失败后一小时内不再重试）；均不阻塞调用方
+    """
+    global _sector_map
+    with _sector_map_lock:
+        if _sector_map is None:
+            _sector_map = load_sector_map()
+            if _sector_map is None:
+                _start_refresh()
+                return None
+        if _sector_map.age > SECTOR_MAP_TTL:
+            _start_refresh()
+        return _sector_map
+
+
+def sector_breadth(spot: pd.DataFrame, sector_map: SectorMap = None) -> Dict[str, pd.DataFrame]:
+    """
+    按行业、板块分组的市场宽度（每个维度一次 groupby）
+
+    Returns:
+        {'board': DataFrame, 'industry': DataFrame}（无行业映射时没有 industry），
+        列：total, up_count, down_count, flat_count, breadth_ratio, limit_up, limit_down, turnover, median_change
+    """
+    codes = spot['代码'].to_numpy(dtype=str)
+    change = spot['涨跌幅'].to_numpy(dtype=float)
+    # 涨跌停按各板块（及 ST）的涨跌幅限制判断，留 0.1% 的取整余量
+    limit = limit_pct_of(codes, spot['名称'].to_numpy() if '名称' in spot.columns else None) - 0.1
+    frame = pd.DataFrame({
+        'board': board_of(codes),
+        'up_count': change > 0,
+        'down_count': change < 0,
+        'limit_up': change >= limit,
+        'limit_down': change <= -limit,
+        'turnover': spot['成交额'].to_numpy(dtype=float) / 100000000,
+        'change': change,
+    })
+    dimensions = ['board']
+    if sector_map is not None:
+        frame['industry'] = sector_map.industry_of(codes)
+        dimensions.append('industry')
+
+    result = {}
+    for key in dimensions:
+        grouped = frame.groupby(key, sort=False).agg(
+            total=('change', 'size'),
+            up_count=('up_count', 'sum'),
+            down_count=('down_count', 'sum'),
+            limit_up=('limit_up', 'sum'),
+            limit_down=('limit_down', 'sum'),
+            turnover=('turnover', 'sum'),
+            median_change=('change', 'median'),
+        )
+        grouped['flat_count'] = grouped['total'] - grouped['up_count'] - grouped['down_count']
+        decided = grouped['up_count'] + grouped['down_count']
+        grouped['breadth_ratio'] = (grouped['up_count'] / decided.where(decided > 0)).fillna(0.5)
+        result[key] = grouped.sort_values('turnover', ascending=False)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="个股行业映射")
+    parser.add_argument('command', choices=['refresh', 'show'])
+    args = parser.parse_args()
+
+    sector_map = refresh_sector_map() if args.command == 'refresh' else load_sector_map()
+    if sector_map is None:
+        print("❌ 无可用的行业映射（python sector_map.py refresh 刷新）")
+        return
+    counts = pd.Series(sector_map.industries[sector_map.industry_ids]).value_counts()
+    print(f"✅ {len(sector_map)} 只股票，{len(counts)} 个行业，"
+          f"更新于 {time.strftime('%Y-%m-%d %H:%M', time.localtime(sector_map.built_at))}")
+    print(counts.head(20).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+恐慌/贪婪评分与网格建议的历史回测
+输入逐日历史表（每行一个交易日的涨跌分布、沪深300、北向资金），一次向量化计算全部交易日的评分、
+情绪等级与网格建议（与实时报告同一套 sentiment_scoring 计算），再与之后 N 日的沪深300收益对比：
+
+- 各情绪等级 / 网格建议的天数、之后 N 日平均收益与上涨概率
+- 评分与之后 N 日收益的秩相关（IC）：负值说明低分（恐慌）之后更容易上涨
+- --sweep 对单个权重取多个值重新评分，比较 IC，用于调参
+
+历史表列见 HISTORY_COLUMNS（CSV，date 为日期）。
+
+用法：
+    python sentiment_backtest.py --synthetic 10                     # 10 年合成历史
+    python sentiment_backtest.py --input sentiment_history.csv --horizons 1,5,20
+    python sentiment_backtest.py --input sentiment_history.csv --sweep index=1,2,3,4
+    python sentiment_backtest.py --input sentiment_history.csv --weights '{"limit_down": [[0.05, 40], [0.02, 20]]}'
+"""
+
+import argparse
+import json
+import time
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+from prettytable import PrettyTable
+
+from sentiment_scoring import (DEFAULT_WEIGHTS, GRID_ADVICE, OVERHEAT_ADVICE, SCORE_LEVELS, TOP_ADVICE, TOP_LEVEL,
+                               grid_advice, panic_scores, score_levels)
+
+
+HISTORY_COLUMNS = [
+    'date', 'total', 'up_count', 'down_count', 'limit_up', 'limit_down', 'drop_5_pct', 'total_volume',
+    'csi300_change', 'csi300_close', 'north_net_flow',
+]
+
+DEFAULT_HORIZONS = (1, 5, 20)
+
+LEVEL_ORDER = [name for _, name in SCORE_LEVELS] + [TOP_LEVEL]
+ADVICE_ORDER = [advice for _, advice in GRID_ADVICE] + [TOP_ADVICE, OVERHEAT_ADVICE]
+
+
+def prepare_history(history: pd.DataFrame) -> pd.DataFrame:
+    """校验列、按日期排序并计算涨跌比"""
+    missing = [c for c in HISTORY_COLUMNS if c not in history.columns]
+    if missing:
+        raise ValueError(f"历史表缺少列: {missing}")
+    df = history.assign(date=pd.to_datetime(history['date'])).sort_values('date').reset_index(drop=True)
+    decided = df['up_count'] + df['down_count']
+    df['breadth_ratio'] = np.where(decided > 0, df['up_count'] / decided.where(decided > 0, 1), 0.5)
+    return df
+
+
+def forward_returns(close: pd.Series, horizons: Sequence[int]) -> pd.DataFrame:
+    """之后 h 个交易日的收益（最后 h 天为 NaN）"""
+    return pd.DataFrame({f'fwd_{h}': close.shift(-h) / close - 1 for h in horizons}, index=close.index)
+
+
+def score_history(history: pd.DataFrame, weights: Dict = None,
+                  horizons: Sequence[int] = DEFAULT_HORIZONS) -> pd.DataFrame:
+    """全部交易日一次评分，附加情绪等级、网格建议与之后 N 日收益"""
+    df = prepare_history(history)
+    raw = panic_scores(df, weights)
+    # 与实时报告一致：等级按未取整评分，网格建议按保留两位的评分
+    score = np.round(raw, 2)
+    limit_up_ratio = df['limit_up'].to_numpy(dtype=float) / df['total'].to_numpy(dtype=float)
+    return df.assign(
+        score=score,
+        level=score_levels(raw),
+        advice=grid_advice(score, limit_up_ratio),
+        **forward_returns(df['csi300_close'], horizons),
+    )
+
+
+def information_coefficient(scores: np.ndarray, forward: pd.DataFrame) -> Dict[str, float]:
+    """评分与各期之后收益的秩相关（Spearman，按秩计算 Pearson，不依赖 scipy）"""
+    scores = pd.Series(scores, index=forward.index)
+    ic = {}
+    for column in forward.columns:
+        valid = forward[column].notna() & scores.notna()
+        ic[column] = scores[valid].rank().corr(forward.loc[valid, column].rank())
+    return ic
+
+
+def summarize(scored: pd.DataFrame, by: str, order: List[str], horizons: Sequence[int]) -> pd.DataFrame:
+    """按情绪等级 / 网格建议分组：天数、之后 N 日平均收益、上涨概率"""
+    columns = [f'fwd_{h}' for h in horizons]
+    grouped = scored.groupby(by, sort=False)[columns]
+    summary = grouped.mean().add_prefix('mean_').join(
+        grouped.agg(lambda s: (s.dropna() > 0).mean() if s.notna().any() else np.nan).add_prefix('hit_'))
+    summary.insert(0, 'days', scored.groupby(by, sort=False).size())
+    return summary.reindex([name for name in order if name in summary.index])
+
+
+def sweep(history: pd.DataFrame, key: str, values: Sequence[float],
+          horizons: Sequence[int] = DEFAULT_HORIZONS, weights: Dict = None) -> pd.DataFrame:
+    """单个权重取多个值分别评分，比较各期 IC"""
+    df = prepare_history(history)
+    forward = forward_returns(df['csi300_close'], horizons)
+    rows = []
+    for value in values:
+        scores = panic_scores(df, {**(weights or {}), key: value})
+        rows.append({key: value, **information_coefficient(scores, forward)})
+    return pd.DataFrame(rows).set_index(key)
+
+
+def print_summary(title: str, summary: pd.DataFrame, horizons: Sequence[int]):
+    table = PrettyTable()
+    table.field_names = [title, "天数"] + [f"{h}日均值" for h in horizons] + [f"{h}日上涨" for h in horizons]
+    table.align[title] = "l"
+    for name, r in summary.iterrows():
+        table.add_row([name, int(r['days'])]
+                      + [f"{r[f'mean_fwd_{h}']:+.2%}" if r[f'mean_fwd_{h}'] == r[f'mean_fwd_{h}'] else '-'
+                         for h in horizons]
+                      + [f"{r[f'hit_fwd_{h}']:.0%}" if r[f'hit_fwd_{h}'] == r[f'hit_fwd_{h}'] else '-'
+                         for h in horizons])
+    print(table)
+
+
+def parse_weights(value: str) -> Dict:
+    """JSON 权重覆盖；分档写成 [[阈值, 分数], ...]"""
+    weights = json.loads(value) if value else {}
+    unknown = [k for k in weights if k not in DEFAULT_WEIGHTS]
+    if unknown:
+        raise ValueError(f"未知权重: {unknown}")
+    return {k: tuple(tuple(t) for t in v) if isinstance(v, list) and v and isinstance(v[0], list)
+            else tuple(v) if isinstance(v, list) else v for k, v in weights.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="恐慌/贪婪评分历史回测")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--input', help=f"逐日历史 CSV（列：{', '.join(HISTORY_COLUMNS)}）")
+    source.add_argument('--synthetic', type=float, metavar='YEARS', help='使用合成历史（年数）')
+    parser.add_argument('--horizons', default=','.join(map(str, DEFAULT_HORIZONS)), help='之后收益的交易日数')
+    parser.add_argument('--weights', help='权重覆盖（JSON），见 sentiment_scoring.DEFAULT_WEIGHTS')
+    parser.add_argument('--sweep', metavar='KEY=V1,V2,...', help='对单个标量权重取多个值比较 IC')
+    parser.add_argument('--output', help='逐日评分结果写入 CSV')
+    args = parser.parse_args()
+
+    horizons = [int(h) for h in args.horizons.split(',') if h]
+    weights = parse_weights(args.weights)
+    if args.input:
+        history = pd.read_csv(args.input)
+    else:
+        from synthetic_data import generate_sentiment_history
+        history = generate_sentiment_history(years=args.synthetic)
+
+    start = time.perf_counter()
+    scored = score_history(history, weights, horizons)
+    elapsed = time.perf_counter() - start
+    print(f"\n📊 回测 {scored['date'].iloc[0].date()} ~ {scored['date'].iloc[-1].date()}，"
+          f"{len(scored)} 个交易日，评分耗时 {elapsed * 1000:.1f} ms\n")
+
+    print_summary("情绪等级", summarize(scored, 'level', LEVEL_ORDER, horizons), horizons)
+    print_summary("网格建议", summarize(scored, 'advice', ADVICE_ORDER, horizons), horizons)
+
+    ic = information_coefficient(scored['score'].to_numpy(), scored[[f'fwd_{h}' for h in horizons]])
+    print("\n【评分与之后收益的秩相关 IC】（负值：低分/恐慌之后更易上涨）")
+    print("  " + "  ".join(f"{h}日 {ic[f'fwd_{h}']:+.3f}" for h in horizons))
+
+    if args.sweep:
+        key, _, values = args.sweep.partition('=')
+        if key not in DEFAULT_WEIGHTS or isinstance(DEFAULT_WEIGHTS[key], tuple):
+            raise SystemExit(f"--sweep 只支持标量权重: {[k for k, v in DEFAULT_WEIGHTS.items() if not isinstance(v, tuple)]}")
+        result = sweep(history, key, [float(v) for v in values.split(',') if v], horizons, weights)
+        table = PrettyTable()
+        table.field_names = [key] + [f"{h}日 IC" for h in horizons]
+        for value, r in result.iterrows():
+            table.add_row([value] + [f"{r[f'fwd_{h}']:+.3f}" for h in horizons])
+        print(f"\n【权重扫描 {key}】")
+        print(table)
+
+    if args.output:
+        scored.to_csv(args.output, index=False, encoding='utf-8-sig')
+        print(f"\n✅ 逐日评分已保存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+恐慌/贪婪评分与网格建议的向量化实现
+实时报告（单个快照）与历史回测（多年逐日数据）共用同一套计算：输入为每行一个快照的表，
+各项贡献按列计算，分档用 np.select，一次给出全部行的评分、情绪等级与网格建议。
+
+所需列：total, breadth_ratio, limit_up, limit_down, drop_5_pct, total_volume,
+       csi300_change（无沪深300行情时为 NaN）, north_net_flow（无北向数据时为 NaN）
+
+权重与阈值集中在 DEFAULT_WEIGHTS，回测时可整体替换以便调参。
+"""
+
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+
+# 评分权重与分档阈值（分档为 (阈值, 分数)，取第一个满足的）
+DEFAULT_WEIGHTS = {
+    # 1. 市场宽度贡献 (权重30%)：涨跌比 0.5 为中性
+    'breadth': 0.3,
+    # 2. 指数表现贡献 (权重10%)：沪深300 每涨跌 1% 的分数
+    'index': 2.0,
+    # 3. 极端情绪惩罚 (权重15%)：跌停家数占比、跌超5%家数占比 → 扣分
+    'limit_down': ((0.05, 30), (0.02, 15)),
+    'drop_5': ((0.3, 20), (0.15, 10)),
+    # 4. 北向资金贡献 (权重25%)：净流入/流出（亿元）→ 加/扣分
+    'north_inflow': ((50, 15), (20, 8)),
+    'north_outflow': ((-50, 15), (-20, 8)),
+    # 5. 量能异常判断 (权重20%)：沪深300 跌幅超过阈值时，放量（恐慌抛售）/ 缩量（量能衰竭）扣分
+    'volume_index_drop': -1.0,
+    'volume_panic': (15000, 10),
+    'volume_exhaust': (8000, 8),
+}
+
+# 情绪等级：评分 < 阈值
+SCORE_LEVELS = (
+    (20, "极度恐慌 🔴🔴🔴"),
+    (40, "恐慌 🔴"),
+    (60, "中性震荡 🟡"),
+    (80, "贪婪 🟢"),
+)
+TOP_LEVEL = "极度贪婪 🟢🟢🟢"
+
+# 网格交易建议：评分 < 阈值
+GRID_ADVICE = (
+    (20, "🔴 极度恐慌区：激进策略可分批抄底，网格下轨扩大20%，密集布单"),
+    (30, "🔴 恐慌区：适合开启网格买入单，下轨-10%，间距2%"),
+    (40, "🟠 弱势区：谨慎布局，网格间距放宽至3%，控制仓位50%"),
+    (60, "🟡 震荡区：标准网格策略，上下轨±8%，间距2%"),
+    (70, "🟢 强势区：偏向卖出网格，上轨+10%，锁定利润"),
+    (80, "🟢 贪婪区：止盈为主，网格上轨缩小至+5%，快速平仓"),
+)
+# 极度贪婪区按涨停占比区分
+OVERHEAT_LIMIT_UP_RATIO = 0.05
+OVERHEAT_ADVICE = "🔴 极度贪婪+涨停潮：市场过热！建议暂停网格，等待回调"
+TOP_ADVICE = "🟢 极度贪婪：高位震荡，网格间距扩大至5%，防范回调"
+
+
+def _tiers(values: np.ndarray, tiers, above: bool = True) -> np.ndarray:
+    """分档取分：above=True 时 values > 阈值，否则 values < 阈值；都不满足为 0"""
+    masks = [(values > t) if above else (values < t) for t, _ in tiers]
+    return np.select(masks, [float(s) for _, s in tiers], default=0.0)
+
+
+def panic_scores(df: pd.DataFrame, weights: Dict = None) -> np.ndarray:
+    """逐行计算恐慌/贪婪评分 (0-100，未取整)"""
+    w = {**DEFAULT_WEIGHTS, **(weights or {})}
+    total = df['total'].to_numpy(dtype=float)
+    csi300 = df['csi300_change'].to_numpy(dtype=float)
+    north = df['north_net_flow'].to_numpy(dtype=float)
+    has_csi300 = ~np.isnan(csi300)
+
+    score = 50 + (df['breadth_ratio'].to_numpy(dtype=float) * 60 - 30) * w['breadth']
+    score = score + np.where(has_csi300, csi300 * w['index'], 0.0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        limit_down_ratio = df['limit_down'].to_numpy(dtype=float) / total
+        drop_5_ratio = df['drop_5_pct'].to_numpy(dtype=float) / total
+    score = score - _tiers(limit_down_ratio, w['limit_down'])
+    score = score - _tiers(drop_5_ratio, w['drop_5'])
+
+    # NaN 与任何阈值比较都为 False，无北向数据时不加减分
+    score = score + _tiers(north, w['north_inflow'])
+    score = score - _tiers(north, w['north_outflow'], above=False)
+
+    volume = df['total_volume'].to_numpy(dtype=float)
+    index_drop = has_csi300 & (np.nan_to_num(csi300) < w['volume_index_drop'])
+    panic_limit, panic_penalty = w['volume_panic']
+    exhaust_limit, exhaust_penalty = w['volume_exhaust']
+    score = score - np.select([index_drop & (volume > panic_limit), index_drop & (volume < exhaust_limit)],
+                              [float(panic_penalty), float(exhaust_penalty)], default=0.0)
+
+    return np.clip(score, 0, 100)
+
+
+def score_levels(scores: np.ndarray) -> np.ndarray:
+    """评分 → 情绪等级"""
+    scores = np.asarray(scores, dtype=float)
+    return np.select([scores < t for t, _ in SCORE_LEVELS], [name for _, name in SCORE_LEVELS],
+                     default=TOP_LEVEL).astype(object)
+
+
+def grid_advice(scores: np.ndarray, limit_up_ratio: np.ndarray) -> np.ndarray:
+    """评分（与涨停占比）→ 网格交易建议"""
+    scores = np.asarray(scores, dtype=float)
+    overheat = np.asarray(limit_up_ratio, dtype=float) > OVERHEAT_LIMIT_UP_RATIO
+    masks = [scores < t for t, _ in GRID_ADVICE] + [overheat]
+    choices = [advice for _, advice in GRID_ADVICE] + [OVERHEAT_ADVICE]
+    return np.select(masks, choices, default=TOP_ADVICE).astype(object)
+
+
+def snapshot_row(breadth: Dict, indices: Dict, north_flow: Dict) -> Dict:
+    """实时快照（get_market_breadth / get_index_performance / get_north_capital_flow）→ 评分输入行"""
+    csi300 = indices.get('csi300') if indices else None
+    net_flow = north_flow.get('net_flow') if north_flow else None
+    return {
+        'total': breadth['total'],
+        'breadth_ratio': breadth['breadth_ratio'],
+        'limit_up': breadth['limit_up'],
+        'limit_down': breadth['limit_down'],
+        'drop_5_pct': breadth['drop_5_pct'],
+        'total_volume': breadth['total_volume'],
+        'csi300_change': csi300['change_pct'] if csi300 else np.nan,
+        'north_net_flow': net_flow if net_flow is not None else np.nan,
+    }
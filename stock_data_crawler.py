@@ -6,12 +6,16 @@ A股市场数据爬虫
 """
 
 import requests
-import json
-import re
 from typing import Dict, List, Optional
-from datetime import datetime
 import time
 
+from deadline import DeadlineExceeded
+from http_resilience import ResilientHTTP, RetryPolicy, CircuitOpenError
+from response_cache import get_response_cache
+from fixtures import get_fixture_store, FixtureMissError
+from quote_service import QuoteService
+from north_flow import get_north_flow_tracker, parse_kamt_minutes
+
 
 class StockDataCrawler:
     """A股数据爬虫"""
@@ -26,20 +30,39 @@ class StockDataCrawler:
         })
         self.timeout = 15
         self.max_retries = 3
+        # 指数退避 + 按接口自适应超时 + 熔断
+        self.http = ResilientHTTP(
+            session=self.session,
+            retry=RetryPolicy(max_retries=self.max_retries),
+            default_timeout=self.timeout,
+        )
+        self.cache = get_response_cache()
+        self.fixtures = get_fixture_store()
+        # 新浪批量行情（指数 / ETF / 境外行情 / 汇率）
+        self.quote_service = QuoteService(self)
         
-    def _request_with_retry(self, url: str, params: dict = None) -> Optional[dict]:
-        """带重试的请求"""
-        for attempt in range(self.max_retries):
-            try:
-                response = self.session.get(url, params=params, timeout=self.timeout)
-                response.raise_for_status()
-                return response
-            except Exception as e:
-                if attempt == self.max_retries - 1:
-                    print(f"请求失败（{self.max_retries}次重试后）: {e}")
-                    return None
-                time.sleep(1)
-        return None
+    def _request_with_retry(self, url: str, params: dict = None, kind: str = None,
+                            headers: dict = None) -> Optional[requests.Response]:
+        """
+        带重试的请求（指数退避、自适应超时，接口持续失败时熔断快速失败）
+        指定 kind 时走共享响应缓存，TTL 由数据类型决定；headers 只作用于本次请求（可并发调用）
+        """
+        try:
+            if self.fixtures.active:
+                return self.fixtures.http_get(self.http, url, params=params, headers=headers)
+            if kind:
+                return self.cache.fetch_http(self.http, url, kind, params=params, headers=headers)
+            return self.http.get(url, params=params, headers=headers)
+        except (CircuitOpenError, FixtureMissError, DeadlineExceeded) as e:
+            print(f"请求跳过: {e}")
+            return None
+        except Exception as e:
+            print(f"请求失败（{self.max_retries}次重试后）: {e}")
+            return None
+    
+    def request_stats(self) -> Dict:
+        """各接口请求计数、熔断状态与延迟"""
+        return self.http.stats_summary()
     
     def get_realtime_quotes(self) -> Optional[List[Dict]]:
         """
@@ -65,7 +88,7 @@ class StockDataCrawler:
                     'fs': 'm:0 t:6,m:0 t:80,m:1 t:2,m:1 t:23',  # 沪深A股
                 }
                 
-                response = self._request_with_retry(url, params)
+                response = self._request_with_retry(url, params, kind='spot')
                 if not response:
                     break
                 
@@ -115,119 +138,79 @@ class StockDataCrawler:
     def get_index_quotes(self) -> Optional[Dict]:
         """
         获取主要指数实时行情
-        数据源：新浪财经（更稳定）
+        数据源：新浪财经（更稳定），经 QuoteService 批量请求
         """
+        # 指数代码映射
+        index_codes = {
+            's_sh000001': 'shanghai',   # 上证指数
+            's_sz399001': 'shenzhen',   # 深证成指
+            's_sh000300': 'csi300',     # 沪深300
+            's_sz399006': 'chinext'     # 创业板指
+        }
         try:
-            # 指数代码映射
-            index_codes = {
-                's_sh000001': 'shanghai',   # 上证指数
-                's_sz399001': 'shenzhen',   # 深证成指
-                's_sh000300': 'csi300',     # 沪深300
-                's_sz399006': 'chinext'     # 创业板指
+            quotes = self.quote_service.get_quotes(index_codes)
+            result = {
+                index_codes[symbol]: {
+                    'change_pct': float(q.change_pct),
+                    'volume': float(q.amount) / 10000,  # 成交额（万元）
+                    'current': float(q.current),
+                    'prev_close': float(q.prev_close),
+                }
+                for symbol, q in zip(quotes.index, quotes.itertuples())
             }
-            
-            # 新浪财经接口（添加防反爬headers）
-            code_str = ','.join(index_codes.keys())
-            url = f"https://hq.sinajs.cn/list={code_str}"
-            
-            # 临时修改headers
-            old_referer = self.session.headers.get('Referer')
-            self.session.headers.update({
-                'Referer': 'https://finance.sina.com.cn/',
-            })
-            
-            response = self._request_with_retry(url)
-            
-            # 恢复headers
-            if old_referer:
-                self.session.headers['Referer'] = old_referer
-            
-            if not response:
-                return None
-            
-            response.encoding = 'gbk'
-            text = response.text
-            
-            result = {}
-            for sina_code, name in index_codes.items():
-                try:
-                    # 解析数据
-                    pattern = f'var hq_str_{sina_code}="([^"]+)"'
-                    match = re.search(pattern, text)
-                    if not match:
-                        continue
-                    
-                    data = match.group(1).split(',')
-                    if len(data) < 6:
-                        continue
-                    
-                    current_price = float(data[3])
-                    prev_close = float(data[2])
-                    change_pct = ((current_price - prev_close) / prev_close * 100) if prev_close > 0 else 0
-                    
-                    result[name] = {
-                        'change_pct': round(change_pct, 2),
-                        'volume': float(data[5]) if len(data) > 5 else 0,
-                        'current': current_price,
-                        'prev_close': prev_close
-                    }
-                except Exception as e:
-                    continue
-            
             return result if result else None
         except Exception as e:
             print(f"获取指数行情失败: {e}")
             return None
     
+    def get_global_quotes(self, symbols: List[str]) -> Optional[Dict]:
+        """
+        获取境外行情与汇率快照（用于 QDII 基金估值）
+        数据源：新浪财经，支持 gb_（美股/美股 ETF，如 gb_qqq）与 fx_（汇率，如 fx_susdcny），
+        代码较多时由 QuoteService 分批并行请求
+        
+        Returns:
+            {symbol: {'current', 'prev_close', 'change_pct', 'date'}}，date 为行情对应的交易日
+        """
+        try:
+            quotes = self.quote_service.get_quotes(s for s in symbols if s.startswith(('gb_', 'fx_')))
+            result = {
+                symbol: {
+                    'current': float(q.current),
+                    'prev_close': float(q.prev_close),
+                    'change_pct': float(q.change_pct),
+                    'date': q.date,
+                }
+                for symbol, q in zip(quotes.index, quotes.itertuples())
+            }
+            return result if result else None
+        except Exception as e:
+            print(f"获取境外行情失败: {e}")
+            return None
+    
+    def get_north_flow_minutes(self) -> Optional[str]:
+        """
+        获取北向资金全天分钟序列原始响应（由 north_flow.parse_kamt_minutes 只解析未存储的分钟）
+        数据源：东方财富网
+        """
+        url = "https://push2.eastmoney.com/api/qt/kamt.rtmin/get"
+        params = {
+            'fields1': 'f1,f2,f3,f4',
+            'fields2': 'f51,f52,f53,f54,f56',
+            'ut': 'b2884a393a59ad64002292a3e90d46a5',
+            'cb': 'jQuery183003743205523978607_' + str(int(time.time() * 1000)),
+        }
+        response = self._request_with_retry(url, params, kind='north')
+        return response.text if response else None
+
     def get_north_capital_flow(self) -> Optional[Dict]:
         """
-        获取北向资金流向
+        获取北向资金流向（当天分钟序列的摘要：净流入、各窗口增量、加速度等，见 north_flow.summarize）
         数据源：东方财富网
         """
         try:
-            # 东方财富北向资金接口（使用HTTPS）
-            url = "https://push2.eastmoney.com/api/qt/kamt.rtmin/get"
-            params = {
-                'fields1': 'f1,f2,f3,f4',
-                'fields2': 'f51,f52,f53,f54,f56',
-                'ut': 'b2884a393a59ad64002292a3e90d46a5',
-                'cb': 'jQuery183003743205523978607_' + str(int(time.time() * 1000)),
-            }
-            
-            response = self._request_with_retry(url, params)
-            if not response:
-                return {'net_flow': 0, 'signal': 'unknown'}
-            
-            try:
-                # 移除JSONP回调
-                text = response.text
-                json_str = re.search(r'\((.+)\)', text)
-                if not json_str:
-                    return {'net_flow': 0, 'signal': 'unknown'}
-                
-                data = json.loads(json_str.group(1))
-                if not data.get('data'):
-                    return {'net_flow': 0, 'signal': 'unknown'}
-                
-                # 获取最新数据
-                north_data = data['data']
-                
-                # 北向资金净流入（单位：亿元）
-                # 处理可能是list的情况
-                net_value = north_data.get('s2c', 0)
-                if isinstance(net_value, list) and len(net_value) > 0:
-                    net_value = net_value[-1]  # 取最后一个值
-                net_flow = float(net_value) / 10000 if net_value else 0
-                
-                return {
-                    'net_flow': round(net_flow, 2),
-                    'signal': 'inflow' if net_flow > 0 else 'outflow',
-                    'shanghai': float(north_data.get('s2n', 0)) / 10000,  # 沪股通
-                    'shenzhen': float(north_data.get('s2s', 0)) / 10000   # 深股通
-                }
-            except Exception as e:
-                print(f"解析北向资金数据失败: {e}")
-                return {'net_flow': 0, 'signal': 'unknown'}
+            summary = get_north_flow_tracker().update(self.get_north_flow_minutes(), parse_kamt_minutes)
+            return summary or {'net_flow': 0, 'signal': 'unknown'}
         except Exception as e:
             print(f"获取北向资金失败: {e}")
             return {'net_flow': 0, 'signal': 'unknown'}
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合成行情与基金净值生成器（规模测试用）
+- 基金净值：市场状态切换（牛/熊/震荡）+ 单因子相关 + 节假日与数据缺口
+- 全市场快照：按板块涨跌幅限制生成个股涨跌幅、成交额，可生成分钟级序列与逐日情绪历史
+- SyntheticSource 实现 DataSource 接口，可直接替换真实数据源
+
+示例：
+    source = SyntheticSource(n_funds=10000, years=20, n_stocks=5000)
+    fund_monitor.PORTFOLIO = source.portfolio()
+    fund_monitor.set_nav_source(source)
+    fund_monitor.generate_report()
+"""
+
+from datetime import date, timedelta
+from typing import Dict, Iterator, List
+
+import numpy as np
+import pandas as pd
+
+from data_provider import DataSource, SPOT_COLUMNS, INDEX_CODES
+
+
+# 市场状态：(日均收益, 日波动率)
+REGIMES = {
+    'bull': (0.0008, 0.010),
+    'bear': (-0.0010, 0.018),
+    'sideways': (0.0000, 0.008),
+}
+REGIME_NAMES = list(REGIMES)
+
+# 状态转移矩阵（按 REGIME_NAMES 顺序），平均每个状态持续数月
+REGIME_TRANSITIONS = np.array([
+    [0.985, 0.005, 0.010],
+    [0.008, 0.980, 0.012],
+    [0.010, 0.008, 0.982],
+])
+
+# 板块代码前缀与涨跌幅限制（%）
+BOARDS = [
+    ('60', 10.0, 0.33),   # 沪市主板
+    ('00', 10.0, 0.28),   # 深市主板
+    ('30', 20.0, 0.25),   # 创业板
+    ('68', 20.0, 0.11),   # 科创板
+    ('83', 30.0, 0.03),   # 北交所
+]
+
+
+def trading_calendar(start: date, end: date, seed: int = 0) -> pd.DatetimeIndex:
+    """交易日历：工作日去掉春节、国庆等长假"""
+    days = pd.bdate_range(start, end)
+    holidays = set()
+    for year in range(start.year, end.year + 1):
+        # 春节：1 月下旬至 2 月中旬之间浮动的一周；国庆：10 月 1-7 日
+        rng = np.random.default_rng(seed + year)
+        spring = date(year, 1, 21) + timedelta(days=int(rng.integers(0, 21)))
+        holidays.update(spring + timedelta(days=d) for d in range(7))
+        holidays.update(date(year, 10, d) for d in range(1, 8))
+        holidays.update([date(year, 1, 1), date(year, 5, 1), date(year, 5, 2)])
+    mask = ~np.isin(days.date, list(holidays))
+    return days[mask]
+
+
+def simulate_regimes(n_days: int, rng: np.random.Generator) -> np.ndarray:
+    """生成市场状态序列（状态下标数组）"""
+    states = np.empty(n_days, dtype=np.int8)
+    state = 2
+    draws = rng.random(n_days)
+    cumulative = np.cumsum(REGIME_TRANSITIONS, axis=1)
+    for i in range(n_days):
+        state = int(np.searchsorted(cumulative[state], draws[i]))
+        states[i] = min(state, len(REGIME_NAMES) - 1)
+    return states
+
+
+class SyntheticMarket:
+    """共享市场因子，所有基金基于同一条因子收益生成以保证相关性"""
+
+    def __init__(self, years: float = 3, seed: int = 42, end: date = None):
+        self.seed = seed
+        self.end = end or date.today()
+        start = self.end - timedelta(days=int(years * 365))
+        self.calendar = trading_calendar(start, self.end, seed)
+        rng = np.random.default_rng(seed)
+        self.regimes = simulate_regimes(len(self.calendar), rng)
+        mu = np.array([REGIMES[name][0] for name in REGIME_NAMES])[self.regimes]
+        sigma = np.array([REGIMES[name][1] for name in REGIME_NAMES])[self.regimes]
+        self.factor_returns = mu + sigma * rng.standard_normal(len(self.calendar))
+        self.sigma = sigma
+
+    def fund_nav(self, index: int, qdii: bool = False) -> pd.DataFrame:
+        """
+        生成第 index 只基金的净值历史（与 akshare fund_open_fund_info_em 列一致）
+        同一 seed + index 结果固定
+        """
+        rng = np.random.default_rng([self.seed, index])
+        n = len(self.calendar)
+        beta = rng.uniform(0.5, 1.5)
+        idio_vol = rng.uniform(0.002, 0.012)
+        alpha = rng.normal(0, 0.0001)
+        returns = alpha + beta * self.factor_returns + idio_vol * rng.standard_normal(n)
+
+        # 成立时间随机：部分基金历史较短
+        first = int(rng.integers(0, max(1, n // 3))) if rng.random() < 0.4 else 0
+        keep = np.zeros(n, dtype=bool)
+        keep[first:] = True
+
+        # QDII 额外遇到境外节假日（约 4% 的交易日无净值）
+        if qdii:
+            keep &= rng.random(n) > 0.04
+
+        # 偶发的数据缺口（连续数天缺失）
+        for gap_start in rng.integers(first, n, size=int(rng.integers(0, 4))):
+            keep[gap_start:gap_start + int(rng.integers(2, 10))] = False
+        keep[-1] = True
+
+        nav = np.cumprod(1 + returns[keep])
+        nav = nav / nav[0] * rng.uniform(0.8, 3.0)
+        nav = np.round(nav, 4)
+        growth = np.round(np.concatenate([[0.0], np.diff(nav) / nav[:-1] * 100]), 2)
+        return pd.DataFrame({
+            '净值日期': self.calendar[keep].date,
+            '单位净值': nav,
+            '日增长率': growth,
+        })
+
+
+def fund_code(index: int) -> str:
+    """合成基金代码：9 开头避免与真实代码冲突"""
+    return f"9{index:05d}"
+
+
+def generate_portfolio(n_funds: int, start_date: str, seed: int = 42) -> Dict:
+    """生成与 fund_monitor.PORTFOLIO 结构一致的持仓配置"""
+    rng = np.random.default_rng(seed)
+    portfolio = {}
+    for i in range(n_funds):
+        portfolio[fund_code(i)] = {
+            "name": f"合成基金{i:05d}",
+            "init_cost": round(float(rng.uniform(0.8, 3.0)), 4),
+            "init_shares": round(float(rng.uniform(100, 10000)), 2),
+            "invest_amount": int(rng.choice([10, 100, 200, 500])),
+            "invest_cycle": int(rng.choice([1, 7, 14])),
+            "target": float(rng.choice([0.12, 0.15])),
+            "callback": float(rng.choice([0.05, 0.06])),
+            "start_date": start_date,
+        }
+    return portfolio
+
+
+def stock_codes(n_stocks: int, seed: int = 42) -> np.ndarray:
+    """按板块比例生成股票代码"""
+    rng = np.random.default_rng(seed)
+    weights = np.array([b[2] for b in BOARDS])
+    boards = rng.choice(len(BOARDS), size=n_stocks, p=weights / weights.sum())
+    counters = [0] * len(BOARDS)
+    codes = []
+    for b in boards:
+        codes.append(f"{BOARDS[b][0]}{counters[b]:04d}")
+        counters[b] += 1
+    return np.array(codes)
+
+
+def limit_of(codes: np.ndarray) -> np.ndarray:
+    """按代码前缀返回涨跌幅限制（%）"""
+    limits = np.full(len(codes), 10.0)
+    prefixes = np.array([c[:2] for c in codes])
+    for prefix, limit, _ in BOARDS:
+        limits[prefixes == prefix] = limit
+    return limits
+
+
+def generate_sector_map(codes: np.ndarray, n_industries: int = 30, seed: int = 42):
+    """随机分配行业，生成 sector_map.SectorMap（离线 / 基准测试时替代东方财富行业成分股）"""
+    from sector_map import SectorMap
+    rng = np.random.default_rng(seed)
+    industries = rng.integers(0, n_industries, len(codes))
+    return SectorMap({str(c): f"行业{i:02d}" for c, i in zip(codes, industries)})
+
+
+def generate_spot_snapshot(n_stocks: int = 5000, market_move: float = 0.0, seed: int = 0,
+                           codes: np.ndarray = None) -> pd.DataFrame:
+    """
+    生成全市场快照（列与 data_provider.SPOT_COLUMNS 一致）
+
+    Args:
+        market_move: 市场整体涨跌幅（%），决定涨跌分布中心
+    """
+    rng = np.random.default_rng(seed)
+    codes = stock_codes(n_stocks) if codes is None else codes
+    limits = limit_of(codes)
+    # 个股涨跌幅 = beta × 市场 + 厚尾个股噪声，按板块限制截断
+    beta = rng.uniform(0.6, 1.6, len(codes))
+    change = beta * market_move + 1.8 * rng.standard_t(4, len(codes))
+    change = np.round(np.clip(change, -limits, limits), 2)
+    prev_close = np.round(rng.lognormal(2.5, 0.8, len(codes)), 2)
+    amount = np.round(rng.lognormal(19, 1.2, len(codes)) * (1 + np.abs(change) / 5), -2)
+    return pd.DataFrame({
+        '代码': codes,
+        '名称': [f"股票{c}" for c in codes],
+        '最新价': np.round(prev_close * (1 + change / 100), 2),
+        '涨跌幅': change,
+        '成交额': amount,
+    })[SPOT_COLUMNS]
+
+
+def generate_spot_series(n_stocks: int = 5000, minutes: int = 240, seed: int = 0) -> Iterator[pd.DataFrame]:
+    """生成分钟级全市场快照序列（涨跌幅随时间累积游走）"""
+    rng = np.random.default_rng(seed)
+    codes = stock_codes(n_stocks, seed)
+    limits = limit_of(codes)
+    base = generate_spot_snapshot(n_stocks, seed=seed, codes=codes)
+    prev_close = base['最新价'].values / (1 + base['涨跌幅'].values / 100)
+    change = np.zeros(len(codes))
+    amount = np.zeros(len(codes))
+    market = 0.0
+    for _ in range(minutes):
+        market += rng.normal(0, 0.08)
+        change = np.clip(change + 0.05 * market + rng.normal(0, 0.15, len(codes)), -limits, limits)
+        amount += rng.lognormal(13, 1.0, len(codes))
+        snapshot = base.copy()
+        snapshot['涨跌幅'] = np.round(change, 2)
+        snapshot['最新价'] = np.round(prev_close * (1 + change / 100), 2)
+        snapshot['成交额'] = np.round(amount, -2)
+        yield snapshot
+
+
+def generate_sentiment_history(years: float = 5, n_stocks: int = 5000, seed: int = 42,
+                               chunk: int = 250) -> pd.DataFrame:
+    """
+    生成逐日市场情绪历史（全市场涨跌分布统计 + 沪深300 + 北向资金），
+    列与 sentiment_backtest.HISTORY_COLUMNS 一致；个股涨跌幅按 generate_spot_snapshot 的模型分块生成
+    """
+    market = SyntheticMarket(years, seed)
+    rng = np.random.default_rng(seed + 1)
+    codes = stock_codes(n_stocks, seed)
+    limits = limit_of(codes)
+    beta = rng.uniform(0.6, 1.6, n_stocks)
+    moves = market.factor_returns * 100
+
+    stats = {name: [] for name in ('total', 'up_count', 'down_count', 'limit_up', 'limit_down',
+                                   'drop_5_pct', 'total_volume')}
+    for start in range(0, len(moves), chunk):
+        move = moves[start:start + chunk, None]
+        change = beta * move + 1.8 * rng.standard_t(4, (len(move), n_stocks))
+        change = np.round(np.clip(change, -limits, limits), 2)
+        # 两市成交额约 1-2 万亿
+        amount = rng.lognormal(18.4, 1.2, change.shape) * (1 + np.abs(change) / 5)
+        stats['total'].append(np.full(len(move), n_stocks))
+        stats['up_count'].append((change > 0).sum(axis=1))
+        stats['down_count'].append((change < 0).sum(axis=1))
+        stats['limit_up'].append((change >= 9.9).sum(axis=1))
+        stats['limit_down'].append((change <= -9.9).sum(axis=1))
+        stats['drop_5_pct'].append((change <= -5).sum(axis=1))
+        stats['total_volume'].append(amount.sum(axis=1) / 100000000)
+
+    csi300_change = np.round(moves * rng.uniform(0.9, 1.1, len(moves)), 2)
+    return pd.DataFrame({
+        'date': market.calendar.date,
+        **{name: np.concatenate(values) for name, values in stats.items()},
+        'csi300_change': csi300_change,
+        'csi300_close': np.round(4000 * np.cumprod(1 + csi300_change / 100), 2),
+        'north_net_flow': np.round(moves * 30 + rng.normal(0, 15, len(moves)), 2),
+    })
+
+
+class SyntheticSource(DataSource):
+    """合成数据源，实现 DataSource 接口并额外提供基金净值"""
+
+    name = 'synthetic'
+
+    def __init__(self, n_funds: int = 100, years: float = 3, n_stocks: int = 5000,
+                 seed: int = 42, qdii_ratio: float = 0.3, market_move: float = None):
+        self.n_funds = n_funds
+        self.n_stocks = n_stocks
+        self.seed = seed
+        self.qdii_ratio = qdii_ratio
+        self.market = SyntheticMarket(years, seed)
+        self.market_move = market_move
+        self.calls = 0
+
+    def fund_codes(self) -> List[str]:
+        return [fund_code(i) for i in range(self.n_funds)]
+
+    def portfolio(self) -> Dict:
+        start = self.market.calendar[-min(len(self.market.calendar), 60)].strftime('%Y-%m-%d')
+        return generate_portfolio(self.n_funds, start, self.seed)
+
+    def get_fund_nav(self, code: str) -> pd.DataFrame:
+        index = int(code[1:])
+        qdii = (index % 100) < self.qdii_ratio * 100
+        return self.market.fund_nav(index, qdii=qdii)
+
+    def _market_move(self) -> float:
+        if self.market_move is not None:
+            return self.market_move
+        # 取最近一个交易日的市场因子收益（%）
+        return float(self.market.factor_returns[-1] * 100)
+
+    def get_spot(self) -> pd.DataFrame:
+        self.calls += 1
+        return generate_spot_snapshot(self.n_stocks, self._market_move(), seed=self.seed + self.calls)
+
+    def get_index_quotes(self) -> Dict:
+        rng = np.random.default_rng(self.seed)
+        move = self._market_move()
+        return {
+            name: {
+                'change_pct': round(move * float(rng.uniform(0.8, 1.3)), 2),
+                'volume': round(float(rng.uniform(2000, 6000)), 2),
+            }
+            for name in INDEX_CODES.values()
+        }
+
+    def get_north_flow(self) -> Dict:
+        net_flow = round(self._market_move() * 30, 2)
+        return {'net_flow': net_flow, 'signal': 'inflow' if net_flow > 0 else 'outflow'}
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+轻量级分阶段计时（span）
+- 单调时钟（perf_counter），关闭时 span() 返回共享空对象，几乎无开销
+- 子 span 继承父 span 的属性（如 fund），便于按基金汇总
+- 汇总结果可写入结果 JSON，完整 span 可导出为 Chrome Trace 格式（chrome://tracing / Perfetto 打开）
+
+环境变量 FUND_MONITOR_TRACE=0 关闭计时。
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from typing import Dict, List
+
+
+TRACE_ENV = "FUND_MONITOR_TRACE"
+
+
+class _NoopSpan:
+    """计时关闭时使用的空 span"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'attrs', 'start')
+
+    def __init__(self, tracer, name: str, attrs: Dict):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        stack = self.tracer._stack()
+        if stack:
+            self.attrs = {**stack[-1], **self.attrs}
+        stack.append(self.attrs)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter()
+        self.tracer._stack().pop()
+        self.tracer._record(self.name, self.start, end, self.attrs, exc_type is not None)
+        return False
+
+
+class Tracer:
+    """span 收集器"""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.spans: List[Dict] = []
+        self.origin = time.perf_counter()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def _stack(self) -> List[Dict]:
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def _record(self, name: str, start: float, end: float, attrs: Dict, error: bool):
+        span = {
+            'name': name,
+            'start': start - self.origin,
+            'duration': end - start,
+            'thread': threading.get_ident(),
+            'attrs': attrs,
+        }
+        if error:
+            span['error'] = True
+        with self.lock:
+            self.spans.append(span)
+
+    def span(self, name: str, **attrs):
+        """计时上下文：with tracer.span('fetch', fund=code): ..."""
+        if not self.enabled:
+            return _NOOP_SPAN
+        return _Span(self, name, attrs)
+
+    def traced(self, name: str = None):
+        """函数装饰器"""
+        def decorator(fn):
+            span_name = name or fn.__name__
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def reset(self):
+        with self.lock:
+            self.spans = []
+            self.origin = time.perf_counter()
+
+    def summary(self) -> Dict:
+        """按阶段、按基金汇总耗时（秒）"""
+        stages = {}
+        funds = {}
+        with self.lock:
+            spans = list(self.spans)
+        for span in spans:
+            stage = stages.setdefault(span['name'], {'count': 0, 'total': 0.0, 'max': 0.0})
+            stage['count'] += 1
+            stage['total'] += span['duration']
+            stage['max'] = max(stage['max'], span['duration'])
+            fund = span['attrs'].get('fund')
+            if fund is not None:
+                per_fund = funds.setdefault(fund, {})
+                per_fund[span['name']] = per_fund.get(span['name'], 0.0) + span['duration']
+        for stage in stages.values():
+            stage['total'] = round(stage['total'], 6)
+            stage['max'] = round(stage['max'], 6)
+        funds = {code: {k: round(v, 6) for k, v in s.items()} for code, s in funds.items()}
+        return {'stages': stages, 'funds': funds}
+
+    def print_summary(self, top: int = 10):
+        """打印耗时最多的阶段"""
+        stages = self.summary()['stages']
+        if not stages:
+            return
+        print("\n⏱️ 阶段耗时：")
+        for name, s in sorted(stages.items(), key=lambda x: -x[1]['total'])[:top]:
+            print(f"  {name:<20} {s['total']:8.3f}s  ({s['count']} 次, 最长 {s['max']:.3f}s)")
+
+    def write_chrome_trace(self, path: str):
+        """导出 Chrome Trace Event 格式"""
+        with self.lock:
+            spans = list(self.spans)
+        events = [{
+            'name': s['name'],
+            'ph': 'X',
+            'ts': round(s['start'] * 1e6, 1),
+            'dur': round(s['duration'] * 1e6, 1),
+            'pid': os.getpid(),
+            'tid': s['thread'],
+            'args': {k: str(v) for k, v in s['attrs'].items()},
+        } for s in spans]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
+
+
+tracer = Tracer(enabled=os.environ.get(TRACE_ENV, '1') != '0')